@@ -0,0 +1,261 @@
+-- ASSOS youtube_analytics partitioning and rollups
+-- Monthly range partitions on collected_at, plus hourly and daily rollups
+-- maintained by statement-level triggers so reads never scan raw snapshots.
+
+-- Partitioned snapshot table; existing rows are moved over below
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_class
+        WHERE relname = 'youtube_analytics' AND relkind = 'r'
+    ) THEN
+        ALTER TABLE youtube_analytics RENAME TO youtube_analytics_unpartitioned;
+        ALTER INDEX youtube_analytics_pkey RENAME TO youtube_analytics_unpartitioned_pkey;
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS youtube_analytics (
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
+    video_id UUID REFERENCES videos(id) ON DELETE CASCADE,
+    views INTEGER DEFAULT 0,
+    likes INTEGER DEFAULT 0,
+    dislikes INTEGER DEFAULT 0,
+    comments INTEGER DEFAULT 0,
+    shares INTEGER DEFAULT 0,
+    watch_time INTEGER DEFAULT 0, -- in seconds
+    ctr DECIMAL(5,4), -- click-through rate
+    avd DECIMAL(5,4), -- average view duration
+    rpm DECIMAL(8,2), -- revenue per mille
+    estimated_revenue DECIMAL(10,2),
+    collected_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, collected_at)
+) PARTITION BY RANGE (collected_at);
+
+CREATE TABLE IF NOT EXISTS youtube_analytics_default
+    PARTITION OF youtube_analytics DEFAULT;
+
+CREATE INDEX IF NOT EXISTS idx_analytics_video_collected
+    ON youtube_analytics(video_id, collected_at);
+
+-- Monthly partitions from the first month with data through months_ahead
+-- months from now. Called by the ai-service on startup and daily.
+CREATE OR REPLACE FUNCTION ensure_youtube_analytics_partitions(months_ahead INTEGER DEFAULT 3)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE;
+    last_month DATE := date_trunc('month', NOW() + make_interval(months => months_ahead))::date;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    SELECT COALESCE(date_trunc('month', MIN(collected_at)), date_trunc('month', NOW()))::date
+    INTO month_start
+    FROM youtube_analytics_default;
+
+    month_start := LEAST(month_start, date_trunc('month', NOW())::date);
+
+    WHILE month_start <= last_month LOOP
+        partition_name := format('youtube_analytics_%s', to_char(month_start, 'YYYY_MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            -- Rows of this month that landed in the default partition move
+            -- into the new partition
+            EXECUTE format(
+                'CREATE TABLE %I (LIKE youtube_analytics INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                partition_name
+            );
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM youtube_analytics_default WHERE collected_at >= %L AND collected_at < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                month_start, (month_start + INTERVAL '1 month')::date, partition_name
+            );
+            EXECUTE format(
+                'ALTER TABLE youtube_analytics ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, (month_start + INTERVAL '1 month')::date
+            );
+            created := created + 1;
+        END IF;
+        month_start := (month_start + INTERVAL '1 month')::date;
+    END LOOP;
+
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rollups: one row per video and bucket. Counters in youtube_analytics are
+-- cumulative, so a bucket keeps the first and last snapshot values; rates
+-- keep sums and counts so they can be averaged over any window.
+CREATE TABLE IF NOT EXISTS youtube_analytics_hourly (
+    video_id UUID NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    snapshots INTEGER NOT NULL DEFAULT 0,
+    first_collected_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_collected_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    first_views BIGINT,
+    views BIGINT,
+    likes BIGINT,
+    comments BIGINT,
+    shares BIGINT,
+    watch_time BIGINT,
+    estimated_revenue DECIMAL(12,2),
+    ctr_sum DECIMAL(14,4) NOT NULL DEFAULT 0,
+    ctr_count INTEGER NOT NULL DEFAULT 0,
+    avd_sum DECIMAL(14,4) NOT NULL DEFAULT 0,
+    avd_count INTEGER NOT NULL DEFAULT 0,
+    rpm_sum DECIMAL(16,2) NOT NULL DEFAULT 0,
+    rpm_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (video_id, bucket_start)
+);
+
+CREATE TABLE IF NOT EXISTS youtube_analytics_daily (
+    LIKE youtube_analytics_hourly INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+    PRIMARY KEY (video_id, bucket_start),
+    FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_analytics_hourly_bucket ON youtube_analytics_hourly(bucket_start);
+CREATE INDEX IF NOT EXISTS idx_analytics_daily_bucket ON youtube_analytics_daily(bucket_start);
+
+-- Upsert statement for one batch of snapshots into a rollup. Late snapshots
+-- only replace first/last values when they are earlier/later than what the
+-- bucket already holds.
+-- source is a relation name or a parenthesized subquery with an alias.
+CREATE OR REPLACE FUNCTION rollup_youtube_analytics_sql(rollup_table TEXT, bucket TEXT, source TEXT)
+RETURNS TEXT AS $$
+BEGIN
+    RETURN format($sql$
+        INSERT INTO %1$I AS r (
+            video_id, bucket_start, snapshots, first_collected_at, last_collected_at,
+            first_views, views, likes, comments, shares, watch_time, estimated_revenue,
+            ctr_sum, ctr_count, avd_sum, avd_count, rpm_sum, rpm_count
+        )
+        SELECT
+            video_id,
+            date_trunc(%2$L, collected_at),
+            COUNT(*),
+            MIN(collected_at),
+            MAX(collected_at),
+            (array_agg(views ORDER BY collected_at))[1],
+            (array_agg(views ORDER BY collected_at DESC))[1],
+            (array_agg(likes ORDER BY collected_at DESC))[1],
+            (array_agg(comments ORDER BY collected_at DESC))[1],
+            (array_agg(shares ORDER BY collected_at DESC))[1],
+            (array_agg(watch_time ORDER BY collected_at DESC))[1],
+            (array_agg(estimated_revenue ORDER BY collected_at DESC))[1],
+            COALESCE(SUM(ctr), 0), COUNT(ctr),
+            COALESCE(SUM(avd), 0), COUNT(avd),
+            COALESCE(SUM(rpm), 0), COUNT(rpm)
+        FROM %3$s
+        WHERE video_id IS NOT NULL
+        GROUP BY video_id, date_trunc(%2$L, collected_at)
+        ON CONFLICT (video_id, bucket_start) DO UPDATE SET
+            snapshots = r.snapshots + EXCLUDED.snapshots,
+            first_views = CASE WHEN EXCLUDED.first_collected_at < r.first_collected_at
+                               THEN EXCLUDED.first_views ELSE r.first_views END,
+            first_collected_at = LEAST(r.first_collected_at, EXCLUDED.first_collected_at),
+            views = CASE WHEN EXCLUDED.last_collected_at >= r.last_collected_at
+                         THEN EXCLUDED.views ELSE r.views END,
+            likes = CASE WHEN EXCLUDED.last_collected_at >= r.last_collected_at
+                         THEN EXCLUDED.likes ELSE r.likes END,
+            comments = CASE WHEN EXCLUDED.last_collected_at >= r.last_collected_at
+                            THEN EXCLUDED.comments ELSE r.comments END,
+            shares = CASE WHEN EXCLUDED.last_collected_at >= r.last_collected_at
+                          THEN EXCLUDED.shares ELSE r.shares END,
+            watch_time = CASE WHEN EXCLUDED.last_collected_at >= r.last_collected_at
+                              THEN EXCLUDED.watch_time ELSE r.watch_time END,
+            estimated_revenue = CASE WHEN EXCLUDED.last_collected_at >= r.last_collected_at
+                                     THEN EXCLUDED.estimated_revenue ELSE r.estimated_revenue END,
+            last_collected_at = GREATEST(r.last_collected_at, EXCLUDED.last_collected_at),
+            ctr_sum = r.ctr_sum + EXCLUDED.ctr_sum,
+            ctr_count = r.ctr_count + EXCLUDED.ctr_count,
+            avd_sum = r.avd_sum + EXCLUDED.avd_sum,
+            avd_count = r.avd_count + EXCLUDED.avd_count,
+            rpm_sum = r.rpm_sum + EXCLUDED.rpm_sum,
+            rpm_count = r.rpm_count + EXCLUDED.rpm_count
+    $sql$, rollup_table, bucket, source);
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Statement-level, so a bulk insert of N snapshots costs one upsert per
+-- (video, bucket) instead of N row triggers. The transition table is only
+-- visible to this function, so the statements are executed here.
+CREATE OR REPLACE FUNCTION rollup_youtube_analytics()
+RETURNS TRIGGER AS $$
+BEGIN
+    EXECUTE rollup_youtube_analytics_sql('youtube_analytics_hourly', 'hour', 'new_snapshots');
+    EXECUTE rollup_youtube_analytics_sql('youtube_analytics_daily', 'day', 'new_snapshots');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS rollup_youtube_analytics_insert ON youtube_analytics;
+CREATE TRIGGER rollup_youtube_analytics_insert
+    AFTER INSERT ON youtube_analytics
+    REFERENCING NEW TABLE AS new_snapshots
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_youtube_analytics();
+
+-- Updated and deleted snapshots (including the cascade from videos) cannot
+-- be subtracted from first/last values, so the buckets they touched are
+-- rebuilt from the snapshots that remain in them.
+CREATE OR REPLACE FUNCTION rebuild_youtube_analytics_rollups()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed TEXT := CASE TG_OP
+        WHEN 'DELETE' THEN 'old_snapshots'
+        ELSE '(SELECT video_id, collected_at FROM old_snapshots
+               UNION ALL SELECT video_id, collected_at FROM new_snapshots)'
+    END;
+    target RECORD;
+BEGIN
+    FOR target IN
+        SELECT * FROM (VALUES ('youtube_analytics_hourly', 'hour'), ('youtube_analytics_daily', 'day'))
+            AS t(rollup_table, bucket)
+    LOOP
+        EXECUTE format($sql$
+            DELETE FROM %1$I AS r
+            USING (SELECT DISTINCT video_id, date_trunc(%2$L, collected_at) AS bucket_start FROM %3$s AS c) AS a
+            WHERE r.video_id = a.video_id AND r.bucket_start = a.bucket_start
+        $sql$, target.rollup_table, target.bucket, changed);
+        EXECUTE rollup_youtube_analytics_sql(target.rollup_table, target.bucket, format($sql$(
+            SELECT s.*
+            FROM youtube_analytics s
+            JOIN (SELECT DISTINCT video_id, date_trunc(%1$L, collected_at) AS bucket_start FROM %2$s AS c) AS a
+              ON s.video_id = a.video_id
+             AND s.collected_at >= a.bucket_start
+             AND s.collected_at < a.bucket_start + %3$L::interval
+        ) AS snapshots$sql$, target.bucket, changed, '1 ' || target.bucket));
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event
+DROP TRIGGER IF EXISTS rollup_youtube_analytics_update ON youtube_analytics;
+CREATE TRIGGER rollup_youtube_analytics_update
+    AFTER UPDATE ON youtube_analytics
+    REFERENCING OLD TABLE AS old_snapshots NEW TABLE AS new_snapshots
+    FOR EACH STATEMENT EXECUTE FUNCTION rebuild_youtube_analytics_rollups();
+
+DROP TRIGGER IF EXISTS rollup_youtube_analytics_delete ON youtube_analytics;
+CREATE TRIGGER rollup_youtube_analytics_delete
+    AFTER DELETE ON youtube_analytics
+    REFERENCING OLD TABLE AS old_snapshots
+    FOR EACH STATEMENT EXECUTE FUNCTION rebuild_youtube_analytics_rollups();
+
+-- Move existing snapshots over (the trigger fills the rollups) and create
+-- the partitions around them. collected_at was nullable before; such rows
+-- are kept with the migration time.
+DO $$
+BEGIN
+    IF to_regclass('youtube_analytics_unpartitioned') IS NOT NULL THEN
+        INSERT INTO youtube_analytics (
+            id, video_id, views, likes, dislikes, comments, shares, watch_time,
+            ctr, avd, rpm, estimated_revenue, collected_at
+        )
+        SELECT
+            id, video_id, views, likes, dislikes, comments, shares, watch_time,
+            ctr, avd, rpm, estimated_revenue, COALESCE(collected_at, NOW())
+        FROM youtube_analytics_unpartitioned;
+        DROP TABLE youtube_analytics_unpartitioned;
+    END IF;
+END $$;
+
+SELECT ensure_youtube_analytics_partitions(3);
@@ -0,0 +1,6 @@
+-- ASSOS export indexes
+-- Bulk exports page through task history in (created_at, id) order; these
+-- keep every page an index range scan however far the export has got.
+
+CREATE INDEX IF NOT EXISTS idx_agent_tasks_created_id ON agent_tasks(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_content_pipeline_created_id ON content_pipeline(created_at, id);
@@ -3,11 +3,14 @@ from .content_strategist import ContentStrategistAgent
 from .trend_predictor import TrendPredictorAgent
 from .research_agent import ResearchAgent
 from .performance_analyst import PerformanceAnalystAgent
+from .registry import get_agent, agent_names
 
 __all__ = [
     "ManusAgent",
     "ContentStrategistAgent", 
     "TrendPredictorAgent",
     "ResearchAgent",
-    "PerformanceAnalystAgent"
+    "PerformanceAnalystAgent",
+    "get_agent",
+    "agent_names"
 ]
\ No newline at end of file
@@ -2,21 +2,49 @@ import asyncio
 import logging
 import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
-from uuid import UUID, uuid4
+from typing import Dict, Any, AsyncIterator, Optional, Set
+from uuid import NAMESPACE_URL, UUID, uuid4, uuid5
 import json
 
-from ..models import AgentResponse
-from ..services.llm_service import LLMService
+from ..models import AgentResponse, RetrievalPolicy
+from ..services.llm_service import LLMService, usage_summary
+from ..services.deadline import DeadlineExceeded, check_deadline, deadline_scope
+from ..services.memory import (
+    build_embedding_text,
+    build_memory_payload,
+    build_query_text,
+    store_blob,
+)
+from ..services.retrieval import NO_CONTEXT, build_filter_conditions, search_memory
+from ..services.saturation import saturation
+from ..services.shared_state import publish_vector_cache_point, shared_metrics
+from ..services.vector_cache import vector_cache
 from ..database import get_redis, get_qdrant
 from qdrant_client.models import PointStruct
 
 logger = logging.getLogger(__name__)
 
 
+def stable_agent_id(agent_type: str) -> str:
+    """Agent id that is identical in every worker process and replica"""
+    return str(uuid5(NAMESPACE_URL, f"assos-agent:{agent_type}"))
+
+
 class BaseAgent(ABC):
     """Base class for all AI agents"""
     
+    # Context retrieval per task type; tasks without an entry fetch no context
+    retrieval_policies: Dict[str, RetrievalPolicy] = {}
+    
+    # Fixed instructions and output schemas per task type. They go into the
+    # system prompt, ahead of the provider cache breakpoint, so prompts only
+    # carry the variable input
+    task_instructions: Dict[str, str] = {}
+    
+    # Task types served from the result cache; they load their context only
+    # when the result is actually computed (see _attach_context)
+    cached_tasks: Set[str] = set()
+    
     def __init__(self, agent_id: str, name: str, agent_type: str):
         self.agent_id = agent_id
         self.name = name
@@ -40,18 +68,36 @@ class BaseAgent(ABC):
         """Get agent capabilities and supported task types"""
         pass
     
-    async def process_task(self, task_id: str, task_type: str, input_data: Dict[str, Any]) -> AgentResponse:
-        """Process a task with timing and error handling"""
+    async def process_task(
+        self,
+        task_id: str,
+        task_type: str,
+        input_data: Dict[str, Any],
+        deadline: Optional[float] = None
+    ) -> AgentResponse:
+        """
+        Process a task with timing and error handling.
+        
+        deadline is an absolute epoch time. Once it passes, in-flight LLM calls
+        are cancelled and the task fails instead of finishing for a caller
+        that has already given up.
+        """
         start_time = time.time()
+        saturation.task_started(self.agent_type)
+        # Multi-step tasks checkpoint their progress under this id; the
+        # caller's dict is left untouched
+        input_data = {**input_data, "task_id": task_id}
         
         try:
             logger.info(f"Agent {self.name} starting task {task_id} of type {task_type}")
             
-            # Load context from memory if needed
-            input_data["context"] = await self._load_context(task_id, input_data)
-            
-            # Execute the task
-            response = await self.execute_task(task_type, input_data)
+            async with deadline_scope(deadline):
+                # Load context from memory only if this task's prompts use it
+                if task_type not in self.cached_tasks:
+                    await self._attach_context(task_type, input_data, task_id, deadline)
+                
+                # Execute the task
+                response = await self.execute_task(task_type, input_data)
             
             # Calculate execution time
             execution_time = time.time() - start_time
@@ -60,8 +106,10 @@ class BaseAgent(ABC):
             # Update performance metrics
             await self._update_metrics(execution_time, response.confidence_score or 0.8)
             
-            # Store results in memory
-            await self._store_results(task_id, input_data, response)
+            # Store results in memory; results of cached tasks are stored once
+            # by the computation that produced them (see _store_computed)
+            if response.cache_status is None:
+                await self._store_results(task_id, task_type, input_data, response, deadline)
             
             logger.info(f"Agent {self.name} completed task {task_id} in {execution_time:.2f}s")
             return response
@@ -76,9 +124,33 @@ class BaseAgent(ABC):
                 execution_time=execution_time
             )
             
-            logger.error(f"Agent {self.name} failed task {task_id}: {e}", exc_info=True)
+            if isinstance(e, DeadlineExceeded):
+                logger.warning(f"Agent {self.name} abandoned task {task_id} after {execution_time:.2f}s: deadline exceeded")
+            else:
+                logger.error(f"Agent {self.name} failed task {task_id}: {e}", exc_info=True)
             return error_response
+        
+        finally:
+            saturation.task_finished(self.agent_type)
     
+    async def _attach_context(
+        self,
+        task_type: str,
+        input_data: Dict[str, Any],
+        task_id: Optional[str] = None,
+        deadline: Optional[float] = None
+    ):
+        """Load memory context into input_data if the task's policy uses it"""
+        policy = self.get_retrieval_policy(task_type)
+        if policy.needs_context:
+            input_data["context"] = await self._load_context(
+                task_id or input_data.get("task_id", "unknown"), task_type, input_data, policy, deadline
+            )
+    
+    def get_retrieval_policy(self, task_type: str) -> RetrievalPolicy:
+        """Get the context retrieval policy for a task type"""
+        return self.retrieval_policies.get(task_type, NO_CONTEXT)
+
     def _get_collection_name(self, task_type: str) -> Optional[str]:
         if "research" in task_type or "ideation" in task_type:
             return "research_data"
@@ -88,7 +160,14 @@ class BaseAgent(ABC):
             return "performance_data"
         return None
 
-    async def _load_context(self, task_id: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def _load_context(
+        self,
+        task_id: str,
+        task_type: str,
+        input_data: Dict[str, Any],
+        policy: RetrievalPolicy,
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
         """Load relevant context from memory and vector database"""
         context = {}
         try:
@@ -100,63 +179,109 @@ class BaseAgent(ABC):
                 context['redis_cache'] = json.loads(cached_context)
             
             # Load relevant embeddings from Qdrant
-            collection_name = self._get_collection_name(input_data.get("task_type", ""))
-            if collection_name:
-                qdrant = await get_qdrant()
-                query_text = json.dumps(input_data)
+            if policy.collection:
+                query_text = build_query_text(task_type, input_data)
+                # Past the deadline (by default the running task's) the
+                # embedding call would only burn rate limit budget
+                check_deadline(deadline)
                 query_vector = await self.llm_service.generate_embeddings(query_text)
 
-                search_result = await qdrant.search(
-                    collection_name=collection_name,
-                    query_vector=query_vector,
-                    limit=5
+                context['vector_search_results'] = await search_memory(
+                    policy,
+                    query_vector,
+                    conditions=build_filter_conditions(policy, input_data)
                 )
-                context['vector_search_results'] = [hit.payload for hit in search_result]
                 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.warning(f"Failed to load context for task {task_id}: {e}")
 
         return context
 
-    async def _store_results(self, task_id: str, input_data: Dict[str, Any], response: AgentResponse):
-        """Store task results in memory and vector database"""
+    def _format_context(self, input_data: Dict[str, Any], max_chars: int = 2000) -> str:
+        """Render loaded memory hits as a compact prompt section"""
+        context = input_data.get("context") or {}
+        lines = []
+        for hit in context.get("vector_search_results", []):
+            summary = (hit.get("summary") or "").strip()
+            if summary:
+                lines.append(f"- [{hit.get('task_type')}] {summary[:400]}")
+        return "\n".join(lines)[:max_chars]
+
+    async def _store_results(
+        self,
+        task_id: str,
+        task_type: str,
+        input_data: Dict[str, Any],
+        response: AgentResponse,
+        deadline: Optional[float] = None
+    ):
+        """
+        Store task results in memory and vector database.
+        
+        Runs after the task succeeded, so a deadline passing here only skips
+        the remaining storage; the response is still returned.
+        """
         try:
-            # Store in Redis cache
-            redis = await get_redis()
-            await redis.setex(
-                f"agent_result:{self.agent_id}:{task_id}",
-                3600,  # 1 hour TTL
-                response.model_dump_json()
-            )
-            
-            # Store embeddings in Qdrant if we have text content
-            collection_name = self._get_collection_name(input_data.get("task_type", ""))
-            if collection_name and response.result and isinstance(response.result, dict):
-                qdrant = await get_qdrant()
-
-                # Create embedding from result
-                text_to_embed = json.dumps(response.result)
-                vector = await self.llm_service.generate_embeddings(text_to_embed)
-
-                point = PointStruct(
-                    id=str(uuid4()),
-                    vector=vector,
-                    payload={
-                        "task_id": task_id,
-                        "agent_id": self.agent_id,
-                        "agent_name": self.name,
-                        "task_type": input_data.get("task_type"),
-                        "input_data": input_data,
-                        "result": response.result,
-                        "timestamp": time.time()
-                    }
+            async with deadline_scope(deadline):
+                # Store in Redis cache
+                redis = await get_redis()
+                await redis.setex(
+                    f"agent_result:{self.agent_id}:{task_id}",
+                    3600,  # 1 hour TTL
+                    response.model_dump_json()
                 )
+            
+                # Store embeddings in Qdrant if we have text content
+                collection_name = self._get_collection_name(task_type)
+                if collection_name and response.result and isinstance(response.result, dict):
+                    qdrant = await get_qdrant()
+                    point_id = str(uuid4())
+
+                    # Bounded payload: never embeds the task input or loaded context
+                    payload, oversized_result = build_memory_payload(
+                        point_id=point_id,
+                        task_id=task_id,
+                        agent_id=self.agent_id,
+                        agent_name=self.name,
+                        task_type=task_type,
+                        input_data=input_data,
+                        result=response.result
+                    )
+                    if oversized_result is not None:
+                        await store_blob(redis, payload.result_ref, oversized_result)
 
-                await qdrant.upsert(collection_name=collection_name, points=[point], wait=True)
+                    # Create embedding from result
+                    text_to_embed = build_embedding_text(payload, response.result)
+                    vector = await self.llm_service.generate_embeddings(text_to_embed)
+
+                    point = PointStruct(
+                        id=point_id,
+                        vector=vector,
+                        payload=payload.model_dump()
+                    )
+
+                    # Write-through to the local tier first so it keeps serving
+                    # this memory even if the Qdrant upsert fails
+                    vector_cache.add(collection_name, point_id, vector, point.payload)
+                    await publish_vector_cache_point(collection_name, point_id, vector, point.payload)
+
+                    await qdrant.upsert(collection_name=collection_name, points=[point], wait=True)
                 
         except Exception as e:
             logger.warning(f"Failed to store results for task {task_id}: {e}")
     
+    async def _store_computed(self, task_type: str, input_data: Dict[str, Any], result: Dict[str, Any]):
+        """Store a newly computed result of a cached task, from inside its compute"""
+        task_id = input_data.get("task_id", str(uuid4()))
+        await self._store_results(task_id, task_type, input_data, AgentResponse(
+            agent_id=self.agent_id,
+            task_id=task_id,
+            status="completed",
+            result=result
+        ))
+    
     async def _update_metrics(self, execution_time: float, confidence_score: float):
         """Update agent performance metrics"""
         self.performance_metrics["tasks_completed"] += 1
@@ -185,29 +310,74 @@ class BaseAgent(ABC):
         self.performance_metrics["success_rate"] = (
             successful_tasks / len(self.performance_metrics["confidence_scores"])
         )
+        
+        # Aggregate across worker processes and replicas
+        await shared_metrics.record(self.agent_type, execution_time, confidence_score)
     
     async def get_performance_metrics(self) -> Dict[str, Any]:
         """Get current performance metrics"""
+        metrics = await shared_metrics.load(self.agent_type) or self.performance_metrics
+        llm_usage = await shared_metrics.load_usage(self.agent_type)
         return {
-            **self.performance_metrics,
+            **metrics,
+            "llm_usage": usage_summary(llm_usage) if llm_usage else self.llm_service.get_usage_stats(),
             "agent_id": self.agent_id,
             "name": self.name,
             "type": self.agent_type
         }
     
+    async def _generate(
+        self,
+        task_type: str,
+        prompt: str,
+        system_task_type: Optional[str] = None,
+        **kwargs
+    ) -> str:
+        """Generate a completion, letting the model router pick the tier for this task"""
+        # The system prompt is identical for every call of this agent and task
+        # type so the provider can cache it; only the variable input follows it
+        return await self.llm_service.generate_completion(
+            prompt=prompt,
+            system_prompt=self._create_system_prompt(system_task_type or task_type),
+            task_type=task_type,
+            agent_type=self.agent_type,
+            budget_task_type=system_task_type or task_type,
+            **kwargs
+        )
+    
+    def _stream(
+        self,
+        task_type: str,
+        prompt: str,
+        system_task_type: Optional[str] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """Streaming counterpart of _generate, yielding text deltas"""
+        return self.llm_service.stream_completion(
+            prompt=prompt,
+            system_prompt=self._create_system_prompt(system_task_type or task_type),
+            task_type=task_type,
+            agent_type=self.agent_type,
+            budget_task_type=system_task_type or task_type,
+            **kwargs
+        )
+    
     def _create_system_prompt(self, task_type: str) -> str:
-        """Create system prompt for the agent"""
+        """Create the stable, cacheable system prompt for the agent and task type"""
         base_prompt = f"""
         You are {self.name}, a specialized AI agent for YouTube content automation.
         Your role is to {self.agent_type} with high accuracy and efficiency.
         
-        Current task type: {task_type}
-        
         Guidelines:
         - Provide detailed, actionable responses
         - Include confidence scores for your recommendations
         - Consider YouTube algorithm preferences
         - Focus on audience engagement and retention
         - Ensure content is monetization-friendly
+        
+        Current task type: {task_type}
         """
-        return base_prompt
\ No newline at end of file
+        instructions = self.task_instructions.get(task_type)
+        if instructions:
+            base_prompt += f"\n{instructions}\n"
+        return base_prompt
@@ -1,15 +1,71 @@
-from typing import Dict, Any
+import asyncio
+import json
+import logging
+from typing import Dict, Any, List, Optional
 from uuid import uuid4
 
-from .base_agent import BaseAgent
-from ..models import AgentResponse
+from pydantic import ValidationError
+
+from .base_agent import BaseAgent, stable_agent_id
+from ..config import settings
+from ..events import publish_event
+from ..models import AgentResponse, RetrievalPolicy, Scene, VideoScript
+from ..services.dedup import SCRIPT, dedup_index, dedup_scope, format_avoid_list
+from ..services.json_stream import JSONArrayStreamParser, extract_json_object
+
+logger = logging.getLogger(__name__)
+
+# Shape of the script the model is asked to produce, from the VideoScript model
+SCRIPT_SCHEMA = json.dumps(VideoScript.model_json_schema())
+SCENE_SCHEMA = json.dumps(Scene.model_json_schema())
+
+# Script fields produced by the long-form outline; scenes come from the segments
+OUTLINE_FIELDS = ["title", "description", "keywords", "tags", "hooks", "call_to_actions"]
 
 class ContentStrategistAgent(BaseAgent):
     """Content Strategist Agent for script writing and content optimization"""
     
+    task_instructions = {
+        "script_generation": (
+            "Respond with a single JSON object matching this schema, "
+            "scenes in playback order with durations in seconds:\n" + SCRIPT_SCHEMA
+        ),
+        "script_outline": (
+            "Write only the outline of a long-form script, split into the requested number of "
+            "consecutive segments whose durations add up to the requested total.\n"
+            'Respond with a single JSON object with the keys "title", "description", '
+            '"keywords", "tags", "hooks", "call_to_actions" (the lists contain strings) and '
+            '"segments": a list of {"title", "summary", "duration"} objects, duration in seconds.'
+        ),
+        "script_segment": (
+            "Write the scenes of the requested segment only. Do not repeat other segments; "
+            "the previous and next segments are written separately.\n"
+            'Respond with a single JSON object {"scenes": [...]} where every scene matches:\n'
+            + SCENE_SCHEMA
+        ),
+        "script_stitching": (
+            "You are given the boundaries between independently written segments of a script. "
+            "For every boundary, give a scene transition and one short bridging sentence that "
+            "connects the two segments and keeps tone and terminology consistent.\n"
+            'Respond with a single JSON object {"boundaries": [{"transition", "bridge"}, ...]} '
+            "in the same order."
+        ),
+    }
+    
+    retrieval_policies = {
+        # Earlier scripts in the same niche, so new ones don't repeat them
+        "script_generation": RetrievalPolicy(
+            needs_context=True,
+            collection="video_scripts",
+            top_k=3,
+            score_threshold=0.8,
+            filter_fields=["niche"]
+        ),
+    }
+    
     def __init__(self):
         super().__init__(
-            agent_id=str(uuid4()),
+            agent_id=stable_agent_id("content_creation"),
             name="Content Strategist",
             agent_type="content_creation"
         )
@@ -39,25 +95,364 @@ class ContentStrategistAgent(BaseAgent):
         }
     
     async def _generate_script(self, input_data: Dict[str, Any]) -> AgentResponse:
+        """
+        Write a script, publishing its scenes as they are generated.
+        
+        Scenes go out before the script as a whole is validated and checked
+        for near-duplicates, so every script ends with a terminal status event
+        telling the video processor whether to keep or discard them.
+        """
+        task_id = input_data.get("task_id", str(uuid4()))
+        try:
+            response = await self._write_script(task_id, input_data)
+        except BaseException as e:
+            # Cancellation included: the scenes already sent must be discarded
+            await self._publish_script_status(task_id, input_data, "failed", reason=str(e) or type(e).__name__)
+            raise
+        
+        result = response.result or {}
+        if response.status != "completed":
+            await self._publish_script_status(task_id, input_data, "failed", reason=response.error)
+        elif "parse_error" in result:
+            await self._publish_script_status(
+                task_id, input_data, "failed", reason=f"Script did not match the schema: {result['parse_error']}"
+            )
+        elif result.get("near_duplicate"):
+            await self._publish_script_status(
+                task_id, input_data, "rejected",
+                reason=f"Near-duplicate of '{result['near_duplicate']['duplicate_of']}'"
+            )
+        else:
+            await self._publish_script_status(
+                task_id, input_data, "completed", scene_count=len(result["script"]["scenes"])
+            )
+        return response
+    
+    async def _write_script(self, task_id: str, input_data: Dict[str, Any]) -> AgentResponse:
         topic = input_data.get("topic", "")
         niche = input_data.get("niche", "general")
         duration = input_data.get("target_duration", 10)
         
         prompt = f"""Generate a YouTube script for: {topic} in the {niche} niche, target duration {duration} minutes."""
         
-        script = await self.llm_service.generate_completion(
-            prompt=prompt,
-            system_prompt=self._create_system_prompt("script_generation")
+        prior_scripts = self._format_context(input_data)
+        if prior_scripts:
+            prompt += f"\n\nScripts already produced in this niche (take a different angle):\n{prior_scripts}"
+        
+        scope = dedup_scope(input_data) if settings.DEDUP_ENABLED else None
+        produced = await dedup_index.recent_labels(scope, SCRIPT) if scope else []
+        if produced:
+            prompt += f"\n\nScripts already written for this channel (do not repeat or rephrase these titles):\n{format_avoid_list(produced)}"
+        
+        if duration >= settings.LONG_FORM_MIN_MINUTES:
+            return await self._generate_long_form_script(task_id, input_data, prompt, duration)
+        
+        # Scenes are handed to the video processor as soon as each one is
+        # complete instead of after the whole script has been generated
+        parser = JSONArrayStreamParser("scenes")
+        async for delta in self._stream("script_generation", prompt, json_mode=True, duration=duration):
+            for element in parser.feed(delta):
+                scene_index = parser.emitted - 1
+                try:
+                    scene = Scene.model_validate(element)
+                except ValidationError as e:
+                    logger.warning(f"Skipping invalid scene {scene_index} of task {task_id}: {e}")
+                    continue
+                await self._publish_scene(task_id, input_data, scene_index, scene)
+        
+        text = parser.text()
+        try:
+            script = VideoScript.model_validate(extract_json_object(text))
+        except (ValueError, ValidationError) as e:
+            logger.warning(f"Script for task {task_id} did not match the schema: {e}")
+            return AgentResponse(
+                agent_id=self.agent_id,
+                task_id=task_id,
+                status="completed",
+                result={"script": text, "parse_error": str(e)},
+                confidence_score=0.6
+            )
+        
+        duplicate = await self._check_novelty(input_data, script)
+        
+        return AgentResponse(
+            agent_id=self.agent_id,
+            task_id=task_id,
+            status="completed",
+            result={"script": script.model_dump(), "near_duplicate": duplicate},
+            confidence_score=0.4 if duplicate else 0.85
         )
+    
+    async def _check_novelty(self, input_data: Dict[str, Any], script: VideoScript) -> Optional[Dict[str, Any]]:
+        """Match of the script against the channel's earlier scripts; novel ones are indexed"""
+        scope = dedup_scope(input_data) if settings.DEDUP_ENABLED else None
+        if not scope:
+            return None
+        text = " ".join([script.title, script.description, *(scene.content for scene in script.scenes)])
+        _, rejected = await dedup_index.filter_new(
+            scope, SCRIPT, [(text, script.title)], llm=self.llm_service
+        )
+        if rejected:
+            logger.info(f"Script '{script.title}' is a near-duplicate of '{rejected[0]['duplicate_of']}'")
+        return rejected[0] if rejected else None
+    
+    async def _publish_scene(
+        self,
+        task_id: str,
+        input_data: Dict[str, Any],
+        scene_index: int,
+        scene: Scene,
+        segment_index: int = 0
+    ):
+        """
+        Hand one scene to the video processor. Scenes are ordered by segment,
+        then by scene_index within it; a later event for the same position
+        replaces the earlier one.
+        """
+        await publish_event(settings.SCENE_EVENTS_SUBJECT, {
+            "task_id": task_id,
+            "video_id": input_data.get("video_id"),
+            "segment_index": segment_index,
+            "scene_index": scene_index,
+            "scene": scene.model_dump()
+        })
+    
+    async def _publish_script_status(
+        self,
+        task_id: str,
+        input_data: Dict[str, Any],
+        status: str,
+        scene_count: Optional[int] = None,
+        reason: Optional[str] = None
+    ):
+        """Terminal event for a script's scenes: completed, rejected (near-duplicate) or failed"""
+        await publish_event(settings.SCRIPT_EVENTS_SUBJECT, {
+            "task_id": task_id,
+            "video_id": input_data.get("video_id"),
+            "status": status,
+            "scene_count": scene_count,
+            "reason": reason
+        })
+    
+    async def _generate_long_form_script(
+        self,
+        task_id: str,
+        input_data: Dict[str, Any],
+        brief: str,
+        duration: float
+    ) -> AgentResponse:
+        """
+        Outline first, then write all segments concurrently and stitch them.
+        
+        Wall-clock time is roughly one outline, the slowest segment and a short
+        transition pass, instead of decoding the whole script in one stream.
+        Each segment's scenes are published as soon as it is written; boundary
+        scenes changed by the transition pass are published again.
+        """
+        total_seconds = float(duration) * 60
+        segment_count = max(2, round(duration / settings.LONG_FORM_SEGMENT_MINUTES))
+        
+        outline = await self._generate_outline(brief, segment_count, total_seconds)
+        segments = outline["segments"]
+        
+        semaphore = asyncio.Semaphore(settings.SCRIPT_SEGMENT_CONCURRENCY)
+        
+        async def write(index: int) -> List[Scene]:
+            async with semaphore:
+                written = await self._generate_segment(outline, index)
+            for scene_index, scene in enumerate(written):
+                await self._publish_scene(task_id, input_data, scene_index, scene, segment_index=index)
+            return written
+        
+        segment_scenes = await asyncio.gather(*[write(i) for i in range(len(segments))])
+        
+        bridges = await self._generate_transitions(outline, segment_scenes)
+        stitched = self._stitch_segments(segment_scenes, bridges)
+        for segment_index, (written, final) in enumerate(zip(segment_scenes, stitched)):
+            for scene_index, (before, after) in enumerate(zip(written, final)):
+                if after != before:
+                    await self._publish_scene(task_id, input_data, scene_index, after, segment_index=segment_index)
+        
+        scenes = [scene for segment in stitched for scene in segment]
+        if not scenes:
+            return AgentResponse(
+                agent_id=self.agent_id,
+                task_id=task_id,
+                status="failed",
+                error="No scenes were generated for the long-form script"
+            )
+        
+        script = VideoScript(
+            **{field: outline[field] for field in OUTLINE_FIELDS},
+            scenes=scenes,
+            total_duration=sum(scene.duration for scene in scenes)
+        )
+        duplicate = await self._check_novelty(input_data, script)
         
         return AgentResponse(
             agent_id=self.agent_id,
-            task_id=input_data.get("task_id", str(uuid4())),
+            task_id=task_id,
             status="completed",
-            result={"script": script},
-            confidence_score=0.85
+            result={
+                "script": script.model_dump(),
+                "segments": [
+                    {**segment, "scene_count": len(written)}
+                    for segment, written in zip(segments, segment_scenes)
+                ],
+                "near_duplicate": duplicate
+            },
+            confidence_score=0.4 if duplicate else (0.85 if all(segment_scenes) else 0.7)
         )
     
+    async def _generate_outline(self, brief: str, segment_count: int, total_seconds: float) -> Dict[str, Any]:
+        """Compact outline: script metadata plus one summary per segment"""
+        prompt = f"""{brief}
+        
+        Segments: {segment_count}
+        Total duration: {total_seconds:.0f} seconds
+        """
+        
+        text = await self._generate("script_outline", prompt, json_mode=True)
+        try:
+            outline = extract_json_object(text)
+        except ValueError as e:
+            logger.warning(f"Script outline is not valid JSON, using an even split: {e}")
+            outline = {}
+        
+        segments = [
+            segment for segment in outline.get("segments") or []
+            if isinstance(segment, dict) and segment.get("summary")
+        ]
+        if not segments:
+            segments = [
+                {"title": f"Part {i + 1}", "summary": f"Part {i + 1} of {segment_count} of the script"}
+                for i in range(segment_count)
+            ]
+        for segment in segments:
+            try:
+                segment["duration"] = float(segment.get("duration") or 0)
+            except (TypeError, ValueError):
+                segment["duration"] = 0.0
+            if segment["duration"] <= 0:
+                segment["duration"] = total_seconds / len(segments)
+        # Segments are published as they are written, so each one is fitted
+        # to its own share of the requested total
+        planned = sum(segment["duration"] for segment in segments)
+        for segment in segments:
+            segment["duration"] *= total_seconds / planned
+        
+        normalized = {
+            field: outline.get(field) if isinstance(outline.get(field), list) else []
+            for field in ["keywords", "tags", "hooks", "call_to_actions"]
+        }
+        normalized["title"] = str(outline.get("title") or "Untitled")
+        normalized["description"] = str(outline.get("description") or "")
+        normalized["segments"] = segments
+        return normalized
+    
+    async def _generate_segment(self, outline: Dict[str, Any], index: int) -> List[Scene]:
+        """Write the scenes of one segment with the whole outline as shared context"""
+        segments = outline["segments"]
+        segment = segments[index]
+        overview = "\n".join(
+            f"{i + 1}. {s.get('title', '')}: {s['summary']}" for i, s in enumerate(segments)
+        )
+        
+        prompt = f"""Script title: {outline["title"]}
+        
+        Outline:
+        {overview}
+        
+        Write the scenes of segment {index + 1} ("{segment.get('title', '')}"), about
+        {segment["duration"]:.0f} seconds in total.
+        """
+        
+        text = await self._generate(
+            "script_segment",
+            prompt,
+            json_mode=True,
+            duration=segment["duration"] / 60
+        )
+        try:
+            elements = extract_json_object(text).get("scenes") or []
+        except ValueError as e:
+            logger.warning(f"Segment {index + 1} is not valid JSON: {e}")
+            return []
+        
+        scenes = []
+        for element in elements:
+            try:
+                scenes.append(Scene.model_validate(element))
+            except ValidationError as e:
+                logger.warning(f"Skipping invalid scene in segment {index + 1}: {e}")
+        
+        generated = sum(scene.duration for scene in scenes)
+        if generated > 0:
+            scale = segment["duration"] / generated
+            for scene in scenes:
+                scene.duration = round(scene.duration * scale, 2)
+        return scenes
+    
+    async def _generate_transitions(
+        self,
+        outline: Dict[str, Any],
+        segment_scenes: List[List[Scene]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Consistency pass over segment boundaries only.
+        
+        The model sees the last scene of each segment and the first scene of the
+        next, and returns a transition and a bridging line per boundary, so the
+        output stays small regardless of the script length.
+        """
+        boundaries = [
+            (i, segment_scenes[i][-1], segment_scenes[i + 1][0])
+            for i in range(len(segment_scenes) - 1)
+            if segment_scenes[i] and segment_scenes[i + 1]
+        ]
+        if not boundaries:
+            return []
+        
+        listing = "\n".join(
+            f"{n + 1}. END: {end.content}\n   START: {start.content}"
+            for n, (_, end, start) in enumerate(boundaries)
+        )
+        prompt = f"""Script title: {outline["title"]}
+        
+        Boundaries:
+        {listing}
+        """
+        
+        text = await self._generate("script_stitching", prompt, json_mode=True)
+        try:
+            answers = extract_json_object(text).get("boundaries") or []
+        except ValueError as e:
+            logger.warning(f"Transition pass is not valid JSON, stitching without bridges: {e}")
+            answers = []
+        
+        bridges: List[Optional[Dict[str, Any]]] = [None] * (len(segment_scenes) - 1)
+        for (i, _, _), answer in zip(boundaries, answers):
+            if isinstance(answer, dict):
+                bridges[i] = answer
+        return bridges
+    
+    def _stitch_segments(
+        self,
+        segment_scenes: List[List[Scene]],
+        bridges: List[Optional[Dict[str, Any]]]
+    ) -> List[List[Scene]]:
+        """Copies of the segments with the boundary transitions and bridging lines applied"""
+        stitched = [[scene.model_copy() for scene in segment] for segment in segment_scenes]
+        for i, bridge in enumerate(bridges):
+            # Bridges only exist between two non-empty segments
+            if not bridge:
+                continue
+            if bridge.get("bridge"):
+                stitched[i + 1][0].content = f"{bridge['bridge']} {stitched[i + 1][0].content}"
+            if bridge.get("transition"):
+                stitched[i][-1].transition = str(bridge["transition"])
+        return stitched
+    
     async def _optimize_content(self, input_data: Dict[str, Any]) -> AgentResponse:
         # Placeholder implementation
         return AgentResponse(
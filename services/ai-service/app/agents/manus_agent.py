@@ -1,13 +1,28 @@
 import asyncio
+import json
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 from uuid import uuid4
 
-from .base_agent import BaseAgent
-from ..models import AgentResponse, VideoScript, ContentIdea
+from pydantic import ValidationError
+
+from .base_agent import BaseAgent, stable_agent_id
+from ..config import settings
+from ..models import AgentResponse, VideoScript, ContentIdea, RetrievalPolicy
+from ..services.analytics import analytics_frame_for, analyze_frame, format_findings
+from ..services.checkpoints import open_checkpoint
+from ..services.dedup import IDEA, dedup_index, dedup_scope, format_avoid_list
+from ..services.diversity import mmr_select
+from ..services.json_stream import extract_json_object
+from ..services.memory import extract_memory_fields
+from ..services.result_cache import Uncacheable, result_cache
+from ..services.viral_model import get_viral_model
 
 logger = logging.getLogger(__name__)
 
+# Shape of each idea the ideation prompt asks for
+IDEA_SCHEMA = json.dumps(ContentIdea.model_json_schema())
+
 
 class ManusAgent(BaseAgent):
     """
@@ -17,9 +32,99 @@ class ManusAgent(BaseAgent):
     about content creation, optimization, and channel growth.
     """
     
+    task_instructions = {
+        "orchestrate_video_creation": """
+        Analyze the current content landscape of the given niche as the Manus orchestrator.
+        
+        Consider:
+        - Current trending topics
+        - Audience interests and pain points
+        - Content gaps in the market
+        - Competitive landscape
+        - Seasonal relevance
+        
+        Provide a strategic content recommendation with:
+        1. Primary topic focus
+        2. Content angle and unique value proposition
+        3. Target keywords for SEO
+        4. Estimated performance metrics
+        5. Resource requirements
+        """,
+        "video_strategy": """
+        Create a comprehensive video creation strategy from the given research, including:
+        
+        1. Content Structure:
+           - Hook (first 15 seconds)
+           - Main content segments
+           - Retention tactics
+           - Call-to-action placement
+        
+        2. Production Requirements:
+           - Script length and style
+           - Visual elements needed
+           - Audio requirements
+           - Editing complexity
+        
+        3. Optimization Strategy:
+           - Title variations for A/B testing
+           - Thumbnail concepts
+           - Description optimization
+           - Tag strategy
+        
+        4. Success Metrics:
+           - Expected CTR range
+           - Target retention rate
+           - Engagement predictions
+           - Revenue potential
+        
+        Respond with a single JSON object.
+        """,
+        "content_ideation": """
+        Generate the requested number of high-potential content ideas for the given niche,
+        covering clearly different angles, formats and audiences. Never repeat or rephrase
+        the prior ideas or the ideas already produced for the channel. For each idea weigh:
+        - Why it will perform well, target audience fit and algorithm compatibility
+        - Monetization potential
+        - Expected views, CTR, retention and viral potential
+        - Production complexity and resource needs
+        
+        Put the hook strategy and key talking points in the description.
+        
+        Respond with a JSON object {"ideas": [...]} where every idea matches this schema:
+        """ + IDEA_SCHEMA,
+    }
+    
+    retrieval_policies = {
+        # Research, scripts and performance memories fetched in one batch
+        "orchestrate_video_creation": RetrievalPolicy(
+            needs_context=True,
+            collection="research_data",
+            extra_collections=["video_scripts", "performance_data"],
+            top_k=3,
+            score_threshold=0.75,
+            filter_fields=["channel_id", "niche"]
+        ),
+        "content_ideation": RetrievalPolicy(
+            needs_context=True,
+            collection="research_data",
+            top_k=5,
+            score_threshold=0.75,
+            filter_fields=["channel_id", "niche"]
+        ),
+        "performance_optimization": RetrievalPolicy(
+            needs_context=True,
+            collection="performance_data",
+            top_k=3,
+            score_threshold=0.75,
+            filter_fields=["channel_id"]
+        ),
+    }
+    
+    cached_tasks = {"content_ideation"}
+    
     def __init__(self):
         super().__init__(
-            agent_id=str(uuid4()),
+            agent_id=stable_agent_id("primary_orchestrator"),
             name="Manus Orchestrator",
             agent_type="primary_orchestrator"
         )
@@ -73,78 +178,60 @@ class ManusAgent(BaseAgent):
         }
     
     async def _orchestrate_video_creation(self, input_data: Dict[str, Any]) -> AgentResponse:
-        """Orchestrate the complete video creation process"""
+        """
+        Orchestrate the complete video creation process.
+        
+        The research and strategy steps are checkpointed by task_id, so a
+        retry after a crash, failure or deadline resumes after the last
+        completed step instead of paying for it again. The checkpoint is
+        cleared once the orchestration completes, so a later run with the
+        same task_id starts fresh.
+        """
         
         video_id = input_data.get("video_id")
         channel_config = input_data.get("channel_config", {})
         
         try:
+            checkpoint = await open_checkpoint(
+                "orchestrate_video_creation", input_data.get("task_id"), input_data
+            )
+            
             # Step 1: Research and ideation
             research_prompt = f"""
-            As the Manus orchestrator, analyze the current content landscape for the niche: {channel_config.get('niche', 'general')}.
+            Niche: {channel_config.get('niche', 'general')}
             
-            Consider:
-            - Current trending topics
-            - Audience interests and pain points
-            - Content gaps in the market
-            - Competitive landscape
-            - Seasonal relevance
-            
-            Provide a strategic content recommendation with:
-            1. Primary topic focus
-            2. Content angle and unique value proposition
-            3. Target keywords for SEO
-            4. Estimated performance metrics
-            5. Resource requirements
+            What this channel has already researched, produced and measured:
+            {self._format_context(input_data) or "Nothing yet"}
             """
             
-            research_response = await self.llm_service.generate_completion(
-                prompt=research_prompt,
-                system_prompt=self._create_system_prompt("orchestrate_video_creation"),
-                max_tokens=2000
-            )
+            research_response = await checkpoint.step("research", lambda: self._generate(
+                "orchestrate_video_creation",
+                research_prompt
+            ))
             
             # Step 2: Create detailed content strategy
             strategy_prompt = f"""
-            Based on this research: {research_response}
-            
-            Create a comprehensive video creation strategy including:
-            
-            1. Content Structure:
-               - Hook (first 15 seconds)
-               - Main content segments
-               - Retention tactics
-               - Call-to-action placement
-            
-            2. Production Requirements:
-               - Script length and style
-               - Visual elements needed
-               - Audio requirements
-               - Editing complexity
-            
-            3. Optimization Strategy:
-               - Title variations for A/B testing
-               - Thumbnail concepts
-               - Description optimization
-               - Tag strategy
-            
-            4. Success Metrics:
-               - Expected CTR range
-               - Target retention rate
-               - Engagement predictions
-               - Revenue potential
-            
-            Format as JSON for easy parsing.
+            Research: {research_response}
             """
             
-            strategy_response = await self.llm_service.generate_completion(
-                prompt=strategy_prompt,
-                system_prompt=self._create_system_prompt("strategic_planning"),
-                max_tokens=3000
-            )
+            async def strategy() -> Any:
+                strategy_text = await self._generate(
+                    "orchestrate_video_creation",
+                    strategy_prompt,
+                    system_task_type="video_strategy",
+                    json_mode=True
+                )
+                try:
+                    return extract_json_object(strategy_text)
+                except ValueError as e:
+                    logger.warning(f"Content strategy is not valid JSON, keeping raw text: {e}")
+                    return Uncacheable(strategy_text)
+            
+            strategy_response = await checkpoint.step("strategy", strategy)
             
             # Step 3: Generate execution plan
             execution_plan = await self._create_execution_plan(strategy_response, input_data)
+            await checkpoint.clear()
             
             return AgentResponse(
                 agent_id=self.agent_id,
@@ -158,7 +245,8 @@ class ManusAgent(BaseAgent):
                         {"agent": "research_agent", "task": "detailed_research"},
                         {"agent": "content_strategist", "task": "script_generation"},
                         {"agent": "trend_predictor", "task": "performance_prediction"}
-                    ]
+                    ],
+                    "resumed_steps": checkpoint.resumed
                 },
                 confidence_score=0.85
             )
@@ -222,10 +310,9 @@ class ManusAgent(BaseAgent):
         """
         
         try:
-            strategic_plan = await self.llm_service.generate_completion(
-                prompt=planning_prompt,
-                system_prompt=self._create_system_prompt("strategic_planning"),
-                max_tokens=4000
+            strategic_plan = await self._generate(
+                "strategic_planning",
+                planning_prompt
             )
             
             return AgentResponse(
@@ -257,13 +344,20 @@ class ManusAgent(BaseAgent):
         """Analyze and optimize content performance"""
         
         performance_data = input_data.get("performance_data", {})
-        video_analytics = input_data.get("video_analytics", [])
+        
+        # Raw per-video rows stay out of the prompt; only computed findings go in
+        frame = await analytics_frame_for(input_data)
+        findings = analyze_frame(frame) if frame is not None else {}
         
         optimization_prompt = f"""
         As Manus, analyze this performance data and provide optimization recommendations:
         
         Overall Performance: {performance_data}
-        Video Analytics: {video_analytics}
+        Video Analytics Findings:
+        {format_findings(findings)}
+        
+        Previous Optimization Findings:
+        {self._format_context(input_data) or "None"}
         
         Analyze:
         1. Performance patterns and trends
@@ -284,10 +378,9 @@ class ManusAgent(BaseAgent):
         """
         
         try:
-            optimization_analysis = await self.llm_service.generate_completion(
-                prompt=optimization_prompt,
-                system_prompt=self._create_system_prompt("performance_optimization"),
-                max_tokens=3000
+            optimization_analysis = await self._generate(
+                "performance_optimization",
+                optimization_prompt
             )
             
             return AgentResponse(
@@ -296,6 +389,7 @@ class ManusAgent(BaseAgent):
                 status="completed",
                 result={
                     "optimization_analysis": optimization_analysis,
+                    "analytics_findings": findings,
                     "priority_actions": [
                         "Improve video hooks based on retention data",
                         "Optimize thumbnail click-through rates",
@@ -326,64 +420,112 @@ class ManusAgent(BaseAgent):
         audience_data = input_data.get("audience_data", {})
         trending_topics = input_data.get("trending_topics", [])
         
-        ideation_prompt = f"""
-        As Manus, generate strategic content ideas for this niche: {niche}
-        
-        Audience Data: {audience_data}
-        Current Trends: {trending_topics}
-        
-        Generate 10 high-potential content ideas with:
-        
-        1. Strategic Reasoning:
-           - Why this idea will perform well
-           - Target audience fit
-           - Algorithm compatibility
-           - Monetization potential
-        
-        2. Content Details:
-           - Compelling title options
-           - Hook strategies
-           - Key talking points
-           - Visual requirements
-           - Estimated duration
-        
-        3. Performance Predictions:
-           - Expected view range
-           - CTR estimate
-           - Retention prediction
-           - Engagement forecast
-           - Viral potential score
-        
-        4. Production Requirements:
-           - Complexity level
-           - Resource needs
-           - Timeline estimate
-           - Special requirements
-        
-        Rank ideas by overall potential and strategic value.
-        """
+        async def ideate() -> Any:
+            await self._attach_context("content_ideation", input_data)
+            
+            scope = dedup_scope(input_data) if settings.DEDUP_ENABLED else None
+            produced = await dedup_index.recent_labels(scope, IDEA) if scope else []
+            
+            # The whole candidate pool does not fit one completion's output
+            # budget, so it is written in smaller batches concurrently
+            pool = settings.IDEATION_CANDIDATE_POOL
+            size = max(1, settings.IDEATION_BATCH_SIZE)
+            counts = [min(size, pool - start) for start in range(0, pool, size)]
+            
+            def ideation_prompt(batch: int, count: int) -> str:
+                return f"""
+            Niche: {niche}
+            Number of ideas: {count} (batch {batch + 1} of {len(counts)})
+            
+            Audience Data: {audience_data}
+            Current Trends: {trending_topics}
+            
+            Related Prior Research and Ideas:
+            {self._format_context(input_data) or "None"}
+            
+            Ideas already produced for this channel:
+            {format_avoid_list(produced) or "None"}
+            """
+            
+            texts = await asyncio.gather(*[
+                self._generate(
+                    "content_ideation",
+                    ideation_prompt(batch, count),
+                    json_mode=True,
+                    items=count
+                )
+                for batch, count in enumerate(counts)
+            ])
+            
+            result = {
+                "strategic_insights": {
+                    "market_opportunities": "High demand for educational tech content",
+                    "competitive_gaps": "Lack of beginner-friendly explanations",
+                    "trending_angles": "AI automation, productivity hacks"
+                },
+                "implementation_priority": "High-impact, low-effort content first"
+            }
+            
+            ideas = []
+            errors = []
+            for batch, text in enumerate(texts):
+                try:
+                    ideas.extend(self._parse_content_ideas(text))
+                except ValueError as e:
+                    logger.warning(f"Content ideas of batch {batch + 1} did not match the schema: {e}")
+                    errors.append(str(e))
+            if not ideas:
+                return Uncacheable({"content_ideas": "\n".join(texts), "parse_error": "; ".join(errors), **result})
+            
+            # Drop ideas that repeat earlier ones (or each other) before they
+            # cost a script generation
+            candidates = len(ideas)
+            rejected = []
+            if scope and ideas:
+                kept, rejected = await dedup_index.filter_new(
+                    scope, IDEA, [(idea.title, idea.title) for idea in ideas],
+                    llm=self.llm_service, register=False
+                )
+                ideas = [ideas[position] for position in kept]
+            
+            selected = await self._select_ideas(ideas, niche)
+            if scope and selected:
+                await dedup_index.register(scope, IDEA, [(idea.title, idea.title) for idea, _ in selected])
+            
+            result = {
+                "content_ideas": [
+                    {**idea.model_dump(), "predicted_potential": round(potential, 4)}
+                    for idea, potential in selected
+                ],
+                "candidates": candidates,
+                "rejected_duplicates": rejected,
+                **result
+            }
+            await self._store_computed("content_ideation", input_data, result)
+            return result
         
         try:
-            content_ideas = await self.llm_service.generate_completion(
-                prompt=ideation_prompt,
-                system_prompt=self._create_system_prompt("content_ideation"),
-                max_tokens=4000
+            # Ideas depend on the channel's memory as well as the niche
+            result, cache_status = await result_cache.get_or_compute(
+                "content_ideation",
+                {
+                    "niche": niche.strip().lower(),
+                    "channel_id": extract_memory_fields(input_data)["channel_id"],
+                    "audience_data": audience_data,
+                    "trending_topics": trending_topics
+                },
+                ideate,
+                settings.IDEATION_CACHE_FRESH_TTL,
+                settings.IDEATION_CACHE_STALE_TTL
             )
             
             return AgentResponse(
                 agent_id=self.agent_id,
                 task_id=input_data.get("task_id", str(uuid4())),
                 status="completed",
-                result={
-                    "content_ideas": content_ideas,
-                    "strategic_insights": {
-                        "market_opportunities": "High demand for educational tech content",
-                        "competitive_gaps": "Lack of beginner-friendly explanations",
-                        "trending_angles": "AI automation, productivity hacks"
-                    },
-                    "implementation_priority": "High-impact, low-effort content first"
-                },
-                confidence_score=0.87
+                result=result,
+                confidence_score=0.87,
+                cache_status=cache_status
             )
             
         except Exception as e:
@@ -394,7 +536,48 @@ class ManusAgent(BaseAgent):
                 error=str(e)
             )
     
-    async def _create_execution_plan(self, strategy: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def _select_ideas(self, ideas: List[ContentIdea], niche: str) -> List[Tuple[ContentIdea, float]]:
+        """
+        Final idea set by maximal marginal relevance over the candidate pool.
+        
+        Potential is the local viral model's score when a model is trained,
+        else the idea's own viral_potential; candidates are embedded in one
+        batch (mostly cache hits for recurring titles).
+        """
+        if not ideas:
+            return []
+        
+        model = get_viral_model()
+        if model is not None:
+            potential = model.score([idea.model_dump() for idea in ideas], niche).tolist()
+        else:
+            potential = [idea.viral_potential for idea in ideas]
+        
+        count = settings.IDEATION_FINAL_COUNT
+        if len(ideas) <= count:
+            order = sorted(range(len(ideas)), key=lambda i: -potential[i])
+        else:
+            embeddings = await self.llm_service.generate_embeddings_batch(
+                [f"{idea.title}. {idea.description}" for idea in ideas]
+            )
+            order = mmr_select(embeddings, potential, count)
+        return [(ideas[i], float(potential[i])) for i in order]
+    
+    def _parse_content_ideas(self, text: str) -> List[ContentIdea]:
+        """Valid ideas of a JSON ideation response; raises ValueError if there are none"""
+        data = extract_json_object(text)
+        raw_ideas = data.get("ideas") if isinstance(data.get("ideas"), list) else []
+        ideas = []
+        for raw in raw_ideas:
+            try:
+                ideas.append(ContentIdea.model_validate(raw))
+            except ValidationError as e:
+                logger.warning(f"Skipping invalid content idea: {e}")
+        if not ideas:
+            raise ValueError("No valid content ideas in the response")
+        return ideas
+    
+    async def _create_execution_plan(self, strategy: Any, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create detailed execution plan for video creation"""
         
         return {
@@ -1,15 +1,18 @@
+import asyncio
 from typing import Dict, Any
 from uuid import uuid4
 
-from .base_agent import BaseAgent
+from .base_agent import BaseAgent, stable_agent_id
 from ..models import AgentResponse
+from ..services.ab_testing import analyze_experiments
+from ..services.analytics import analytics_frame_for, analyze_frame, format_findings
 
 class PerformanceAnalystAgent(BaseAgent):
     """Performance Analyst Agent for analytics and optimization"""
     
     def __init__(self):
         super().__init__(
-            agent_id=str(uuid4()),
+            agent_id=stable_agent_id("performance_analysis"),
             name="Performance Analyst",
             agent_type="performance_analysis"
         )
@@ -37,21 +40,70 @@ class PerformanceAnalystAgent(BaseAgent):
         }
     
     async def _analyze_performance(self, input_data: Dict[str, Any]) -> AgentResponse:
-        # Placeholder implementation
+        # Metrics are computed locally; the LLM only interprets the findings
+        frame = await analytics_frame_for(input_data)
+        findings = analyze_frame(frame) if frame is not None else {}
+        
+        if not findings.get("channel"):
+            return AgentResponse(
+                agent_id=self.agent_id,
+                task_id=input_data.get("task_id", str(uuid4())),
+                status="completed",
+                result={"findings": findings, "analysis": "No analytics data available", "recommendations": []},
+                confidence_score=0.5
+            )
+        
+        prompt = f"""Interpret these YouTube channel analytics and give 3-5 prioritized, specific recommendations.
+
+        {format_findings(findings)}
+        """
+        
+        analysis = await self._generate(
+            "performance_analysis",
+            prompt
+        )
+        
         return AgentResponse(
             agent_id=self.agent_id,
             task_id=input_data.get("task_id", str(uuid4())),
             status="completed",
-            result={"analysis": "Performance analysis completed", "recommendations": []},
+            result={"findings": findings, "analysis": analysis},
             confidence_score=0.86
         )
     
     async def _ab_test_analysis(self, input_data: Dict[str, Any]) -> AgentResponse:
-        # Placeholder implementation  
+        # Either a batch of experiments or the variants of a single one
+        experiments = input_data.get("experiments")
+        if not experiments and input_data.get("variants"):
+            experiments = [{
+                "experiment_id": input_data.get("experiment_id"),
+                "video_id": input_data.get("video_id"),
+                "variants": input_data["variants"]
+            }]
+        
+        if not experiments:
+            return AgentResponse(
+                agent_id=self.agent_id,
+                task_id=input_data.get("task_id", str(uuid4())),
+                status="failed",
+                error="No A/B test variants provided"
+            )
+        
+        # Sampling is CPU-bound; keep it off the event loop
+        results = await asyncio.to_thread(analyze_experiments, experiments)
+        
+        result: Dict[str, Any] = {"experiments": results}
+        if len(results) == 1:
+            result.update({
+                "decision": results[0]["decision"],
+                "winner": results[0]["winner"],
+                "confidence": results[0]["leader_prob_best"]
+            })
+        
         return AgentResponse(
             agent_id=self.agent_id,
             task_id=input_data.get("task_id", str(uuid4())),
             status="completed",
-            result={"winner": "variant_a", "confidence": 0.95},
-            confidence_score=0.91
-        )
\ No newline at end of file
+            result=result,
+            confidence_score=results[0]["leader_prob_best"] if len(results) == 1 else 0.91
+        )
@@ -0,0 +1,36 @@
+from typing import Dict, List, Optional, Type
+
+from .base_agent import BaseAgent
+from .manus_agent import ManusAgent
+from .content_strategist import ContentStrategistAgent
+from .trend_predictor import TrendPredictorAgent
+from .research_agent import ResearchAgent
+from .performance_analyst import PerformanceAnalystAgent
+
+AGENT_CLASSES: Dict[str, Type[BaseAgent]] = {
+    "manus": ManusAgent,
+    "content_strategist": ContentStrategistAgent,
+    "trend_predictor": TrendPredictorAgent,
+    "research_agent": ResearchAgent,
+    "performance_analyst": PerformanceAnalystAgent,
+}
+
+# One shared instance per agent, built on first use and reused by the HTTP
+# API and the message processor
+_agents: Dict[str, BaseAgent] = {}
+
+
+def get_agent(name: str) -> Optional[BaseAgent]:
+    """Get the shared agent instance for a name, constructing it lazily"""
+    agent = _agents.get(name)
+    if agent is None:
+        agent_class = AGENT_CLASSES.get(name)
+        if agent_class is None:
+            return None
+        agent = agent_class()
+        _agents[name] = agent
+    return agent
+
+
+def agent_names() -> List[str]:
+    return list(AGENT_CLASSES)
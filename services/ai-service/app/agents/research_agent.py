@@ -1,15 +1,30 @@
 from typing import Dict, Any
 from uuid import uuid4
 
-from .base_agent import BaseAgent
-from ..models import AgentResponse
+from .base_agent import BaseAgent, stable_agent_id
+from ..config import settings
+from ..models import AgentResponse, RetrievalPolicy
+from ..services.result_cache import result_cache
 
 class ResearchAgent(BaseAgent):
     """Research Agent for comprehensive market and content research"""
     
+    retrieval_policies = {
+        # Build on earlier findings for the same niche instead of starting over
+        "comprehensive_research": RetrievalPolicy(
+            needs_context=True,
+            collection="research_data",
+            top_k=3,
+            score_threshold=0.8,
+            filter_fields=["niche"]
+        ),
+    }
+    
+    cached_tasks = {"comprehensive_research"}
+    
     def __init__(self):
         super().__init__(
-            agent_id=str(uuid4()),
+            agent_id=stable_agent_id("research_analysis"),
             name="Research Agent",
             agent_type="research_analysis"
         )
@@ -40,19 +55,39 @@ class ResearchAgent(BaseAgent):
         topic = input_data.get("topic", "")
         niche = input_data.get("niche", "general")
         
-        prompt = f"""Conduct comprehensive research on {topic} in the {niche} niche."""
+        async def research() -> Dict[str, Any]:
+            # Context is only worth fetching when the research actually runs
+            await self._attach_context("comprehensive_research", input_data)
+            
+            prompt = f"""Conduct comprehensive research on {topic} in the {niche} niche."""
+            
+            prior_research = self._format_context(input_data)
+            if prior_research:
+                prompt += f"\n\nEarlier findings for this niche (update rather than repeat):\n{prior_research}"
+            
+            findings = await self._generate(
+                "comprehensive_research",
+                prompt
+            )
+            result = {"research": findings}
+            await self._store_computed("comprehensive_research", input_data, result)
+            return result
         
-        research = await self.llm_service.generate_completion(
-            prompt=prompt,
-            system_prompt=self._create_system_prompt("comprehensive_research")
+        result, cache_status = await result_cache.get_or_compute(
+            "comprehensive_research",
+            {"niche": niche.strip().lower(), "topic": topic.strip().lower()},
+            research,
+            settings.RESEARCH_CACHE_FRESH_TTL,
+            settings.RESEARCH_CACHE_STALE_TTL
         )
         
         return AgentResponse(
             agent_id=self.agent_id,
             task_id=input_data.get("task_id", str(uuid4())),
             status="completed",
-            result={"research": research},
-            confidence_score=0.88
+            result=result,
+            confidence_score=0.88,
+            cache_status=cache_status
         )
     
     async def _competitor_analysis(self, input_data: Dict[str, Any]) -> AgentResponse:
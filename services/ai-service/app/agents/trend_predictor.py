@@ -1,15 +1,21 @@
+import asyncio
 from typing import Dict, Any
 from uuid import uuid4
 
-from .base_agent import BaseAgent
+from .base_agent import BaseAgent, stable_agent_id
+from ..config import settings
 from ..models import AgentResponse
+from ..services.result_cache import result_cache
+from ..services.viral_model import get_viral_model
 
 class TrendPredictorAgent(BaseAgent):
     """Trend Predictor Agent for market analysis and trend forecasting"""
     
+    cached_tasks = {"trend_analysis"}
+    
     def __init__(self):
         super().__init__(
-            agent_id=str(uuid4()),
+            agent_id=stable_agent_id("trend_analysis"),
             name="Trend Predictor",
             agent_type="trend_analysis"
         )
@@ -39,27 +45,85 @@ class TrendPredictorAgent(BaseAgent):
     async def _analyze_trends(self, input_data: Dict[str, Any]) -> AgentResponse:
         niche = input_data.get("niche", "general")
         
-        prompt = f"""Analyze current trends in the {niche} niche for YouTube content."""
+        async def analyze() -> Dict[str, Any]:
+            prompt = f"""Analyze current trends in the {niche} niche for YouTube content."""
+            
+            analysis = await self._generate(
+                "trend_analysis",
+                prompt
+            )
+            result = {"trend_analysis": analysis}
+            await self._store_computed("trend_analysis", input_data, result)
+            return result
         
-        analysis = await self.llm_service.generate_completion(
-            prompt=prompt,
-            system_prompt=self._create_system_prompt("trend_analysis")
+        # Trends depend only on the niche, so every channel in it shares them
+        result, cache_status = await result_cache.get_or_compute(
+            "trend_analysis",
+            {"niche": niche.strip().lower()},
+            analyze,
+            settings.TREND_CACHE_FRESH_TTL,
+            settings.TREND_CACHE_STALE_TTL
         )
         
         return AgentResponse(
             agent_id=self.agent_id,
             task_id=input_data.get("task_id", str(uuid4())),
             status="completed",
-            result={"trend_analysis": analysis},
-            confidence_score=0.87
+            result=result,
+            confidence_score=0.87,
+            cache_status=cache_status
         )
     
     async def _predict_viral_potential(self, input_data: Dict[str, Any]) -> AgentResponse:
-        # Placeholder implementation
+        # A single idea or a pool of candidates to rank
+        ideas = input_data.get("ideas")
+        single = not isinstance(ideas, list)
+        if single:
+            ideas = [input_data.get("idea") or input_data]
+        ideas = [idea for idea in ideas if isinstance(idea, dict)][:settings.VIRAL_MAX_CANDIDATES]
+        niche = input_data.get("niche")
+        
+        model = get_viral_model()
+        if model is None or not ideas:
+            return AgentResponse(
+                agent_id=self.agent_id,
+                task_id=input_data.get("task_id", str(uuid4())),
+                status="failed",
+                error="Viral model is not trained yet" if model is None else "No ideas to score"
+            )
+        
+        # Large pools are scored off the event loop
+        if len(ideas) > 1000:
+            scores = await asyncio.to_thread(model.score, ideas, niche)
+        else:
+            scores = model.score(ideas, niche)
+        
+        if single:
+            result = {
+                "viral_score": round(float(scores[0]), 4),
+                "factors": model.explain(ideas[0], niche),
+                "model_version": model.version
+            }
+        else:
+            top_k = int(input_data.get("top_k") or len(ideas))
+            ranked = scores.argsort()[::-1][:top_k]
+            result = {
+                "ranked_ideas": [
+                    {
+                        **ideas[i],
+                        "viral_score": round(float(scores[i]), 4),
+                        "factors": model.explain(ideas[i], niche)
+                    }
+                    for i in ranked
+                ],
+                "scored": len(ideas),
+                "model_version": model.version
+            }
+        
         return AgentResponse(
             agent_id=self.agent_id,
             task_id=input_data.get("task_id", str(uuid4())),
             status="completed",
-            result={"viral_score": 0.75, "factors": ["trending topic", "good timing"]},
-            confidence_score=0.78
+            result=result,
+            confidence_score=model.holdout_auc or 0.78
         )
\ No newline at end of file
@@ -1,29 +1,90 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, Any, List
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import asyncio
 import logging
+from uuid import uuid4
 
-from .agents import ManusAgent, ContentStrategistAgent, TrendPredictorAgent, ResearchAgent
-from .models import ScriptGenerationRequest, ResearchRequest, AgentResponse
+from .config import settings
+from .agents import get_agent, agent_names
+from .models import ScriptGenerationRequest, ResearchRequest, AgentResponse, BulkSentimentRequest, BulkABTestRequest
+from .services.ab_testing import analyze_experiments
+from .services.analytics_store import fetch_metric_windows
+from .services.deadline import deadline_after
+from .services.export import FORMATS, PARQUET, SOURCES, decode_cursor, parquet_available, stream_export
+from .services.llm_service import LLMService
+from .services.model_router import ROUTING_TABLE, model_router
+from .services.sentiment import aggregate_by_video, sentiment_analyzer
+from .services.token_budget import TASK_OUTPUT_TOKENS, token_budget
 
 logger = logging.getLogger(__name__)
 
+# LLM access for endpoints that are not served by an agent
+llm_service = LLMService()
+
 router = APIRouter()
 
-# Initialize agents
-manus_agent = ManusAgent()
-content_agent = ContentStrategistAgent()
-trend_agent = TrendPredictorAgent()
-research_agent = ResearchAgent()
+# Optional client timeout in seconds; without it TASK_DEFAULT_TIMEOUT applies
+REQUEST_TIMEOUT_HEADER = "X-Request-Timeout"
+
+
+def request_deadline(http_request: Request) -> Optional[float]:
+    """Absolute deadline of an HTTP request's task"""
+    timeout = http_request.headers.get(REQUEST_TIMEOUT_HEADER)
+    try:
+        return deadline_after(float(timeout) if timeout else settings.TASK_DEFAULT_TIMEOUT)
+    except ValueError:
+        logger.warning(f"Ignoring invalid {REQUEST_TIMEOUT_HEADER} header: {timeout!r}")
+        return deadline_after(settings.TASK_DEFAULT_TIMEOUT)
+
+
+async def run_task(
+    http_request: Request,
+    agent_name: str,
+    task_id: str,
+    task_type: str,
+    input_data: Dict[str, Any]
+) -> AgentResponse:
+    """
+    Run an agent task for an HTTP request.
+
+    The task is cancelled as soon as the client disconnects, which also
+    cancels its in-flight provider calls, so nobody pays for a result that
+    can no longer be delivered.
+    """
+    agent = get_agent(agent_name)
+    task = asyncio.create_task(agent.process_task(
+        task_id=task_id,
+        task_type=task_type,
+        input_data=input_data,
+        deadline=request_deadline(http_request)
+    ))
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                logger.info(f"Client disconnected, cancelling task {task_id}")
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                return AgentResponse(
+                    agent_id=agent.agent_id,
+                    task_id=task_id,
+                    status="cancelled",
+                    error="Client disconnected"
+                )
+    finally:
+        task.cancel()
 
 
 @router.get("/agents")
 async def get_agents():
     """Get list of available AI agents"""
     agents = [
-        await manus_agent.get_capabilities(),
-        await content_agent.get_capabilities(),
-        await trend_agent.get_capabilities(),
-        await research_agent.get_capabilities(),
+        await get_agent(name).get_capabilities()
+        for name in agent_names()
     ]
     
     return {
@@ -33,11 +94,14 @@ async def get_agents():
 
 
 @router.post("/agents/manus/orchestrate")
-async def orchestrate_video_creation(request: Dict[str, Any]):
+async def orchestrate_video_creation(request: Dict[str, Any], http_request: Request):
     """Orchestrate video creation using Manus agent"""
     try:
-        response = await manus_agent.process_task(
-            task_id=request.get("task_id", "orchestrate_task"),
+        response = await run_task(
+            http_request,
+            "manus",
+            # Retrying with the returned task_id resumes from the last completed step
+            task_id=request.get("task_id") or f"orchestrate_{uuid4().hex}",
             task_type="orchestrate_video_creation",
             input_data=request
         )
@@ -50,10 +114,12 @@ async def orchestrate_video_creation(request: Dict[str, Any]):
 
 
 @router.post("/agents/manus/strategy")
-async def create_strategy(request: Dict[str, Any]):
+async def create_strategy(request: Dict[str, Any], http_request: Request):
     """Create strategic plan using Manus agent"""
     try:
-        response = await manus_agent.process_task(
+        response = await run_task(
+            http_request,
+            "manus",
             task_id=request.get("task_id", "strategy_task"),
             task_type="strategic_planning",
             input_data=request
@@ -67,10 +133,12 @@ async def create_strategy(request: Dict[str, Any]):
 
 
 @router.post("/content/script")
-async def generate_script(request: ScriptGenerationRequest):
+async def generate_script(request: ScriptGenerationRequest, http_request: Request):
     """Generate video script"""
     try:
-        response = await content_agent.process_task(
+        response = await run_task(
+            http_request,
+            "content_strategist",
             task_id="script_generation",
             task_type="script_generation",
             input_data=request.model_dump()
@@ -84,10 +152,12 @@ async def generate_script(request: ScriptGenerationRequest):
 
 
 @router.post("/content/ideas")
-async def generate_content_ideas(request: Dict[str, Any]):
+async def generate_content_ideas(request: Dict[str, Any], http_request: Request):
     """Generate content ideas"""
     try:
-        response = await manus_agent.process_task(
+        response = await run_task(
+            http_request,
+            "manus",
             task_id="content_ideation",
             task_type="content_ideation",
             input_data=request
@@ -101,10 +171,12 @@ async def generate_content_ideas(request: Dict[str, Any]):
 
 
 @router.post("/research/comprehensive")
-async def conduct_research(request: ResearchRequest):
+async def conduct_research(request: ResearchRequest, http_request: Request):
     """Conduct comprehensive research"""
     try:
-        response = await research_agent.process_task(
+        response = await run_task(
+            http_request,
+            "research_agent",
             task_id="research_task",
             task_type="comprehensive_research",
             input_data=request.model_dump()
@@ -118,10 +190,12 @@ async def conduct_research(request: ResearchRequest):
 
 
 @router.post("/trends/analyze")
-async def analyze_trends(request: Dict[str, Any]):
+async def analyze_trends(request: Dict[str, Any], http_request: Request):
     """Analyze trends for given topic/niche"""
     try:
-        response = await trend_agent.process_task(
+        response = await run_task(
+            http_request,
+            "trend_predictor",
             task_id="trend_analysis",
             task_type="trend_analysis",
             input_data=request
@@ -134,17 +208,152 @@ async def analyze_trends(request: Dict[str, Any]):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/trends/viral-ranking")
+async def rank_viral_potential(request: Dict[str, Any], http_request: Request):
+    """Rank a pool of content ideas by predicted viral potential"""
+    if len(request.get("ideas") or []) > settings.VIRAL_MAX_CANDIDATES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.VIRAL_MAX_CANDIDATES} ideas per request"
+        )
+    
+    try:
+        response = await run_task(
+            http_request,
+            "trend_predictor",
+            task_id="viral_ranking",
+            task_type="viral_prediction",
+            input_data={**request, "ideas": request.get("ideas") or []}
+        )
+        
+        return response.model_dump()
+        
+    except Exception as e:
+        logger.error(f"Viral ranking failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/sentiment/bulk")
+async def analyze_sentiment_bulk(request: BulkSentimentRequest):
+    """Score comment sentiment in bulk and aggregate it per video"""
+    if len(request.items) > settings.SENTIMENT_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.SENTIMENT_MAX_ITEMS} items per request"
+        )
+    
+    try:
+        results = await sentiment_analyzer.analyze(
+            [item.text for item in request.items],
+            llm=llm_service,
+            escalate=request.escalate
+        )
+        
+        return {
+            "results": [
+                {"comment_id": item.comment_id, "video_id": item.video_id, **result}
+                for item, result in zip(request.items, results)
+            ],
+            "videos": aggregate_by_video([item.video_id for item in request.items], results),
+            "escalated": sum(1 for result in results if result["source"] == "llm")
+        }
+        
+    except Exception as e:
+        logger.error(f"Bulk sentiment analysis failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/ab-tests/analyze")
+async def analyze_ab_tests(request: BulkABTestRequest):
+    """Evaluate many title/thumbnail experiments in one batch"""
+    if len(request.experiments) > settings.AB_TEST_MAX_EXPERIMENTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.AB_TEST_MAX_EXPERIMENTS} experiments per request"
+        )
+    
+    try:
+        results = await asyncio.to_thread(
+            analyze_experiments,
+            [experiment.model_dump() for experiment in request.experiments]
+        )
+        
+        decisions: Dict[str, int] = {}
+        for result in results:
+            decisions[result["decision"]] = decisions.get(result["decision"], 0) + 1
+        
+        return {"experiments": results, "decisions": decisions}
+        
+    except Exception as e:
+        logger.error(f"A/B test analysis failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/analytics/metrics")
+async def get_metric_windows(
+    channel_id: Optional[str] = None,
+    video_id: Optional[str] = None,
+    granularity: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    """Hourly or daily metric windows from the analytics rollups, keyset-paginated"""
+    try:
+        return await fetch_metric_windows(
+            channel_id=channel_id,
+            video_id=video_id,
+            granularity=granularity,
+            start=start,
+            end=end,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Metric window query failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/export/{source}")
+async def export_source(
+    source: str,
+    format: str = "ndjson",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+):
+    """
+    Stream agent_tasks, content_pipeline or memories as NDJSON or Parquet.
+
+    Every record has a _cursor; pass the last one received to resume.
+    """
+    # Validated up front: once streaming starts the status code is sent
+    if source not in SOURCES:
+        raise HTTPException(status_code=404, detail=f"Unknown export source: {source}")
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    if format == PARQUET and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+    try:
+        decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(
+        stream_export(source, format, cursor, limit),
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{source}.{format}"'}
+    )
+
+
 @router.get("/agents/{agent_id}/performance")
 async def get_agent_performance(agent_id: str):
     """Get performance metrics for specific agent"""
-    agent_map = {
-        "manus": manus_agent,
-        "content_strategist": content_agent,
-        "trend_predictor": trend_agent,
-        "research_agent": research_agent,
-    }
-    
-    agent = agent_map.get(agent_id)
+    agent = get_agent(agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
@@ -157,11 +366,32 @@ async def get_agent_performance(agent_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/models/routing")
+async def get_model_routing():
+    """Get the task-to-tier routing table and live per-tier health"""
+    return {
+        "routing_table": ROUTING_TABLE,
+        "tiers": model_router.get_stats()
+    }
+
+
+@router.get("/models/budgets")
+async def get_output_budgets():
+    """Get per-task output token budgets and how well completions fit them"""
+    return {
+        "task_output_tokens": TASK_OUTPUT_TOKENS,
+        "max_tokens": settings.MAX_TOKENS,
+        "tasks": token_budget.get_stats()
+    }
+
+
 @router.post("/optimize/performance")
-async def optimize_performance(request: Dict[str, Any]):
+async def optimize_performance(request: Dict[str, Any], http_request: Request):
     """Optimize content performance using Manus agent"""
     try:
-        response = await manus_agent.process_task(
+        response = await run_task(
+            http_request,
+            "manus",
             task_id="performance_optimization",
             task_type="performance_optimization",
             input_data=request
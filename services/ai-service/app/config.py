@@ -1,5 +1,5 @@
 import os
-from typing import Optional
+from typing import Dict, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -12,9 +12,24 @@ class Settings(BaseSettings):
     
     # NATS
     NATS_URL: str = "nats://localhost:4222"
+    SCENE_EVENTS_SUBJECT: str = "video.scene.ready"  # scenes published as they are generated
+    SCRIPT_EVENTS_SUBJECT: str = "video.script.status"  # keep or discard a script's published scenes
     
     # Vector Database
     QDRANT_URL: str = "http://localhost:6333"
+    QDRANT_PREFER_GRPC: bool = False
+    QDRANT_GRPC_PORT: int = 6334
+    QDRANT_HNSW_M: int = 16
+    QDRANT_HNSW_EF_CONSTRUCT: int = 128
+    QDRANT_SEARCH_HNSW_EF: int = 96
+    QDRANT_QUANTIZATION_QUANTILE: float = 0.99
+    QDRANT_RESCORE_OVERSAMPLING: float = 2.0
+    QDRANT_VECTORS_ON_DISK: bool = True
+    
+    # Local vector tier in front of Qdrant
+    VECTOR_CACHE_ENABLED: bool = True
+    VECTOR_CACHE_SIZE: int = 2048  # points per collection
+    VECTOR_CACHE_ADMIT_ON_MISS: bool = True
     
     # AI API Keys
     OPENAI_API_KEY: Optional[str] = None
@@ -28,11 +43,162 @@ class Settings(BaseSettings):
     DEBUG: bool = True
     LOG_LEVEL: str = "INFO"
     
+    # Deployment: WORKERS > 1 runs preforked gunicorn workers (see gunicorn.conf.py)
+    WORKERS: int = 1
+    NATS_QUEUE_GROUP: str = "ai-service"
+    NATS_SUBJECT_CONCURRENCY: int = 4  # messages of one subject handled at once per worker
+    NATS_SUBJECT_QUEUE_SIZE: int = 16  # received messages buffered per subject and worker
+    SHARED_STATE_ENABLED: bool = True
+    
+    # Provider rate limits shared by all workers (0 disables)
+    OPENAI_REQUESTS_PER_MINUTE: int = 500
+    ANTHROPIC_REQUESTS_PER_MINUTE: int = 50
+    RATE_LIMIT_WINDOW: float = 1.0  # seconds
+    LLM_MAX_CONCURRENCY: int = 32  # provider calls in flight per worker (0 = unbounded)
+    
+    # Task deadlines: HTTP and NATS tasks that set none get the default
+    TASK_DEFAULT_TIMEOUT: float = 900.0  # seconds (0 = no deadline)
+    DISCONNECT_POLL_INTERVAL: float = 1.0  # seconds between HTTP client disconnect checks
+    
+    # Saturation metrics: workers of a host share snapshots through Redis
+    SATURATION_PUBLISH_INTERVAL: float = 5.0
+    
+    # Startup: per-dependency initialization timeouts (seconds)
+    POSTGRES_INIT_TIMEOUT: float = 5.0
+    REDIS_INIT_TIMEOUT: float = 2.0
+    QDRANT_INIT_TIMEOUT: float = 10.0
+    DEPENDENCY_RETRY_INTERVAL: float = 5.0  # seconds between retries of failed dependencies
+    
     # AI Settings
-    DEFAULT_MODEL: str = "gpt-4"
-    MAX_TOKENS: int = 4000
+    DEFAULT_PROVIDER: str = "openai"
+    DEFAULT_MODEL: str = "gpt-4o"  # standard tier
+    FAST_MODEL: str = "gpt-3.5-turbo"
+    FLAGSHIP_MODEL: str = "gpt-4o"
+    ANTHROPIC_FAST_MODEL: str = "claude-3-haiku-20240307"
+    ANTHROPIC_DEFAULT_MODEL: str = "claude-3-sonnet-20240229"
+    ANTHROPIC_FLAGSHIP_MODEL: str = "claude-3-opus-20240229"
+    MAX_TOKENS: int = 4000  # upper bound of any output budget
     TEMPERATURE: float = 0.7
     
+    # Model routing: "<agent_type>:<task_type>" or "<task_type>" -> tier
+    MODEL_ROUTING_OVERRIDES: Dict[str, str] = {}
+    MODEL_ROUTER_MAX_ERROR_RATE: float = 0.25
+    MODEL_ROUTER_PROBE_RATE: float = 0.1
+    # Seconds per call of up to DEFAULT_OUTPUT_TOKENS output tokens; longer
+    # outputs get proportionally more time
+    FAST_TIER_LATENCY_BUDGET: float = 8.0
+    STANDARD_TIER_LATENCY_BUDGET: float = 30.0
+    FLAGSHIP_TIER_LATENCY_BUDGET: float = 60.0
+    
+    # Output token budgets (see app/services/token_budget.py)
+    SCRIPT_WORDS_PER_MINUTE: int = 150
+    TOKENS_PER_WORD: float = 1.35
+    DEFAULT_OUTPUT_TOKENS: int = 1000
+    TOKEN_BUDGET_HEADROOM: float = 1.2
+    TOKEN_BUDGET_SLACK: int = 64
+    TOKEN_BUDGET_OVER_RATIO: float = 1.5  # output above expected * ratio is over-generation
+    TOKEN_BUDGET_UNDER_RATIO: float = 0.5
+    
+    # Niche-level result cache (stale-while-revalidate), TTLs in seconds
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_REFRESH_LOCK_TTL: int = 300
+    TREND_CACHE_FRESH_TTL: int = 3600
+    TREND_CACHE_STALE_TTL: int = 24 * 3600
+    RESEARCH_CACHE_FRESH_TTL: int = 6 * 3600
+    RESEARCH_CACHE_STALE_TTL: int = 24 * 3600
+    IDEATION_CACHE_FRESH_TTL: int = 6 * 3600
+    IDEATION_CACHE_STALE_TTL: int = 24 * 3600
+    
+    # Step checkpoints of multi-step tasks, keyed by task_id
+    CHECKPOINT_ENABLED: bool = True
+    CHECKPOINT_TTL: int = 24 * 3600
+    
+    # Cache prewarming for active channels during off-peak hours (UTC)
+    PREWARM_ENABLED: bool = True
+    PREWARM_INTERVAL: int = 24 * 3600  # one cycle per interval across all workers
+    PREWARM_CHECK_INTERVAL: int = 300
+    PREWARM_WINDOW_START_HOUR: int = 2
+    PREWARM_WINDOW_END_HOUR: int = 6
+    PREWARM_MAX_JOB_SPACING: float = 300.0  # seconds between prewarm jobs at most
+    PREWARM_REQUESTED_MAX_AGE: int = 7 * 24 * 3600  # only keys requested this recently are prewarmed
+    
+    # Bulk sentiment: local lexicon scoring, LLM for ambiguous items only
+    SENTIMENT_AMBIGUOUS_MARGIN: float = 0.3
+    SENTIMENT_ESCALATION_MIN_TOKENS: int = 6
+    SENTIMENT_MAX_ESCALATIONS: int = 500  # per request
+    SENTIMENT_LLM_BATCH_SIZE: int = 50  # comments per prompt
+    SENTIMENT_LLM_CONCURRENCY: int = 4
+    SENTIMENT_MAX_ITEMS: int = 50000
+    
+    # Analytics engine over youtube_analytics
+    ANALYTICS_LOOKBACK_DAYS: int = 90
+    ANALYTICS_WINDOW_DAYS: int = 7  # rolling window and growth comparison period
+    ANALYTICS_OUTLIER_Z: float = 3.5  # robust z-score threshold
+    ANALYTICS_MAX_FINDINGS: int = 5  # videos per list passed to the LLM
+    ANALYTICS_PAGE_SIZE: int = 500  # rollup rows per page of the metrics API
+    ANALYTICS_MAX_PAGE_SIZE: int = 5000
+    ANALYTICS_PARTITION_MONTHS_AHEAD: int = 3
+    ANALYTICS_PARTITION_CHECK_INTERVAL: int = 24 * 3600
+    
+    # A/B testing: beta-binomial CTR posteriors and Monte Carlo decisions
+    AB_TEST_PRIOR_ALPHA: float = 1.0
+    AB_TEST_PRIOR_BETA: float = 1.0
+    AB_TEST_SAMPLES: int = 5000  # posterior draws per variant
+    AB_TEST_CHUNK_DRAWS: int = 4_000_000  # draws held in memory at once
+    AB_TEST_SEED: int = 7
+    AB_TEST_LOSS_THRESHOLD: float = 0.001  # expected CTR loss accepted when stopping
+    AB_TEST_MIN_IMPRESSIONS: int = 1000  # per variant before any decision
+    AB_TEST_MAX_EXPERIMENTS: int = 5000
+    
+    # Viral-potential scoring model (hashed logistic regression)
+    VIRAL_MODEL_PATH: str = "models/viral_model.npz"
+    VIRAL_MODEL_HASH_BITS: int = 18
+    VIRAL_MODEL_EPOCHS: int = 200
+    VIRAL_MODEL_L2: float = 1e-4
+    VIRAL_MODEL_HORIZON_DAYS: int = 28  # views this long after publishing define the label
+    VIRAL_MODEL_POSITIVE_QUANTILE: float = 0.8  # top 20% of a channel's videos are positives
+    VIRAL_MODEL_MIN_CHANNEL_VIDEOS: int = 5
+    VIRAL_MAX_CANDIDATES: int = 20000
+    
+    # Near-duplicate index (MinHash/LSH) of produced ideas and scripts
+    DEDUP_ENABLED: bool = True
+    DEDUP_NUM_PERM: int = 128
+    DEDUP_BANDS: int = 32  # 4 rows per band
+    DEDUP_SHINGLE_SIZE: int = 5  # characters
+    DEDUP_SIMILARITY: float = 0.6  # estimated Jaccard that counts as a duplicate
+    DEDUP_EMBEDDING_CONFIRM: bool = False
+    DEDUP_CONFIRM_MIN_SIMILARITY: float = 0.4  # borderline matches confirmed by embeddings
+    DEDUP_EMBEDDING_THRESHOLD: float = 0.92
+    DEDUP_INDEX_REFRESH: int = 300  # seconds before reloading a scope from Redis
+    DEDUP_MAX_ITEMS: int = 5000  # per channel and kind
+    DEDUP_AVOID_LIST_SIZE: int = 30
+    
+    # Embedding cache and batching
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_TTL: int = 7 * 24 * 3600
+    EMBEDDING_BATCH_SIZE: int = 256  # inputs per embeddings request
+    
+    # Idea selection: larger candidate pool, then maximal marginal relevance
+    IDEATION_CANDIDATE_POOL: int = 30
+    IDEATION_BATCH_SIZE: int = 10  # ideas per completion; batches run concurrently
+    IDEATION_FINAL_COUNT: int = 10
+    MMR_LAMBDA: float = 0.5  # 1.0 = potential only, 0.0 = diversity only
+    
+    # Bulk export: keyset pages read through server-side cursors
+    EXPORT_BATCH_SIZE: int = 1000  # rows per fetch, NDJSON chunk and Parquet row group
+    EXPORT_PAGE_ROWS: int = 50000  # rows per query, bounds how long a transaction stays open
+    
+    # Long-form scripts: outline, then segments written concurrently
+    LONG_FORM_MIN_MINUTES: float = 12.0
+    LONG_FORM_SEGMENT_MINUTES: float = 3.0
+    SCRIPT_SEGMENT_CONCURRENCY: int = 6
+    
+    # Agent Memory
+    MEMORY_PAYLOAD_MAX_BYTES: int = 8192
+    MEMORY_SUMMARY_MAX_CHARS: int = 1000
+    MEMORY_EMBED_MAX_CHARS: int = 8000
+    MEMORY_BLOB_TTL: int = 30 * 24 * 3600  # 30 days
+    
     class Config:
         env_file = ".env"
 
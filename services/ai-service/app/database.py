@@ -1,9 +1,24 @@
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 import redis.asyncio as redis
 from qdrant_client.async_qdrant_client import AsyncQdrantClient
-from qdrant_client.models import Distance, VectorParams
+from qdrant_client.models import (
+    Distance,
+    HnswConfigDiff,
+    PayloadSchemaType,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+    VectorParamsDiff,
+)
+from typing import Dict, Any, Awaitable, Callable, Tuple
+import asyncio
 import logging
+import time
 
 from .config import settings
 
@@ -53,62 +68,221 @@ async def get_qdrant():
     """Get Qdrant client"""
     global qdrant_client
     if qdrant_client is None:
-        qdrant_client = AsyncQdrantClient(url=settings.QDRANT_URL)
+        qdrant_client = AsyncQdrantClient(
+            url=settings.QDRANT_URL,
+            prefer_grpc=settings.QDRANT_PREFER_GRPC,
+            grpc_port=settings.QDRANT_GRPC_PORT
+        )
     return qdrant_client
 
 
-async def init_db():
-    """Initialize database and create tables if needed"""
+# Declarative Qdrant collection configuration. Changes here are applied to
+# existing collections by migrate_qdrant_collections() on startup.
+QDRANT_COLLECTIONS = [
+    {
+        "name": "video_scripts",
+        "size": 1536,  # OpenAI ada-002 embedding size
+        "description": "Embeddings for video scripts"
+    },
+    {
+        "name": "research_data",
+        "size": 1536,
+        "description": "Embeddings for research data"
+    },
+    {
+        "name": "performance_data",
+        "size": 1536,
+        "description": "Embeddings for performance analytics"
+    }
+]
+
+# Payload indexes shared by all memory collections
+QDRANT_PAYLOAD_INDEXES = {
+    "agent_id": PayloadSchemaType.KEYWORD,
+    "task_type": PayloadSchemaType.KEYWORD,
+    "channel_id": PayloadSchemaType.KEYWORD,
+    "niche": PayloadSchemaType.KEYWORD,
+    "timestamp": PayloadSchemaType.FLOAT,
+}
+
+
+def _hnsw_config() -> HnswConfigDiff:
+    return HnswConfigDiff(
+        m=settings.QDRANT_HNSW_M,
+        ef_construct=settings.QDRANT_HNSW_EF_CONSTRUCT
+    )
+
+
+def _quantization_config() -> ScalarQuantization:
+    # int8 copies stay in RAM for fast scoring, originals live on disk for rescoring
+    return ScalarQuantization(
+        scalar=ScalarQuantizationConfig(
+            type=ScalarType.INT8,
+            quantile=settings.QDRANT_QUANTIZATION_QUANTILE,
+            always_ram=True
+        )
+    )
+
+
+def get_search_params() -> SearchParams:
+    """Search parameters matching the collection configuration"""
+    return SearchParams(
+        hnsw_ef=settings.QDRANT_SEARCH_HNSW_EF,
+        quantization=QuantizationSearchParams(
+            rescore=True,
+            oversampling=settings.QDRANT_RESCORE_OVERSAMPLING
+        )
+    )
+
+
+async def _create_collection(qdrant, collection: Dict[str, Any]):
+    await qdrant.create_collection(
+        collection_name=collection["name"],
+        vectors_config=VectorParams(
+            size=collection["size"],
+            distance=Distance.COSINE,
+            on_disk=settings.QDRANT_VECTORS_ON_DISK
+        ),
+        hnsw_config=_hnsw_config(),
+        quantization_config=_quantization_config()
+    )
+    logger.info(f"Created Qdrant collection: {collection['name']}")
+
+
+async def _migrate_collection(qdrant, collection: Dict[str, Any], info):
+    """Bring an existing collection in line with the declared configuration"""
+    name = collection["name"]
+    config = info.config
+    vectors = config.params.vectors
+
+    if vectors.size != collection["size"]:
+        logger.error(
+            f"Qdrant collection {name} has vector size {vectors.size}, "
+            f"expected {collection['size']}; recreate it to change the size"
+        )
+        return
+
+    update = {}
+    if bool(vectors.on_disk) != settings.QDRANT_VECTORS_ON_DISK:
+        update["vectors_config"] = {
+            "": VectorParamsDiff(on_disk=settings.QDRANT_VECTORS_ON_DISK)
+        }
+
+    hnsw = config.hnsw_config
+    if hnsw.m != settings.QDRANT_HNSW_M or hnsw.ef_construct != settings.QDRANT_HNSW_EF_CONSTRUCT:
+        update["hnsw_config"] = _hnsw_config()
+
+    quantization = config.quantization_config
+    scalar = getattr(quantization, "scalar", None)
+    if (
+        scalar is None
+        or scalar.type != ScalarType.INT8
+        or scalar.quantile != settings.QDRANT_QUANTIZATION_QUANTILE
+    ):
+        update["quantization_config"] = _quantization_config()
+
+    if update:
+        await qdrant.update_collection(collection_name=name, **update)
+        logger.info(f"Updated Qdrant collection {name}: {', '.join(update)}")
+
+    existing_indexes = info.payload_schema or {}
+    for field_name, field_schema in QDRANT_PAYLOAD_INDEXES.items():
+        if field_name not in existing_indexes:
+            await qdrant.create_payload_index(
+                collection_name=name,
+                field_name=field_name,
+                field_schema=field_schema
+            )
+            logger.info(f"Created payload index {name}.{field_name}")
+
+
+async def _migrate_one(qdrant, collection: Dict[str, Any], existing: set):
     try:
-        # Test database connection
-        async with engine.begin() as conn:
-            logger.info("Database connection established")
-        
-        # Initialize Redis
-        redis_conn = await get_redis()
-        await redis_conn.ping()
-        logger.info("Redis connection established")
-        
-        # Initialize Qdrant and create collections
-        qdrant = await get_qdrant()
-        
-        # Create collections for different types of embeddings
-        collections = [
-            {
-                "name": "video_scripts",
-                "size": 1536,  # OpenAI ada-002 embedding size
-                "description": "Embeddings for video scripts"
-            },
-            {
-                "name": "research_data", 
-                "size": 1536,
-                "description": "Embeddings for research data"
-            },
-            {
-                "name": "performance_data",
-                "size": 1536,
-                "description": "Embeddings for performance analytics"
-            }
-        ]
-        
-        for collection in collections:
-            try:
-                await qdrant.create_collection(
-                    collection_name=collection["name"],
-                    vectors_config=VectorParams(
-                        size=collection["size"],
-                        distance=Distance.COSINE
-                    )
-                )
-                logger.info(f"Created Qdrant collection: {collection['name']}")
-            except Exception as e:
-                if "already exists" in str(e):
-                    logger.info(f"Qdrant collection already exists: {collection['name']}")
-                else:
-                    logger.error(f"Error creating collection {collection['name']}: {e}")
-        
-        logger.info("Database initialization completed")
-        
+        if collection["name"] not in existing:
+            await _create_collection(qdrant, collection)
+        info = await qdrant.get_collection(collection["name"])
+        await _migrate_collection(qdrant, collection, info)
     except Exception as e:
-        logger.error(f"Database initialization failed: {e}")
-        raise
\ No newline at end of file
+        logger.error(f"Error migrating collection {collection['name']}: {e}")
+
+
+async def migrate_qdrant_collections():
+    """Create missing collections and apply configuration changes to existing ones"""
+    qdrant = await get_qdrant()
+    existing = {c.name for c in (await qdrant.get_collections()).collections}
+
+    await asyncio.gather(*[
+        _migrate_one(qdrant, collection, existing)
+        for collection in QDRANT_COLLECTIONS
+    ])
+
+
+async def _init_postgres():
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def _init_redis():
+    redis_conn = await get_redis()
+    await redis_conn.ping()
+
+
+# Readiness of each external dependency, filled in by init_db()
+dependency_status: Dict[str, Dict[str, Any]] = {}
+
+
+def _dependency_checks() -> Dict[str, Tuple[Callable[[], Awaitable[None]], float]]:
+    return {
+        "postgres": (_init_postgres, settings.POSTGRES_INIT_TIMEOUT),
+        "redis": (_init_redis, settings.REDIS_INIT_TIMEOUT),
+        "qdrant": (migrate_qdrant_collections, settings.QDRANT_INIT_TIMEOUT),
+    }
+
+
+async def _init_dependency(name: str, check: Callable[[], Awaitable[None]], timeout: float):
+    start_time = time.time()
+    try:
+        await asyncio.wait_for(check(), timeout=timeout)
+        dependency_status[name] = {"ready": True, "error": None}
+        logger.info(f"{name} ready in {time.time() - start_time:.2f}s")
+    except asyncio.TimeoutError:
+        dependency_status[name] = {"ready": False, "error": f"timed out after {timeout}s"}
+        logger.error(f"{name} initialization timed out after {timeout}s")
+    except Exception as e:
+        dependency_status[name] = {"ready": False, "error": str(e)}
+        logger.error(f"{name} initialization failed: {e}")
+
+
+async def init_db(only_pending: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Initialize Postgres, Redis and Qdrant concurrently, each under its own timeout"""
+    checks = _dependency_checks()
+    if only_pending:
+        checks = {
+            name: check for name, check in checks.items()
+            if not dependency_status.get(name, {}).get("ready")
+        }
+
+    await asyncio.gather(*[
+        _init_dependency(name, check, timeout)
+        for name, (check, timeout) in checks.items()
+    ])
+
+    if is_ready():
+        logger.info("Database initialization completed")
+    return dependency_status
+
+
+def is_ready() -> bool:
+    """Whether every dependency has been initialized successfully"""
+    return all(
+        dependency_status.get(name, {}).get("ready")
+        for name in _dependency_checks()
+    )
+
+
+async def run_init_db():
+    """Initialize all dependencies, then keep retrying the failed ones until all are ready"""
+    await init_db()
+    while not is_ready():
+        await asyncio.sleep(settings.DEPENDENCY_RETRY_INTERVAL)
+        await init_db(only_pending=True)
@@ -0,0 +1,24 @@
+import json
+import logging
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# NATS connection used for fire-and-forget events; set by the message processor
+_nats_client = None
+
+
+def set_event_client(client):
+    """Register the NATS client used by publish_event"""
+    global _nats_client
+    _nats_client = client
+
+
+async def publish_event(subject: str, data: Dict[str, Any]):
+    """Publish an event if NATS is connected; events are best effort"""
+    if _nats_client is None:
+        return
+    try:
+        await _nats_client.publish(subject, json.dumps(data, default=str).encode())
+    except Exception as e:
+        logger.warning(f"Failed to publish event to {subject}: {e}")
@@ -1,13 +1,16 @@
 import asyncio
 import json
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Awaitable, Callable, List, Optional
 import nats
 from nats.aio.client import Client as NATS
 
 from .config import settings
-from .agents import ManusAgent, ContentStrategistAgent, TrendPredictorAgent, ResearchAgent
+from .agents import get_agent
+from .events import set_event_client
 from .models import VideoProcessingRequest, AgentTaskRequest
+from .services.deadline import deadline_after
+from .services.saturation import saturation
 
 logger = logging.getLogger(__name__)
 
@@ -17,18 +20,14 @@ class MessageProcessor:
     
     def __init__(self):
         self.nats_client: NATS = None
-        self.agents = {
-            "manus": ManusAgent(),
-            "content_strategist": ContentStrategistAgent(),
-            "trend_predictor": TrendPredictorAgent(),
-            "research_agent": ResearchAgent(),
-        }
+        self.workers: List[asyncio.Task] = []
     
     async def start(self):
         """Start the message processor"""
         try:
             # Connect to NATS
             self.nats_client = await nats.connect(settings.NATS_URL)
+            set_event_client(self.nats_client)
             logger.info("Connected to NATS")
             
             # Subscribe to relevant subjects
@@ -40,35 +39,62 @@ class MessageProcessor:
             logger.error(f"Failed to start message processor: {e}")
             raise
     
+    def _handlers(self) -> Dict[str, Callable[[Any], Awaitable[None]]]:
+        return {
+            # Video processing messages
+            "video.process": self._handle_video_processing,
+            # AI task messages
+            "ai.task": self._handle_ai_task,
+            # Research requests
+            "ai.research": self._handle_research_request,
+            # Content generation requests
+            "ai.content.generate": self._handle_content_generation,
+        }
+    
     async def _setup_subscriptions(self):
         """Set up NATS subscriptions"""
         
-        # Video processing messages
-        await self.nats_client.subscribe(
-            "video.process", 
-            cb=self._handle_video_processing
-        )
-        
-        # AI task messages
-        await self.nats_client.subscribe(
-            "ai.task",
-            cb=self._handle_ai_task
-        )
+        # Queue groups make every worker process and replica share one
+        # subscription, so each message is handled exactly once
         
-        # Research requests
-        await self.nats_client.subscribe(
-            "ai.research",
-            cb=self._handle_research_request
-        )
-        
-        # Content generation requests
-        await self.nats_client.subscribe(
-            "ai.content.generate",
-            cb=self._handle_content_generation
-        )
+        # Each subject feeds a small local queue drained by a fixed number of
+        # consumers: queue depth, in-flight count and the age of the oldest
+        # waiting message are the saturation signals for autoscaling
+        for subject, handler in self._handlers().items():
+            queue: asyncio.Queue = asyncio.Queue(maxsize=settings.NATS_SUBJECT_QUEUE_SIZE)
+            subscription = await self.nats_client.subscribe(
+                subject,
+                queue=settings.NATS_QUEUE_GROUP,
+                cb=self._enqueue(subject, queue)
+            )
+            saturation.register_subject(subject, queue, subscription)
+            self.workers.extend(
+                asyncio.create_task(self._consume(subject, queue, handler))
+                for _ in range(settings.NATS_SUBJECT_CONCURRENCY)
+            )
         
         logger.info("NATS subscriptions set up")
     
+    def _enqueue(self, subject: str, queue: asyncio.Queue):
+        async def callback(msg):
+            # Blocks while the queue is full, so further messages stay with
+            # NATS and the subscription's pending count grows
+            await queue.put(msg)
+            saturation.message_received(subject)
+        return callback
+    
+    async def _consume(self, subject: str, queue: asyncio.Queue, handler: Callable[[Any], Awaitable[None]]):
+        while True:
+            msg = await queue.get()
+            saturation.message_started(subject)
+            try:
+                await handler(msg)
+            except Exception as e:
+                logger.error(f"Unhandled error processing {subject} message: {e}")
+            finally:
+                saturation.message_finished(subject)
+                queue.task_done()
+    
     async def _handle_video_processing(self, msg):
         """Handle video processing messages"""
         try:
@@ -79,14 +105,15 @@ class MessageProcessor:
             
             if request.action == "start_processing":
                 # Use Manus agent to orchestrate the process
-                response = await self.agents["manus"].process_task(
+                response = await get_agent("manus").process_task(
                     task_id=f"video_{request.video_id}",
                     task_type="orchestrate_video_creation",
                     input_data={
                         "video_id": request.video_id,
                         "user_id": request.user_id,
                         "channel_config": {}  # This would come from the database
-                    }
+                    },
+                    deadline=self._deadline(request.deadline)
                 )
                 
                 # Send response back
@@ -109,7 +136,8 @@ class MessageProcessor:
                 response = await agent.process_task(
                     task_id=request.task_id,
                     task_type=request.task_type,
-                    input_data=request.input_data
+                    input_data=request.input_data,
+                    deadline=self._deadline(request.deadline)
                 )
                 
                 # Send response back
@@ -126,10 +154,11 @@ class MessageProcessor:
             data = json.loads(msg.data.decode())
             
             # Use research agent
-            response = await self.agents["research_agent"].process_task(
+            response = await get_agent("research_agent").process_task(
                 task_id=data.get("task_id", "research_task"),
                 task_type="comprehensive_research",
-                input_data=data
+                input_data=data,
+                deadline=self._deadline(data.get("deadline"))
             )
             
             await self._send_response("ai.research.response", response.model_dump())
@@ -143,10 +172,11 @@ class MessageProcessor:
             data = json.loads(msg.data.decode())
             
             # Use content strategist agent
-            response = await self.agents["content_strategist"].process_task(
+            response = await get_agent("content_strategist").process_task(
                 task_id=data.get("task_id", "content_task"),
                 task_type="script_generation",
-                input_data=data
+                input_data=data,
+                deadline=self._deadline(data.get("deadline"))
             )
             
             await self._send_response("ai.content.response", response.model_dump())
@@ -154,17 +184,21 @@ class MessageProcessor:
         except Exception as e:
             logger.error(f"Error handling content generation: {e}")
     
+    def _deadline(self, deadline: Any) -> Optional[float]:
+        """
+        Deadline of a message's task: the publisher's ``deadline`` field
+        (epoch seconds) or TASK_DEFAULT_TIMEOUT from now. A message that
+        waited past its deadline fails without any LLM call.
+        """
+        try:
+            return float(deadline) if deadline is not None else deadline_after(settings.TASK_DEFAULT_TIMEOUT)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring invalid message deadline: {deadline!r}")
+            return deadline_after(settings.TASK_DEFAULT_TIMEOUT)
+    
     def _get_agent_by_type(self, agent_type: str):
         """Get agent by type or ID"""
-        # Map agent types to instances
-        agent_mapping = {
-            "manus": self.agents["manus"],
-            "content_strategist": self.agents["content_strategist"],
-            "trend_predictor": self.agents["trend_predictor"],
-            "research_agent": self.agents["research_agent"],
-        }
-        
-        return agent_mapping.get(agent_type)
+        return get_agent(agent_type)
     
     async def _send_response(self, subject: str, data: Dict[str, Any]):
         """Send response message"""
@@ -177,6 +211,10 @@ class MessageProcessor:
     
     async def stop(self):
         """Stop the message processor"""
+        for worker in self.workers:
+            worker.cancel()
+        self.workers = []
         if self.nats_client:
+            set_event_client(None)
             await self.nats_client.close()
             logger.info("Message processor stopped")
\ No newline at end of file
@@ -1,13 +1,14 @@
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 from uuid import UUID
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class VideoProcessingRequest(BaseModel):
     video_id: str
     user_id: str
     action: str
+    deadline: Optional[float] = None  # epoch seconds after which the result is discarded
 
 
 class AgentTaskRequest(BaseModel):
@@ -17,6 +18,7 @@ class AgentTaskRequest(BaseModel):
     task_type: str
     priority: int
     input_data: Dict[str, Any]
+    deadline: Optional[float] = None  # epoch seconds after which the result is discarded
 
 
 class ScriptGenerationRequest(BaseModel):
@@ -35,10 +37,46 @@ class ResearchRequest(BaseModel):
     sources: List[str] = ["youtube", "google_trends", "reddit"]
 
 
+class Scene(BaseModel):
+    """One scene of a script; mirrors the video processor's Scene"""
+    duration: float
+    content_type: str = "text"
+    content: str
+    transition: Optional[str] = None
+    effects: List[str] = []
+
+
+class SentimentItem(BaseModel):
+    text: str
+    video_id: Optional[str] = None
+    comment_id: Optional[str] = None
+
+
+class BulkSentimentRequest(BaseModel):
+    items: List[SentimentItem]
+    escalate: bool = True  # send ambiguous items to the LLM
+
+
+class ABVariant(BaseModel):
+    name: str
+    impressions: int
+    clicks: int
+
+
+class ABExperiment(BaseModel):
+    experiment_id: Optional[str] = None
+    video_id: Optional[str] = None
+    variants: List[ABVariant] = Field(min_length=2)  # first variant is the control
+
+
+class BulkABTestRequest(BaseModel):
+    experiments: List[ABExperiment]
+
+
 class VideoScript(BaseModel):
     title: str
     description: str
-    scenes: List[Dict[str, Any]]
+    scenes: List[Scene]
     total_duration: float
     keywords: List[str]
     tags: List[str]
@@ -84,4 +122,32 @@ class AgentResponse(BaseModel):
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
     execution_time: Optional[float] = None
-    confidence_score: Optional[float] = None
\ No newline at end of file
+    confidence_score: Optional[float] = None
+    cache_status: Optional[str] = None  # fresh/stale/miss for cached task types
+
+
+class MemoryPayload(BaseModel):
+    task_id: str
+    agent_id: str
+    agent_name: str
+    task_type: Optional[str] = None
+    channel_id: Optional[str] = None
+    niche: Optional[str] = None
+    topic: Optional[str] = None
+    video_id: Optional[str] = None
+    summary: str = ""
+    result: Optional[Dict[str, Any]] = None
+    result_ref: Optional[str] = None  # key of the full result in the blob store
+    result_bytes: int = 0
+    timestamp: float
+
+
+class RetrievalPolicy(BaseModel):
+    needs_context: bool = False
+    collection: Optional[str] = None
+    # Searched in the same batch as ``collection`` with the same settings
+    extra_collections: List[str] = []
+    top_k: int = 5
+    score_threshold: Optional[float] = None
+    # Payload fields that must match the task's own value (e.g. same channel/niche)
+    filter_fields: List[str] = []
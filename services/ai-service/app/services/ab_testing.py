@@ -0,0 +1,132 @@
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from ..config import settings
+
+# Experiment outcomes
+WINNER = "winner"
+EQUIVALENT = "equivalent"
+CONTINUE = "continue"
+INSUFFICIENT_DATA = "insufficient_data"
+
+
+def _pad(experiments: List[Dict[str, Any]]):
+    """Impressions/clicks of all experiments as (experiments, max variants) arrays"""
+    n = len(experiments)
+    width = max(len(experiment["variants"]) for experiment in experiments)
+    impressions = np.zeros((n, width), dtype=np.float64)
+    clicks = np.zeros((n, width), dtype=np.float64)
+    present = np.zeros((n, width), dtype=bool)
+    for e, experiment in enumerate(experiments):
+        for v, variant in enumerate(experiment["variants"]):
+            impressions[e, v] = max(float(variant.get("impressions") or 0), 0.0)
+            clicks[e, v] = max(float(variant.get("clicks") or 0), 0.0)
+            present[e, v] = True
+    clicks = np.minimum(clicks, impressions)
+    return impressions, clicks, present
+
+
+def _simulate(
+    alpha: np.ndarray,
+    beta: np.ndarray,
+    present: np.ndarray,
+    samples: int,
+    rng: np.random.Generator
+) -> Dict[str, np.ndarray]:
+    """Monte Carlo summaries for one chunk of experiments"""
+    draws = rng.beta(alpha[:, :, None], beta[:, :, None], size=alpha.shape + (samples,)).astype(np.float32)
+    # Padding variants can never be best
+    draws[~present] = -1.0
+
+    best = draws.argmax(axis=1)
+    width = alpha.shape[1]
+    prob_best = (best[:, None, :] == np.arange(width)[None, :, None]).mean(axis=2)
+
+    best_draw = draws.max(axis=1, keepdims=True)
+    expected_loss = (best_draw - draws).mean(axis=2)
+    beats_control = (draws > draws[:, :1, :]).mean(axis=2)
+
+    return {
+        "prob_best": prob_best,
+        "expected_loss": expected_loss,
+        "beats_control": beats_control,
+    }
+
+
+def analyze_experiments(experiments: List[Dict[str, Any]], seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Beta-binomial CTR analysis of many experiments at once.
+
+    Posteriors of all variants are sampled together in chunks bounded by
+    AB_TEST_CHUNK_DRAWS. Each experiment gets probability-to-be-best, expected
+    loss and a sequential stopping decision: a winner once its expected loss
+    is below AB_TEST_LOSS_THRESHOLD with every variant past
+    AB_TEST_MIN_IMPRESSIONS, equivalent when no variant would lose more than
+    the threshold. An experiment needs at least two variants to be decided.
+    """
+    experiments = [experiment for experiment in experiments if experiment.get("variants")]
+    if not experiments:
+        return []
+
+    impressions, clicks, present = _pad(experiments)
+    alpha = settings.AB_TEST_PRIOR_ALPHA + clicks
+    beta = settings.AB_TEST_PRIOR_BETA + impressions - clicks
+
+    samples = settings.AB_TEST_SAMPLES
+    width = impressions.shape[1]
+    chunk = max(1, settings.AB_TEST_CHUNK_DRAWS // (width * samples))
+    rng = np.random.default_rng(settings.AB_TEST_SEED if seed is None else seed)
+
+    parts = [
+        _simulate(alpha[start:start + chunk], beta[start:start + chunk], present[start:start + chunk], samples, rng)
+        for start in range(0, len(experiments), chunk)
+    ]
+    stats = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+    posterior_mean = alpha / (alpha + beta)
+    # 95% interval from the normal approximation of the beta posterior;
+    # exact enough at the impression counts a decision needs
+    posterior_sd = np.sqrt(alpha * beta / ((alpha + beta) ** 2 * (alpha + beta + 1)))
+    ci_low = np.clip(posterior_mean - 1.96 * posterior_sd, 0.0, 1.0)
+    ci_high = np.clip(posterior_mean + 1.96 * posterior_sd, 0.0, 1.0)
+    masked_loss = np.where(present, stats["expected_loss"], np.inf)
+    leader = masked_loss.argmin(axis=1)
+    leader_loss = masked_loss[np.arange(len(experiments)), leader]
+    max_loss = np.where(present, stats["expected_loss"], -np.inf).max(axis=1)
+    enough_data = (
+        np.where(present, impressions >= settings.AB_TEST_MIN_IMPRESSIONS, True).all(axis=1)
+        & (present.sum(axis=1) >= 2)
+    )
+
+    threshold = settings.AB_TEST_LOSS_THRESHOLD
+    decision = np.where(
+        ~enough_data, INSUFFICIENT_DATA,
+        np.where(max_loss < threshold, EQUIVALENT, np.where(leader_loss < threshold, WINNER, CONTINUE))
+    )
+
+    results = []
+    for e, experiment in enumerate(experiments):
+        variants = []
+        for v, variant in enumerate(experiment["variants"]):
+            variants.append({
+                "name": variant.get("name") or f"variant_{v}",
+                "impressions": int(impressions[e, v]),
+                "clicks": int(clicks[e, v]),
+                "ctr": round(float(clicks[e, v] / impressions[e, v]), 5) if impressions[e, v] else None,
+                "posterior_mean": round(float(posterior_mean[e, v]), 5),
+                "credible_interval": [round(float(ci_low[e, v]), 5), round(float(ci_high[e, v]), 5)],
+                "prob_best": round(float(stats["prob_best"][e, v]), 4),
+                "prob_beats_control": round(float(stats["beats_control"][e, v]), 4) if v else None,
+                "expected_loss": round(float(stats["expected_loss"][e, v]), 6),
+            })
+        results.append({
+            "experiment_id": experiment.get("experiment_id"),
+            "video_id": experiment.get("video_id"),
+            "decision": str(decision[e]),
+            "leader": variants[leader[e]]["name"],
+            "winner": variants[leader[e]]["name"] if decision[e] == WINNER else None,
+            "leader_prob_best": variants[leader[e]]["prob_best"],
+            "variants": variants,
+        })
+    return results
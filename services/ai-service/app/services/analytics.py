@@ -0,0 +1,313 @@
+import logging
+import numbers
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Any, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import text
+
+from ..config import settings
+from ..database import async_session_maker
+from .memory import extract_memory_fields
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400.0
+
+# Numeric youtube_analytics columns held as float64 arrays
+METRIC_COLUMNS = [
+    "views", "likes", "comments", "shares", "watch_time",
+    "ctr", "avd", "rpm", "estimated_revenue",
+]
+
+# Per-video metrics screened for outliers
+OUTLIER_METRICS = ["views", "ctr", "avd", "rpm", "engagement_rate", "recent_views"]
+
+# Daily rollups: one row per video and day with the day's last counters and
+# mean rates, instead of every raw snapshot
+CHANNEL_ANALYTICS_QUERY = text("""
+    SELECT d.video_id, v.title, EXTRACT(EPOCH FROM d.last_collected_at) AS collected_at,
+           d.views, d.likes, d.comments, d.shares, d.watch_time,
+           d.ctr_sum / NULLIF(d.ctr_count, 0) AS ctr,
+           d.avd_sum / NULLIF(d.avd_count, 0) AS avd,
+           d.rpm_sum / NULLIF(d.rpm_count, 0) AS rpm,
+           d.estimated_revenue
+    FROM youtube_analytics_daily d
+    JOIN videos v ON v.id = d.video_id
+    WHERE v.channel_id = :channel_id
+      AND d.bucket_start >= NOW() - make_interval(days => :days)
+    ORDER BY d.video_id, d.bucket_start
+""")
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _as_epoch(value: Any) -> float:
+    # EXTRACT(EPOCH ...) is numeric in Postgres, which asyncpg returns as Decimal
+    if isinstance(value, (numbers.Real, Decimal)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+class AnalyticsFrame:
+    """
+    youtube_analytics snapshots of one channel in columnar form.
+
+    Rows are sorted by video and collection time; video_index maps each row to
+    an entry of video_ids. Counters (views, likes, ...) are cumulative per
+    snapshot.
+    """
+
+    def __init__(
+        self,
+        video_ids: np.ndarray,
+        titles: np.ndarray,
+        video_index: np.ndarray,
+        collected_at: np.ndarray,
+        columns: Dict[str, np.ndarray]
+    ):
+        self.video_ids = video_ids
+        self.titles = titles
+        self.video_index = video_index
+        self.collected_at = collected_at
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.video_index)
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict[str, Any]]) -> "AnalyticsFrame":
+        """Build a frame from row dicts (database rows or request payloads)"""
+        video_keys = np.array([str(r.get("video_id") or "") for r in records], dtype=object)
+        collected_at = np.array([_as_epoch(r.get("collected_at")) for r in records], dtype=np.float64)
+        columns = {
+            column: np.array([_as_float(r.get(column)) for r in records], dtype=np.float64)
+            for column in METRIC_COLUMNS
+        }
+
+        video_ids, video_index = np.unique(video_keys, return_inverse=True)
+        order = np.lexsort((collected_at, video_index))
+        titles = np.full(len(video_ids), "", dtype=object)
+        for i, r in zip(video_index, records):
+            if r.get("title"):
+                titles[i] = r["title"]
+
+        return cls(
+            video_ids=video_ids,
+            titles=titles,
+            video_index=video_index[order].astype(np.int64),
+            collected_at=collected_at[order],
+            columns={name: values[order] for name, values in columns.items()}
+        )
+
+
+async def load_channel_analytics(channel_id: str, days: Optional[int] = None) -> AnalyticsFrame:
+    """Load a channel's daily analytics rollups from Postgres"""
+    async with async_session_maker() as session:
+        result = await session.execute(
+            CHANNEL_ANALYTICS_QUERY,
+            {"channel_id": channel_id, "days": days or settings.ANALYTICS_LOOKBACK_DAYS}
+        )
+        rows = result.mappings().all()
+    return AnalyticsFrame.from_records(rows)
+
+
+async def analytics_frame_for(input_data: Dict[str, Any]) -> Optional[AnalyticsFrame]:
+    """Analytics rows passed with the task, else the channel's rows from Postgres"""
+    records = input_data.get("video_analytics")
+    if isinstance(records, list) and records:
+        return AnalyticsFrame.from_records([r for r in records if isinstance(r, dict)])
+
+    channel_id = extract_memory_fields(input_data)["channel_id"]
+    if not channel_id:
+        return None
+    try:
+        return await load_channel_analytics(channel_id)
+    except Exception as e:
+        logger.warning(f"Failed to load analytics for channel {channel_id}: {e}")
+        return None
+
+
+def robust_z(values: np.ndarray) -> np.ndarray:
+    """Median/MAD z-scores; NaN where the metric is missing or has no spread"""
+    if not np.isfinite(values).any():
+        return np.full(values.shape, np.nan)
+    median = np.nanmedian(values)
+    mad = np.nanmedian(np.abs(values - median))
+    if not np.isfinite(mad) or mad == 0:
+        return np.full(values.shape, np.nan)
+    return 0.6745 * (values - median) / mad
+
+
+def _safe_ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def _rounded(value: Any, digits: int = 4) -> Optional[float]:
+    value = float(value)
+    # + 0.0 turns -0.0 into 0.0
+    return round(value, digits) + 0.0 if np.isfinite(value) else None
+
+
+def analyze_frame(frame: AnalyticsFrame, now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Per-video and per-channel metrics, growth, rolling windows and outliers.
+
+    Everything is computed with array operations over the whole frame; the
+    result is a compact summary meant to be passed to the LLM instead of the
+    raw rows.
+    """
+    if len(frame) == 0:
+        return {"videos": 0, "snapshots": 0}
+
+    now = now or time.time()
+    window = settings.ANALYTICS_WINDOW_DAYS * DAY
+    n_videos = len(frame.video_ids)
+    idx = frame.video_index
+    t = frame.collected_at
+    col = frame.columns
+
+    # Latest snapshot of every video: last row of each video group
+    last = np.flatnonzero(np.r_[idx[1:] != idx[:-1], True])
+    latest = {name: values[last] for name, values in col.items()}
+    latest_video = idx[last]
+
+    per_video = {name: np.full(n_videos, np.nan) for name in METRIC_COLUMNS}
+    for name in METRIC_COLUMNS:
+        per_video[name][latest_video] = latest[name]
+    views = np.nan_to_num(per_video["views"])
+    engagement = (
+        np.nan_to_num(per_video["likes"])
+        + np.nan_to_num(per_video["comments"])
+        + np.nan_to_num(per_video["shares"])
+    )
+    per_video["engagement_rate"] = _safe_ratio(engagement, views)
+
+    # View deltas between consecutive snapshots of the same video
+    same_video = np.r_[False, idx[1:] == idx[:-1]]
+    delta_views = np.zeros(len(frame))
+    delta_views[1:] = np.diff(np.nan_to_num(col["views"]))
+    delta_views = np.where(same_video, np.maximum(delta_views, 0.0), 0.0)
+
+    recent = t >= now - window
+    prior = (t >= now - 2 * window) & ~recent
+    recent_views = np.bincount(idx, weights=delta_views * recent, minlength=n_videos)
+    prior_views = np.bincount(idx, weights=delta_views * prior, minlength=n_videos)
+    per_video["recent_views"] = recent_views
+    per_video["growth_rate"] = _safe_ratio(recent_views - prior_views, prior_views)
+
+    # Channel daily series and rolling mean over the window
+    day = np.floor(t / DAY).astype(np.int64)
+    first_day = day.min()
+    daily_views = np.bincount(day - first_day, weights=delta_views)
+    window_days = max(int(settings.ANALYTICS_WINDOW_DAYS), 1)
+    kernel = np.ones(min(window_days, len(daily_views))) / min(window_days, len(daily_views))
+    rolling = np.convolve(daily_views, kernel, mode="valid")
+
+    # Channel-level metrics: rates weighted by views, RPM from revenue
+    total_views = float(views.sum())
+    revenue = float(np.nansum(per_video["estimated_revenue"]))
+    channel_recent = float(recent_views.sum())
+    channel_prior = float(prior_views.sum())
+
+    def weighted(metric: str) -> Optional[float]:
+        values = per_video[metric]
+        mask = np.isfinite(values) & (views > 0)
+        if not mask.any():
+            return None
+        return _rounded(np.average(values[mask], weights=views[mask]))
+
+    channel = {
+        "videos": n_videos,
+        "snapshots": len(frame),
+        "total_views": int(total_views),
+        "ctr": weighted("ctr"),
+        "avd": weighted("avd"),
+        "rpm": _rounded(revenue / total_views * 1000, 2) if total_views else None,
+        "engagement_rate": _rounded(engagement.sum() / total_views) if total_views else None,
+        "estimated_revenue": _rounded(revenue, 2),
+        "recent_views": int(channel_recent),
+        "growth_rate": _rounded((channel_recent - channel_prior) / channel_prior) if channel_prior else None,
+        "rolling_daily_views": _rounded(rolling[-1], 1) if rolling.size else None,
+        "rolling_daily_views_trend": (
+            _rounded((rolling[-1] - rolling[-1 - window_days]) / rolling[-1 - window_days])
+            if rolling.size > window_days and rolling[-1 - window_days] > 0 else None
+        ),
+    }
+
+    # Robust z-score outliers per metric
+    outliers = []
+    for metric in OUTLIER_METRICS:
+        z = robust_z(per_video[metric])
+        flagged = np.flatnonzero(np.abs(np.nan_to_num(z)) >= settings.ANALYTICS_OUTLIER_Z)
+        for v in flagged[np.argsort(-np.abs(z[flagged]))][:settings.ANALYTICS_MAX_FINDINGS]:
+            outliers.append({
+                "video_id": frame.video_ids[v],
+                "title": frame.titles[v] or None,
+                "metric": metric,
+                "value": _rounded(per_video[metric][v]),
+                "z": _rounded(z[v], 2),
+                "direction": "over" if z[v] > 0 else "under",
+            })
+
+    def video_summary(v: int) -> Dict[str, Any]:
+        return {
+            "video_id": frame.video_ids[v],
+            "title": frame.titles[v] or None,
+            "views": int(views[v]),
+            "recent_views": int(recent_views[v]),
+            "growth_rate": _rounded(per_video["growth_rate"][v]),
+            "ctr": _rounded(per_video["ctr"][v]),
+            "avd": _rounded(per_video["avd"][v]),
+            "rpm": _rounded(per_video["rpm"][v], 2),
+            "engagement_rate": _rounded(per_video["engagement_rate"][v]),
+        }
+
+    k = min(settings.ANALYTICS_MAX_FINDINGS, n_videos)
+    ranking = np.argsort(-recent_views, kind="stable")
+
+    return {
+        "channel": channel,
+        "top_videos": [video_summary(v) for v in ranking[:k]],
+        "bottom_videos": [video_summary(v) for v in ranking[::-1][:k]] if n_videos > k else [],
+        "outliers": outliers,
+    }
+
+
+def format_findings(findings: Dict[str, Any]) -> str:
+    """Compact prompt section for analytics findings"""
+    channel = findings.get("channel")
+    if not channel:
+        return "No analytics data available."
+
+    lines = ["Channel: " + ", ".join(f"{k}={v}" for k, v in channel.items() if v is not None)]
+    for heading, key in (("Top videos (recent views)", "top_videos"), ("Weakest videos", "bottom_videos")):
+        if findings.get(key):
+            lines.append(f"{heading}:")
+            for video in findings[key]:
+                name = video["title"] or video["video_id"]
+                stats = ", ".join(f"{k}={v}" for k, v in video.items() if k not in ("video_id", "title") and v is not None)
+                lines.append(f"- {name}: {stats}")
+    if findings.get("outliers"):
+        lines.append("Outliers (robust z-score):")
+        for outlier in findings["outliers"]:
+            name = outlier["title"] or outlier["video_id"]
+            lines.append(
+                f"- {name}: {outlier['metric']}={outlier['value']} ({outlier['direction']}, z={outlier['z']})"
+            )
+    return "\n".join(lines)
@@ -0,0 +1,165 @@
+import asyncio
+import base64
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from ..config import settings
+from ..database import async_session_maker, get_redis, is_ready
+from .shared_state import worker_id
+
+logger = logging.getLogger(__name__)
+
+PARTITION_LOCK_KEY = "analytics:partition_maintenance"
+
+# Rollup table per granularity (never interpolated from user input)
+ROLLUP_TABLES = {
+    "hour": "youtube_analytics_hourly",
+    "day": "youtube_analytics_daily",
+}
+
+METRIC_WINDOWS_SQL = """
+    SELECT r.video_id, r.bucket_start, r.snapshots,
+           r.views, r.likes, r.comments, r.shares, r.watch_time, r.estimated_revenue,
+           r.views - COALESCE(prev.views, r.first_views) AS views_gained,
+           r.ctr_sum / NULLIF(r.ctr_count, 0) AS ctr,
+           r.avd_sum / NULLIF(r.avd_count, 0) AS avd,
+           r.rpm_sum / NULLIF(r.rpm_count, 0) AS rpm
+    FROM {table} r
+    JOIN videos v ON v.id = r.video_id
+    LEFT JOIN LATERAL (
+        SELECT p.views FROM {table} p
+        WHERE p.video_id = r.video_id AND p.bucket_start < r.bucket_start
+        ORDER BY p.bucket_start DESC
+        LIMIT 1
+    ) prev ON TRUE
+    WHERE {conditions}
+    ORDER BY r.video_id, r.bucket_start
+    LIMIT :limit
+"""
+
+
+def encode_cursor(video_id: str, bucket_start: datetime) -> str:
+    raw = json.dumps([video_id, bucket_start.isoformat()]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, datetime]:
+    """(video_id, bucket_start) of the last row of the previous page; raises ValueError"""
+    try:
+        video_id, bucket_start = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(video_id), datetime.fromisoformat(bucket_start)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def _number(value: Any) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+async def fetch_metric_windows(
+    channel_id: Optional[str] = None,
+    video_id: Optional[str] = None,
+    granularity: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Per-video metric windows from the hourly/daily rollups.
+
+    Rows are ordered by (video_id, bucket_start) and paged with a keyset
+    cursor, so every page is an index range scan regardless of how deep it
+    is. views_gained is measured against the previous bucket of the video,
+    including one on an earlier page or before start.
+    """
+    table = ROLLUP_TABLES.get(granularity)
+    if table is None:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    if not channel_id and not video_id:
+        raise ValueError("channel_id or video_id is required")
+
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=settings.ANALYTICS_LOOKBACK_DAYS)
+    limit = max(1, min(limit or settings.ANALYTICS_PAGE_SIZE, settings.ANALYTICS_MAX_PAGE_SIZE))
+
+    conditions = ["r.bucket_start >= :start", "r.bucket_start < :end"]
+    params: Dict[str, Any] = {"start": start, "end": end, "limit": limit + 1}
+    if channel_id:
+        conditions.append("v.channel_id = CAST(:channel_id AS uuid)")
+        params["channel_id"] = channel_id
+    if video_id:
+        conditions.append("r.video_id = CAST(:video_id AS uuid)")
+        params["video_id"] = video_id
+    if cursor:
+        params["after_video"], params["after_bucket"] = decode_cursor(cursor)
+        conditions.append("(r.video_id, r.bucket_start) > (CAST(:after_video AS uuid), :after_bucket)")
+
+    query = text(METRIC_WINDOWS_SQL.format(table=table, conditions=" AND ".join(conditions)))
+    async with async_session_maker() as session:
+        rows = (await session.execute(query, params)).mappings().all()
+
+    page = rows[:limit]
+    items: List[Dict[str, Any]] = [
+        {
+            "video_id": str(row["video_id"]),
+            "bucket_start": row["bucket_start"].isoformat(),
+            "snapshots": row["snapshots"],
+            "views": row["views"],
+            "views_gained": row["views_gained"],
+            "likes": row["likes"],
+            "comments": row["comments"],
+            "shares": row["shares"],
+            "watch_time": row["watch_time"],
+            "estimated_revenue": _number(row["estimated_revenue"]),
+            "ctr": _number(row["ctr"]),
+            "avd": _number(row["avd"]),
+            "rpm": _number(row["rpm"]),
+        }
+        for row in page
+    ]
+    next_cursor = (
+        encode_cursor(str(page[-1]["video_id"]), page[-1]["bucket_start"])
+        if len(rows) > limit else None
+    )
+    return {"granularity": granularity, "items": items, "next_cursor": next_cursor}
+
+
+async def ensure_partitions() -> int:
+    """Create upcoming monthly youtube_analytics partitions; returns how many were created"""
+    async with async_session_maker() as session:
+        created = (await session.execute(
+            text("SELECT ensure_youtube_analytics_partitions(:months)"),
+            {"months": settings.ANALYTICS_PARTITION_MONTHS_AHEAD}
+        )).scalar()
+        await session.commit()
+    return created or 0
+
+
+async def _acquire_maintenance_lock() -> bool:
+    """One partition maintenance run per interval across all workers and replicas"""
+    redis = await get_redis()
+    return bool(await redis.set(
+        PARTITION_LOCK_KEY, worker_id(), nx=True, ex=settings.ANALYTICS_PARTITION_CHECK_INTERVAL
+    ))
+
+
+async def run_partition_maintenance():
+    """Background task: keep monthly partitions created ahead of incoming snapshots"""
+    while True:
+        try:
+            if is_ready() and await _acquire_maintenance_lock():
+                created = await ensure_partitions()
+                if created:
+                    logger.info(f"Created {created} youtube_analytics partitions")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Partition maintenance failed: {e}")
+        await asyncio.sleep(
+            settings.ANALYTICS_PARTITION_CHECK_INTERVAL if is_ready() else 30
+        )
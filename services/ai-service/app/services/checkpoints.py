@@ -0,0 +1,114 @@
+import hashlib
+import json
+import logging
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+
+from ..config import settings
+from ..database import get_redis
+from .result_cache import Uncacheable
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_PREFIX = "checkpoint"
+FINGERPRINT_FIELD = "_fingerprint"
+
+# Input fields that differ between attempts of the same task
+VOLATILE_INPUT_FIELDS = {"context", "task_id"}
+
+
+def input_fingerprint(input_data: Dict[str, Any]) -> str:
+    stable = {key: value for key, value in input_data.items() if key not in VOLATILE_INPUT_FIELDS}
+    return hashlib.sha256(json.dumps(stable, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:32]
+
+
+class TaskCheckpoint:
+    """
+    Completed step outputs of a multi-step task, kept in Redis by task_id.
+
+    A retried task with the same task_id and input reuses the outputs of
+    the steps that already finished and only runs the rest; once the task
+    completes its checkpoint is cleared. A step may return Uncacheable for
+    a degraded output, which is used but not checkpointed. Checkpoints are
+    best effort: without Redis every step simply runs.
+    """
+
+    def __init__(self, key: Optional[str], fingerprint: str, steps: Dict[str, Any], reset: bool = False):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.steps = steps
+        self.resumed: List[str] = list(steps)
+        # A checkpoint of a different input under the same task_id is replaced
+        self.reset = reset
+
+    async def step(self, name: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Output of a step, from the checkpoint or computed and checkpointed"""
+        if name in self.steps:
+            logger.info(f"Resuming {self.key}: reusing step {name}")
+            return self.steps[name]
+
+        value = await compute()
+        if isinstance(value, Uncacheable):
+            logger.info(f"Step {name} of {self.key} is degraded, not checkpointing it")
+            return value.value
+        self.steps[name] = value
+        await self._save(name, value)
+        return value
+
+    async def clear(self):
+        """Drop the checkpoint once the task has completed"""
+        if self.key is None:
+            return
+        try:
+            redis = await get_redis()
+            await redis.delete(self.key)
+        except Exception as e:
+            logger.warning(f"Failed to clear checkpoint {self.key}: {e}")
+
+    async def _save(self, name: str, value: Any):
+        if self.key is None:
+            return
+        try:
+            redis = await get_redis()
+            pipe = redis.pipeline(transaction=True)
+            if self.reset:
+                pipe.delete(self.key)
+            pipe.hset(self.key, mapping={
+                FINGERPRINT_FIELD: self.fingerprint,
+                name: json.dumps(value, default=str),
+            })
+            pipe.expire(self.key, settings.CHECKPOINT_TTL)
+            await pipe.execute()
+            self.reset = False
+        except Exception as e:
+            logger.warning(f"Failed to checkpoint step {name} of {self.key}: {e}")
+
+
+async def open_checkpoint(task_type: str, task_id: Optional[str], input_data: Dict[str, Any]) -> TaskCheckpoint:
+    """Checkpoint of a task run, holding the steps completed by earlier attempts"""
+    fingerprint = input_fingerprint(input_data)
+    if not settings.CHECKPOINT_ENABLED or not task_id:
+        return TaskCheckpoint(None, fingerprint, {})
+
+    key = f"{CHECKPOINT_PREFIX}:{task_type}:{task_id}"
+    try:
+        redis = await get_redis()
+        stored = await redis.hgetall(key)
+    except Exception as e:
+        logger.warning(f"Failed to load checkpoint {key}: {e}")
+        return TaskCheckpoint(key, fingerprint, {})
+
+    stored = {
+        (field.decode() if isinstance(field, bytes) else field): value
+        for field, value in stored.items()
+    }
+    if not stored:
+        return TaskCheckpoint(key, fingerprint, {})
+
+    stored_fingerprint = stored.pop(FINGERPRINT_FIELD, b"")
+    if isinstance(stored_fingerprint, bytes):
+        stored_fingerprint = stored_fingerprint.decode()
+    if stored_fingerprint != fingerprint:
+        logger.info(f"Checkpoint {key} belongs to a different input, starting over")
+        return TaskCheckpoint(key, fingerprint, {}, reset=True)
+
+    return TaskCheckpoint(key, fingerprint, {step: json.loads(value) for step, value in stored.items()})
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Absolute deadline (epoch seconds) of the task running in this context.
+# Tasks created with gather/create_task inherit it, so every LLM call,
+# rate limiter wait and memory lookup of a task sees the same deadline.
+_deadline: ContextVar[Optional[float]] = ContextVar("task_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The task's deadline passed; its result would be discarded by the caller"""
+
+
+def current_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+def remaining(deadline: Optional[float] = None) -> Optional[float]:
+    """Seconds left until the deadline (the current one by default); None without a deadline"""
+    deadline = current_deadline() if deadline is None else deadline
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def check_deadline(deadline: Optional[float] = None):
+    """Raise DeadlineExceeded if the deadline (the current one by default) has passed"""
+    left = remaining(deadline)
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Task deadline exceeded")
+
+
+def deadline_after(timeout: Optional[float]) -> Optional[float]:
+    """Absolute deadline timeout seconds from now; None or <= 0 means no deadline"""
+    return time.time() + timeout if timeout and timeout > 0 else None
+
+
+@contextmanager
+def no_deadline():
+    """
+    Detach the block from the deadline inherited from the calling task.
+
+    For work shared by several callers, such as a coalesced cache
+    computation: it must not fail because the caller that happened to
+    start it has a short deadline. Each caller still stops waiting at its
+    own deadline.
+    """
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@asynccontextmanager
+async def deadline_scope(deadline: Optional[float]):
+    """
+    Run the block under a deadline, cancelling it when the deadline passes.
+
+    Cancellation interrupts whatever the block awaits, including provider
+    streams, so their connections are closed instead of running to
+    completion. An enclosing deadline that is earlier still applies.
+    """
+    enclosing = current_deadline()
+    if deadline is None or (enclosing is not None and enclosing <= deadline):
+        yield
+        return
+
+    check_deadline(deadline)
+    token = _deadline.set(deadline)
+    timeout = asyncio.timeout_at(asyncio.get_running_loop().time() + remaining(deadline))
+    try:
+        async with timeout:
+            yield
+    except TimeoutError as e:
+        # Timeouts raised inside the block are not ours to relabel
+        if not timeout.expired() or isinstance(e, DeadlineExceeded):
+            raise
+        raise DeadlineExceeded("Task deadline exceeded") from e
+    finally:
+        _deadline.reset(token)
@@ -0,0 +1,290 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import re
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import settings
+from ..database import get_redis
+from .memory import extract_memory_fields
+
+logger = logging.getLogger(__name__)
+
+DEDUP_PREFIX = "dedup"
+
+# Index kinds
+IDEA = "idea"
+SCRIPT = "script"
+
+NORMALIZE_RE = re.compile(r"[^a-z0-9]+")
+
+# Prime just above 2**32; a * h + b stays below 2**64 for 32-bit a, b and h
+PRIME = np.uint64(4294967311)
+
+
+def normalize(text: str) -> str:
+    return NORMALIZE_RE.sub(" ", text.lower()).strip()
+
+
+def _item_id(text: str) -> str:
+    return hashlib.sha1(normalize(text).encode("utf-8")).hexdigest()[:16]
+
+
+def dedup_scope(input_data: Dict[str, Any]) -> Optional[str]:
+    """Index partition of a task: its channel, else its niche"""
+    fields = extract_memory_fields(input_data)
+    if fields["channel_id"]:
+        return f"channel:{fields['channel_id']}"
+    if fields["niche"]:
+        return f"niche:{fields['niche']}"
+    return None
+
+
+class MinHasher:
+    """MinHash signatures over character shingles of normalized text"""
+
+    def __init__(self, num_perm: int, shingle_size: int, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2 ** 32, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 2 ** 32, num_perm, dtype=np.uint64)
+        self.k = shingle_size
+        self.powers = np.uint64(1099511628211) ** np.arange(shingle_size - 1, -1, -1, dtype=np.uint64)
+
+    def shingle_hashes(self, text: str) -> np.ndarray:
+        data = np.frombuffer(normalize(text).encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+        if len(data) < self.k:
+            data = np.pad(data, (0, self.k - len(data)))
+        # Polynomial hash of every k-byte window, mixed down to 32 bits
+        hashes = np.lib.stride_tricks.sliding_window_view(data, self.k) @ self.powers
+        hashes ^= hashes >> np.uint64(29)
+        return np.unique(hashes & np.uint64(0xFFFFFFFF))
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = self.shingle_hashes(text)
+        return ((self.a[:, None] * hashes[None, :] + self.b[:, None]) % PRIME).min(axis=1).astype(np.uint32)
+
+
+class ScopeIndex:
+    """In-process LSH index of one scope and kind, mirrored from Redis"""
+
+    def __init__(self, bands: int):
+        self.bands = bands
+        self.ids: List[str] = []
+        self.labels: List[str] = []
+        self.rows: Dict[str, int] = {}
+        # Grown by doubling; rows past len(self) are unused
+        self.signatures = np.zeros((0, 0), dtype=np.uint32)
+        self.buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self.loaded_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [band.tobytes() for band in signature.reshape(self.bands, -1)]
+
+    def add(self, item_id: str, label: str, signature: np.ndarray):
+        if item_id in self.rows:
+            return
+        row = len(self.ids)
+        if row == len(self.signatures):
+            grown = np.zeros((max(64, 2 * row), len(signature)), dtype=np.uint32)
+            if row:
+                grown[:row] = self.signatures[:row]
+            self.signatures = grown
+        self.signatures[row] = signature
+        self.rows[item_id] = row
+        self.ids.append(item_id)
+        self.labels.append(label)
+        for band, key in enumerate(self._band_keys(signature)):
+            self.buckets[band].setdefault(key, []).append(row)
+
+    def query(self, signature: np.ndarray) -> Optional[Tuple[int, float]]:
+        """Most similar indexed item among the LSH candidates, as (row, estimated Jaccard)"""
+        buckets = [self.buckets[band].get(key, ()) for band, key in enumerate(self._band_keys(signature))]
+        hits = sum(len(bucket) for bucket in buckets)
+        if not hits:
+            return None
+        if hits >= len(self):
+            # Crowded buckets (templated titles): comparing everything is cheaper
+            rows = np.arange(len(self))
+            candidates = self.signatures[:len(self)]
+        else:
+            rows = np.fromiter({row for bucket in buckets for row in bucket}, dtype=np.int64)
+            candidates = self.signatures[rows]
+        similarity = np.count_nonzero(candidates == signature, axis=1) / len(signature)
+        best = int(similarity.argmax())
+        return int(rows[best]), float(similarity[best])
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index of everything already produced per channel.
+
+    Signatures are stored in Redis (one hash per scope and kind) and mirrored
+    into an in-process index that is reloaded every DEDUP_INDEX_REFRESH
+    seconds, so checks never wait on the network once a scope is loaded.
+    Borderline matches can be confirmed by embedding similarity.
+    """
+
+    def __init__(self):
+        self.hasher = MinHasher(settings.DEDUP_NUM_PERM, settings.DEDUP_SHINGLE_SIZE)
+        self.indexes: Dict[str, ScopeIndex] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+
+    def _key(self, scope: str, kind: str) -> str:
+        return f"{DEDUP_PREFIX}:{kind}:{scope}"
+
+    async def _index(self, scope: str, kind: str) -> ScopeIndex:
+        key = self._key(scope, kind)
+        index = self.indexes.get(key)
+        if index is not None and time.time() - index.loaded_at < settings.DEDUP_INDEX_REFRESH:
+            return index
+
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            index = self.indexes.get(key)
+            if index is None or time.time() - index.loaded_at >= settings.DEDUP_INDEX_REFRESH:
+                index = await self._load(key, fallback=index)
+                self.indexes[key] = index
+        return index
+
+    async def _load(self, key: str, fallback: Optional[ScopeIndex]) -> ScopeIndex:
+        index = ScopeIndex(settings.DEDUP_BANDS)
+        try:
+            redis = await get_redis()
+            entries = await redis.hgetall(key)
+        except Exception as e:
+            logger.warning(f"Failed to load dedup index {key}: {e}")
+            return fallback or index
+        for item_id, raw in entries.items():
+            entry = json.loads(raw)
+            signature = np.frombuffer(base64.b64decode(entry["sig"]), dtype=np.uint32)
+            if len(signature) == settings.DEDUP_NUM_PERM:
+                index.add(item_id.decode() if isinstance(item_id, bytes) else item_id, entry["label"], signature)
+        return index
+
+    async def _confirm(self, text: str, label: str, llm: Any) -> bool:
+        """Embedding cosine check for matches just below the MinHash threshold"""
+        try:
+            a, b = await llm.generate_embeddings_batch([text[:2000], label])
+        except Exception as e:
+            logger.warning(f"Embedding confirmation failed: {e}")
+            return False
+        a, b = np.asarray(a), np.asarray(b)
+        cosine = float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-12))
+        return cosine >= settings.DEDUP_EMBEDDING_THRESHOLD
+
+    async def filter_new(
+        self,
+        scope: str,
+        kind: str,
+        items: List[Tuple[str, str]],
+        llm: Any = None,
+        register: bool = True
+    ) -> Tuple[List[int], List[Dict[str, Any]]]:
+        """
+        Check (text, label) items against the index and each other.
+
+        Returns the positions of novel items and a description of every
+        rejected one. Novel items are registered unless register is False
+        (callers that still select among them register the final set).
+        """
+        index = await self._index(scope, kind)
+        batch = ScopeIndex(settings.DEDUP_BANDS)
+        kept: List[int] = []
+        rejected: List[Dict[str, Any]] = []
+
+        for position, (text, label) in enumerate(items):
+            signature = self.hasher.signature(text)
+            duplicate = None
+            for source in (index, batch):
+                match = source.query(signature) if len(source) else None
+                if match is None:
+                    continue
+                row, similarity = match
+                if similarity >= settings.DEDUP_SIMILARITY or (
+                    llm is not None
+                    and settings.DEDUP_EMBEDDING_CONFIRM
+                    and similarity >= settings.DEDUP_CONFIRM_MIN_SIMILARITY
+                    and await self._confirm(text, source.labels[row], llm)
+                ):
+                    duplicate = {"duplicate_of": source.labels[row], "similarity": round(similarity, 3)}
+                    break
+            if duplicate:
+                rejected.append({"position": position, "label": label, **duplicate})
+                continue
+
+            batch.add(_item_id(text), label, signature)
+            kept.append(position)
+
+        if register and kept:
+            await self.register(scope, kind, [items[position] for position in kept], index=index)
+        return kept, rejected
+
+    async def register(
+        self,
+        scope: str,
+        kind: str,
+        items: List[Tuple[str, str]],
+        index: Optional[ScopeIndex] = None
+    ):
+        """Add (text, label) items to the scope's index"""
+        index = index or await self._index(scope, kind)
+        entries: Dict[str, str] = {}
+        for text, label in items:
+            signature = self.hasher.signature(text)
+            item_id = _item_id(text)
+            index.add(item_id, label, signature)
+            entries[item_id] = json.dumps({
+                "label": label,
+                "sig": base64.b64encode(signature.tobytes()).decode("ascii"),
+                "at": time.time()
+            })
+        if entries:
+            await self._store(self._key(scope, kind), entries)
+
+    async def _store(self, key: str, entries: Dict[str, str]):
+        try:
+            redis = await get_redis()
+            now = time.time()
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping=entries)
+                pipe.zadd(f"{key}:recent", {item_id: now for item_id in entries})
+                pipe.zcard(f"{key}:recent")
+                results = await pipe.execute()
+            excess = results[-1] - settings.DEDUP_MAX_ITEMS
+            if excess > 0:
+                # Oldest entries fall out of the index
+                oldest = await redis.zrange(f"{key}:recent", 0, excess - 1)
+                await redis.hdel(key, *oldest)
+                await redis.zrem(f"{key}:recent", *oldest)
+        except Exception as e:
+            logger.warning(f"Failed to store dedup entries in {key}: {e}")
+
+    async def recent_labels(self, scope: str, kind: str, limit: Optional[int] = None) -> List[str]:
+        """Most recently produced items of a scope, for avoid-lists in prompts"""
+        limit = limit or settings.DEDUP_AVOID_LIST_SIZE
+        try:
+            redis = await get_redis()
+            item_ids = await redis.zrevrange(f"{self._key(scope, kind)}:recent", 0, limit - 1)
+            if not item_ids:
+                return []
+            entries = await redis.hmget(self._key(scope, kind), item_ids)
+        except Exception as e:
+            logger.warning(f"Failed to read avoid-list for {scope}: {e}")
+            index = self.indexes.get(self._key(scope, kind))
+            return index.labels[-limit:][::-1] if index else []
+        return [json.loads(entry)["label"] for entry in entries if entry]
+
+
+def format_avoid_list(labels: List[str]) -> str:
+    return "\n".join(f"- {label}" for label in labels)
+
+
+dedup_index = NearDuplicateIndex()
@@ -0,0 +1,45 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from ..config import settings
+
+
+def mmr_select(
+    embeddings: Sequence[Sequence[float]],
+    relevance: Sequence[float],
+    k: int,
+    lambda_: Optional[float] = None
+) -> List[int]:
+    """
+    Maximal marginal relevance selection over an embedding matrix.
+
+    Each step picks the candidate maximizing
+    lambda * relevance - (1 - lambda) * max cosine similarity to the picks so
+    far. Similarities come from one matrix product and the per-candidate
+    redundancy is updated with a running maximum, so a step is O(n).
+    Relevance is min-max scaled to [0, 1] to be comparable with cosine.
+    """
+    lambda_ = settings.MMR_LAMBDA if lambda_ is None else lambda_
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    n = len(vectors)
+    if n == 0 or k <= 0:
+        return []
+
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = vectors @ vectors.T
+
+    scores = np.asarray(relevance, dtype=np.float64)
+    spread = scores.max() - scores.min()
+    scores = (scores - scores.min()) / spread if spread > 0 else np.ones(n)
+
+    selected: List[int] = []
+    redundancy = np.zeros(n)
+    available = np.ones(n, dtype=bool)
+    for _ in range(min(k, n)):
+        marginal = lambda_ * scores - (1 - lambda_) * redundancy
+        pick = int(np.where(available, marginal, -np.inf).argmax())
+        selected.append(pick)
+        available[pick] = False
+        redundancy = np.maximum(redundancy, similarity[pick])
+    return selected
@@ -0,0 +1,58 @@
+import hashlib
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ..config import settings
+from ..database import get_redis
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_PREFIX = "embedding"
+
+
+class EmbeddingCache:
+    """
+    Embeddings keyed by model and text hash, shared through Redis.
+
+    Vectors are stored as raw float32 bytes; a batch lookup is one MGET and a
+    batch write one pipeline, so cached texts never reach the provider.
+    """
+
+    def _key(self, model: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+        return f"{EMBEDDING_CACHE_PREFIX}:{model}:{digest}"
+
+    async def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        if not settings.EMBEDDING_CACHE_ENABLED or not texts:
+            return [None] * len(texts)
+        try:
+            redis = await get_redis()
+            values = await redis.mget([self._key(model, text) for text in texts])
+        except Exception as e:
+            logger.warning(f"Embedding cache read failed: {e}")
+            return [None] * len(texts)
+        return [
+            np.frombuffer(value, dtype=np.float32).tolist() if value else None
+            for value in values
+        ]
+
+    async def set_many(self, model: str, vectors: Dict[str, List[float]]):
+        if not settings.EMBEDDING_CACHE_ENABLED or not vectors:
+            return
+        try:
+            redis = await get_redis()
+            async with redis.pipeline(transaction=False) as pipe:
+                for text, vector in vectors.items():
+                    pipe.setex(
+                        self._key(model, text),
+                        settings.EMBEDDING_CACHE_TTL,
+                        np.asarray(vector, dtype=np.float32).tobytes()
+                    )
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,319 @@
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import sys
+from datetime import datetime
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from ..config import settings
+from ..database import QDRANT_COLLECTIONS, engine, get_qdrant
+from .memory import MEMORY_PAYLOAD_FIELDS
+
+logger = logging.getLogger(__name__)
+
+NDJSON = "ndjson"
+PARQUET = "parquet"
+FORMATS = {NDJSON: "application/x-ndjson", PARQUET: "application/vnd.apache.parquet"}
+
+MEMORIES = "memories"
+
+# Exported Postgres tables and their columns (never interpolated from user input)
+TABLE_SOURCES: Dict[str, List[str]] = {
+    "agent_tasks": [
+        "id", "agent_id", "video_id", "task_type", "priority", "status",
+        "input_data", "output_data", "execution_time", "created_at", "updated_at",
+    ],
+    "content_pipeline": [
+        "id", "video_id", "stage", "status", "input_data", "output_data", "error_message",
+        "processing_time", "agent_used", "started_at", "completed_at", "created_at",
+    ],
+}
+
+SOURCES = [*TABLE_SOURCES, MEMORIES]
+
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state, default=str).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: Optional[str]) -> Dict[str, Any]:
+    """Resume state of an export; raises ValueError for a malformed token"""
+    if not cursor:
+        return {}
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception as e:
+        raise ValueError(f"Invalid export cursor: {e}")
+    if not isinstance(state, dict):
+        raise ValueError("Invalid export cursor")
+    return state
+
+
+async def _table_batches(source: str, state: Dict[str, Any]) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Rows of a table in (created_at, id) order, batch by batch.
+
+    Each page of EXPORT_PAGE_ROWS rows is read through a server-side cursor
+    and the next page seeks past the last row, so memory stays at one batch
+    and no transaction stays open for the whole export. New rows are picked
+    up by resuming from the last cursor.
+    """
+    columns = ", ".join(TABLE_SOURCES[source])
+    after: Optional[Tuple[datetime, str]] = (
+        (datetime.fromisoformat(state["created_at"]), state["id"]) if state.get("id") else None
+    )
+
+    while True:
+        condition = "created_at IS NOT NULL"
+        params: Dict[str, Any] = {"limit": settings.EXPORT_PAGE_ROWS}
+        if after:
+            condition += " AND (created_at, id) > (:after_created_at, CAST(:after_id AS uuid))"
+            params["after_created_at"], params["after_id"] = after
+        query = text(
+            f"SELECT {columns} FROM {source} WHERE {condition} ORDER BY created_at, id LIMIT :limit"
+        )
+
+        rows_in_page = 0
+        async with engine.connect() as connection:
+            result = await connection.stream(query, params)
+            async for partition in result.mappings().partitions(settings.EXPORT_BATCH_SIZE):
+                batch = [dict(row) for row in partition]
+                rows_in_page += len(batch)
+                after = (batch[-1]["created_at"], str(batch[-1]["id"]))
+                yield batch
+
+        if rows_in_page < settings.EXPORT_PAGE_ROWS:
+            return
+
+
+async def _memory_batches(state: Dict[str, Any]) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Payloads of every memory collection through the Qdrant scroll API"""
+    qdrant = await get_qdrant()
+    names = [collection["name"] for collection in QDRANT_COLLECTIONS]
+    start = names.index(state["collection"]) if state.get("collection") in names else 0
+    offset = state.get("offset")
+
+    for name in names[start:]:
+        while True:
+            points, next_offset = await qdrant.scroll(
+                collection_name=name,
+                limit=settings.EXPORT_BATCH_SIZE,
+                offset=offset,
+                with_payload=MEMORY_PAYLOAD_FIELDS,
+                with_vectors=False
+            )
+            offset = None
+            if points:
+                batch = []
+                for i, point in enumerate(points):
+                    payload = point.payload or {}
+                    resume = points[i + 1].id if i + 1 < len(points) else next_offset
+                    batch.append({
+                        "collection": name,
+                        "id": str(point.id),
+                        **{field: payload.get(field) for field in MEMORY_PAYLOAD_FIELDS},
+                        # Scroll offsets are inclusive: resume at the next point
+                        "_resume": {"collection": name, "offset": resume} if resume is not None else None,
+                    })
+                yield batch
+            if next_offset is None:
+                break
+            offset = next_offset
+
+
+def _resume_state(source: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    if source in TABLE_SOURCES:
+        return {"created_at": record["created_at"].isoformat(), "id": str(record["id"])}
+    resume = record.pop("_resume")
+    if resume is not None:
+        return resume
+    # Last point of a collection: continue with the next one, or stop
+    names = [collection["name"] for collection in QDRANT_COLLECTIONS]
+    following = names[names.index(record["collection"]) + 1:]
+    return {"collection": following[0], "offset": None} if following else {"done": True}
+
+
+async def export_records(
+    source: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Batches of exported records; every record carries the ``_cursor`` that
+    resumes the export right after it.
+    """
+    if source not in SOURCES:
+        raise ValueError(f"Unknown export source: {source}")
+    state = decode_cursor(cursor)
+    if state.get("done"):
+        return
+
+    batches = _table_batches(source, state) if source in TABLE_SOURCES else _memory_batches(state)
+    exported = 0
+    try:
+        async for batch in batches:
+            if limit is not None:
+                batch = batch[:limit - exported]
+            for record in batch:
+                record["_cursor"] = encode_cursor(_resume_state(source, record))
+            exported += len(batch)
+            yield batch
+            if limit is not None and exported >= limit:
+                return
+    finally:
+        await batches.aclose()
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def to_ndjson(batch: List[Dict[str, Any]]) -> bytes:
+    return "".join(
+        json.dumps({key: _json_value(value) for key, value in record.items()}, default=str) + "\n"
+        for record in batch
+    ).encode("utf-8")
+
+
+class ChunkSink:
+    """
+    Write-only file object collecting Parquet output between drains.
+
+    ParquetWriter only needs write/tell/flush/close; tell() reports the
+    total bytes written, so column chunk offsets stay correct even though
+    the buffer is emptied after every row group.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def _parquet_schema(source: str):
+    import pyarrow as pa
+
+    if source == MEMORIES:
+        fields = [("collection", pa.string()), ("id", pa.string())]
+        fields += [
+            (field, pa.int64() if field == "result_bytes" else pa.float64() if field == "timestamp" else pa.string())
+            for field in MEMORY_PAYLOAD_FIELDS
+        ]
+    else:
+        integer_columns = {"priority", "execution_time", "processing_time"}
+        time_columns = {"created_at", "updated_at", "started_at", "completed_at"}
+        fields = [
+            (
+                column,
+                pa.int64() if column in integer_columns
+                else pa.timestamp("us", tz="UTC") if column in time_columns
+                else pa.string()
+            )
+            for column in TABLE_SOURCES[source]
+        ]
+    return pa.schema(fields + [("_cursor", pa.string())])
+
+
+def _parquet_row(source: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    row = {}
+    for key, value in record.items():
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value, default=str)
+        elif value is not None and not isinstance(value, (int, float, str, datetime)):
+            value = str(value)
+        if source == MEMORIES and key == "timestamp" and value is not None:
+            value = float(value)
+        row[key] = value
+    return row
+
+
+async def stream_export(
+    source: str,
+    fmt: str = NDJSON,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """Encoded export stream: NDJSON lines, or one Parquet row group per batch"""
+    if fmt == NDJSON:
+        async for batch in export_records(source, cursor, limit):
+            yield to_ndjson(batch)
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(source)
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for batch in export_records(source, cursor, limit):
+            table = pa.Table.from_pylist([_parquet_row(source, record) for record in batch], schema=schema)
+            # Encoding and compression are CPU-bound; keep them off the event loop
+            await asyncio.to_thread(writer.write_table, table)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def export_to_file(source: str, fmt: str, output: Optional[str], cursor: Optional[str], limit: Optional[int]):
+    stream = sys.stdout.buffer if output in (None, "-") else open(output, "wb")
+    try:
+        async for chunk in stream_export(source, fmt, cursor, limit):
+            stream.write(chunk)
+    finally:
+        if stream is not sys.stdout.buffer:
+            stream.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export task history and agent memories")
+    parser.add_argument("source", choices=SOURCES)
+    parser.add_argument("--format", choices=list(FORMATS), default=NDJSON)
+    parser.add_argument("--output", help="file to write, stdout by default")
+    parser.add_argument("--cursor", help="_cursor of the last exported record to resume after")
+    parser.add_argument("--limit", type=int, help="stop after this many records")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    asyncio.run(export_to_file(args.source, args.format, args.output, args.cursor, args.limit))
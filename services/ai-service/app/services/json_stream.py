@@ -0,0 +1,106 @@
+import json
+import logging
+from typing import Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+
+class JSONArrayStreamParser:
+    """
+    Incremental parser that emits the elements of one top-level array as soon
+    as each element is complete.
+
+    Feed it text chunks from a token stream of a JSON object such as
+    ``{"title": ..., "scenes": [{...}, {...}], ...}``; every call to ``feed``
+    returns the objects of ``array_key`` that were closed by that chunk. Text
+    before the first ``{`` (e.g. a Markdown fence) is ignored.
+    """
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self.buffer: List[str] = []
+        self.position = 0
+        self.started = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.last_key = None
+        self.expect_array = False
+        self.array_depth = None
+        self.element_start = None
+        self.emitted = 0
+
+    def _text(self, start: int, end: int) -> str:
+        return "".join(self.buffer[start:end])
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        completed = []
+        for char in chunk:
+            index = self.position
+            self.buffer.append(char)
+            self.position += 1
+
+            if not self.started:
+                if char != "{":
+                    continue
+                self.started = True
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        self.last_key = self._text(self.string_start + 1, index)
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.string_start = index
+            elif char == ":" and self.depth == 1:
+                self.expect_array = self.last_key == self.array_key
+            elif char in "{[":
+                if char == "[" and self.expect_array and self.depth == 1:
+                    self.array_depth = self.depth + 1
+                elif self.array_depth is not None and self.depth == self.array_depth:
+                    self.element_start = index
+                self.expect_array = False
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.array_depth is not None and self.depth == self.array_depth and self.element_start is not None:
+                    element = self._parse(self._text(self.element_start, index + 1))
+                    self.element_start = None
+                    if element is not None:
+                        completed.append(element)
+                elif self.array_depth is not None and self.depth < self.array_depth:
+                    self.array_depth = None
+            elif not char.isspace():
+                self.expect_array = False
+
+        self.emitted += len(completed)
+        return completed
+
+    def _parse(self, text: str):
+        try:
+            element = json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping unparseable {self.array_key} element: {e}")
+            return None
+        return element if isinstance(element, dict) else None
+
+    def text(self) -> str:
+        """Everything fed so far"""
+        return "".join(self.buffer)
+
+
+def extract_json_object(text: str) -> Dict[str, Any]:
+    """Parse the outermost JSON object in a model response, tolerating fences and prose"""
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end <= start:
+        raise ValueError("No JSON object found in response")
+    return json.loads(text[start:end + 1])
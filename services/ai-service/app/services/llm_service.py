@@ -1,115 +1,479 @@
 import asyncio
+import json
 import logging
-from typing import Dict, Any, List, Optional
-import openai
-import anthropic
+import time
+from contextlib import nullcontext
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 
 from ..config import settings
+from .deadline import DeadlineExceeded, check_deadline
+from .embedding_cache import embedding_cache
+from .model_router import model_router
+from .rate_limiter import rate_limiter
+from .saturation import llm_slots
+from .sentiment import sentiment_analyzer
+from .shared_state import shared_metrics
+from .token_budget import END_INSTRUCTION, END_MARKER, OutputBudget, token_budget
 
 logger = logging.getLogger(__name__)
 
+# Provider SDK clients are shared by all LLMService instances and built on
+# first use; the SDKs themselves are only imported at that point
+_openai_client = None
+_anthropic_client = None
+
+
+def get_openai_client():
+    """Get the shared OpenAI client, or None without an API key"""
+    global _openai_client
+    if _openai_client is None and settings.OPENAI_API_KEY:
+        import openai
+        _openai_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    return _openai_client
+
+
+def get_anthropic_client():
+    """Get the shared Anthropic client, or None without an API key"""
+    global _anthropic_client
+    if _anthropic_client is None and settings.ANTHROPIC_API_KEY:
+        import anthropic
+        _anthropic_client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+    return _anthropic_client
+
+
+# OpenAI models that accept response_format={"type": "json_object"}; older
+# ones (e.g. gpt-4) reject it, so their JSON mode relies on the prompt alone
+JSON_RESPONSE_FORMAT_MODELS = (
+    "gpt-4o",
+    "gpt-4-turbo",
+    "gpt-4-1106",
+    "gpt-4-0125",
+    "gpt-4.1",
+    "gpt-3.5-turbo-1106",
+    "gpt-3.5-turbo-0125",
+    "o1",
+    "o3",
+    "o4",
+)
+
+
+def supports_json_response_format(model: str) -> bool:
+    return model == "gpt-3.5-turbo" or model.startswith(JSON_RESPONSE_FORMAT_MODELS)
+
+
+USAGE_FIELDS = [
+    "requests",
+    "input_tokens",
+    "cached_input_tokens",
+    "cache_write_tokens",
+    "output_tokens",
+]
+
+
+def usage_summary(usage: Dict[str, int]) -> Dict[str, Any]:
+    """Token usage with the share of input tokens served from provider prompt caches"""
+    input_tokens = usage.get("input_tokens", 0)
+    return {
+        **{field: usage.get(field, 0) for field in USAGE_FIELDS},
+        "cache_hit_rate": (
+            usage.get("cached_input_tokens", 0) / input_tokens if input_tokens else 0.0
+        )
+    }
+
 
 class LLMService:
     """Service for interacting with various LLM providers"""
     
     def __init__(self):
-        self.openai_client = None
-        self.anthropic_client = None
-        
-        # Initialize clients if API keys are available
-        if settings.OPENAI_API_KEY:
-            self.openai_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-            
-        if settings.ANTHROPIC_API_KEY:
-            self.anthropic_client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+        self.usage: Dict[str, int] = {field: 0 for field in USAGE_FIELDS}
+    
+    @property
+    def openai_client(self):
+        return get_openai_client()
+    
+    @property
+    def anthropic_client(self):
+        return get_anthropic_client()
+    
+    def _select_model(
+        self,
+        provider: Optional[str],
+        model: Optional[str],
+        agent_type: Optional[str],
+        task_type: Optional[str]
+    ) -> Tuple[str, Optional[str], str]:
+        provider = provider or settings.DEFAULT_PROVIDER
+        if model:
+            tier, model = model_router.resolve(model, provider)
+        else:
+            tier, model = model_router.route(agent_type, task_type, provider)
+        return provider, tier, model
     
     async def generate_completion(
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
-        model: str = "gpt-4",
-        max_tokens: int = 2000,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
         temperature: float = 0.7,
-        provider: str = "openai"
+        provider: Optional[str] = None,
+        task_type: Optional[str] = None,
+        agent_type: Optional[str] = None,
+        json_mode: bool = False,
+        duration: Optional[float] = None,
+        budget_task_type: Optional[str] = None,
+        items: Optional[int] = None
     ) -> str:
-        """Generate completion using specified LLM provider"""
+        """
+        Generate completion using specified LLM provider.
+        
+        Without an explicit model, the model tier is chosen by the router from
+        the agent and task type. Without max_tokens, the output budget is derived
+        from budget_task_type (default: task_type) and the requested duration in
+        minutes or number of items. With json_mode the response is a JSON object.
         
+        Without a configured provider client a mock response is returned for
+        development. With one, provider errors are raised rather than
+        replaced by mock output. Inside a task with a deadline, an expired
+        deadline raises DeadlineExceeded instead of calling the provider.
+        """
+        provider, tier, model = self._select_model(provider, model, agent_type, task_type)
+        budget = self._output_budget(budget_task_type or task_type, duration, json_mode, max_tokens, items)
+        if budget.stop:
+            prompt += END_INSTRUCTION
+        
+        start_time = time.time()
         try:
+            check_deadline()
             if provider == "openai" and self.openai_client:
-                return await self._openai_completion(
-                    prompt, system_prompt, model, max_tokens, temperature
-                )
+                await rate_limiter.acquire("openai", settings.OPENAI_REQUESTS_PER_MINUTE)
+                async with llm_slots.slot():
+                    start_time = time.time()
+                    completion, usage = await self._openai_completion(
+                        prompt, system_prompt, model, budget, temperature, json_mode
+                    )
             elif provider == "anthropic" and self.anthropic_client:
-                return await self._anthropic_completion(
-                    prompt, system_prompt, model, max_tokens, temperature
-                )
+                await rate_limiter.acquire("anthropic", settings.ANTHROPIC_REQUESTS_PER_MINUTE)
+                async with llm_slots.slot():
+                    start_time = time.time()
+                    completion, usage = await self._anthropic_completion(
+                        prompt, system_prompt, model, budget, temperature, json_mode
+                    )
             else:
                 # Fallback to mock response for development
-                return await self._mock_completion(prompt, system_prompt)
-                
+                return await self._mock_completion(prompt, system_prompt, json_mode)
+            
+            if tier:
+                model_router.record(
+                    provider, tier, time.time() - start_time, ok=True,
+                    output_tokens=usage.get("output_tokens") or budget.expected_tokens
+                )
+            await self._record_usage(agent_type, usage, budget)
+            return completion.replace(END_MARKER, "").rstrip()
+        
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"LLM completion failed: {e}")
-            # Return fallback response
-            return await self._mock_completion(prompt, system_prompt)
+            if tier:
+                model_router.record(provider, tier, time.time() - start_time, ok=False)
+            raise
     
-    async def _openai_completion(
+    async def stream_completion(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        provider: Optional[str] = None,
+        task_type: Optional[str] = None,
+        agent_type: Optional[str] = None,
+        json_mode: bool = False,
+        duration: Optional[float] = None,
+        budget_task_type: Optional[str] = None,
+        items: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """Stream a completion as text deltas; same routing, budgets and errors as generate_completion"""
+        provider, tier, model = self._select_model(provider, model, agent_type, task_type)
+        budget = self._output_budget(budget_task_type or task_type, duration, json_mode, max_tokens, items)
+        if budget.stop:
+            prompt += END_INSTRUCTION
+        
+        usage: Dict[str, int] = {}
+        start_time = time.time()
+        try:
+            check_deadline()
+            if provider == "openai" and self.openai_client:
+                await rate_limiter.acquire("openai", settings.OPENAI_REQUESTS_PER_MINUTE)
+                stream = self._openai_stream(
+                    prompt, system_prompt, model, budget, temperature, json_mode, usage
+                )
+            elif provider == "anthropic" and self.anthropic_client:
+                await rate_limiter.acquire("anthropic", settings.ANTHROPIC_REQUESTS_PER_MINUTE)
+                stream = self._anthropic_stream(
+                    prompt, system_prompt, model, budget, temperature, json_mode, usage
+                )
+            else:
+                tier = None
+                stream = self._mock_stream(prompt, system_prompt, json_mode)
+            
+            # The slot is held until the provider stream is exhausted. A
+            # consumer that stops early or is cancelled (deadline, client
+            # disconnect) closes the provider connection right away.
+            async with llm_slots.slot() if tier else nullcontext():
+                start_time = time.time()
+                try:
+                    async for delta in stream:
+                        yield delta
+                finally:
+                    await stream.aclose()
+            
+            if tier:
+                model_router.record(
+                    provider, tier, time.time() - start_time, ok=True,
+                    output_tokens=usage.get("output_tokens") or budget.expected_tokens
+                )
+            if usage:
+                await self._record_usage(agent_type, usage, budget)
+        
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"LLM streaming failed: {e}")
+            if tier:
+                model_router.record(provider, tier, time.time() - start_time, ok=False)
+            raise
+    
+    def _output_budget(
+        self,
+        task_type: Optional[str],
+        duration: Optional[float],
+        json_mode: bool,
+        max_tokens: Optional[int],
+        items: Optional[int] = None
+    ) -> OutputBudget:
+        budget = token_budget.budget(task_type, duration, json_mode, items)
+        if max_tokens:
+            budget = budget._replace(max_tokens=max_tokens)
+        return budget
+    
+    async def _record_usage(self, agent_type: Optional[str], usage: Dict[str, int], budget: OutputBudget):
+        truncated = bool(usage.pop("truncated", 0))
+        token_budget.record(budget, usage.get("output_tokens", 0), truncated)
+        usage = {**usage, "requests": 1}
+        for field in USAGE_FIELDS:
+            self.usage[field] += usage.get(field, 0)
+        if agent_type:
+            await shared_metrics.record_usage(agent_type, usage)
+    
+    def get_usage_stats(self) -> Dict[str, Any]:
+        """Token usage of this service instance, including prompt cache hits"""
+        return usage_summary(self.usage)
+    
+    def _openai_request(
         self,
         prompt: str,
         system_prompt: Optional[str],
         model: str,
-        max_tokens: int,
-        temperature: float
-    ) -> str:
-        """Generate completion using OpenAI"""
-        
+        budget: OutputBudget,
+        temperature: float,
+        json_mode: bool
+    ) -> Dict[str, Any]:
+        # OpenAI caches prompt prefixes automatically, so the stable system
+        # prompt must come first and the variable user prompt last
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
         
+        request = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": budget.max_tokens,
+            "temperature": temperature
+        }
+        if budget.stop:
+            request["stop"] = budget.stop
+        if json_mode and supports_json_response_format(model):
+            request["response_format"] = {"type": "json_object"}
+        return request
+    
+    def _openai_usage(self, usage) -> Dict[str, int]:
+        if usage is None:
+            return {}
+        details = getattr(usage, "prompt_tokens_details", None)
+        return {
+            "input_tokens": usage.prompt_tokens,
+            "cached_input_tokens": (getattr(details, "cached_tokens", None) or 0) if details else 0,
+            "output_tokens": usage.completion_tokens,
+        }
+    
+    async def _openai_completion(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        model: str,
+        budget: OutputBudget,
+        temperature: float,
+        json_mode: bool = False
+    ) -> Tuple[str, Dict[str, int]]:
+        """Generate completion using OpenAI"""
+        
         response = await self.openai_client.chat.completions.create(
-            model=model,
-            messages=messages,
-            max_tokens=max_tokens,
-            temperature=temperature
+            **self._openai_request(prompt, system_prompt, model, budget, temperature, json_mode)
         )
         
-        return response.choices[0].message.content
+        usage = self._openai_usage(response.usage)
+        usage["truncated"] = int(response.choices[0].finish_reason == "length")
+        return response.choices[0].message.content, usage
     
-    async def _anthropic_completion(
+    async def _openai_stream(
         self,
         prompt: str,
         system_prompt: Optional[str],
         model: str,
-        max_tokens: int,
-        temperature: float
-    ) -> str:
-        """Generate completion using Anthropic Claude"""
+        budget: OutputBudget,
+        temperature: float,
+        json_mode: bool,
+        usage: Dict[str, int]
+    ) -> AsyncIterator[str]:
+        """Stream completion deltas from OpenAI, filling in usage at the end"""
+        
+        stream = await self.openai_client.chat.completions.create(
+            **self._openai_request(prompt, system_prompt, model, budget, temperature, json_mode),
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                if chunk.choices and chunk.choices[0].finish_reason == "length":
+                    usage["truncated"] = 1
+                if getattr(chunk, "usage", None):
+                    usage.update(self._openai_usage(chunk.usage))
+        finally:
+            await stream.close()
+    
+    def _anthropic_request(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        model: str,
+        budget: OutputBudget,
+        temperature: float,
+        json_mode: bool
+    ) -> Dict[str, Any]:
+        # Model names of other providers fall back to the default Claude model
+        claude_model = model if model.startswith("claude") else settings.ANTHROPIC_DEFAULT_MODEL
         
-        # Map OpenAI model names to Claude model names
-        claude_model = "claude-3-sonnet-20240229"
-        if "gpt-4" in model.lower():
-            claude_model = "claude-3-opus-20240229"
+        messages = [{"role": "user", "content": prompt}]
+        if json_mode:
+            # Prefill the opening brace so the reply is the JSON object itself
+            messages.append({"role": "assistant", "content": "{"})
         
-        full_prompt = prompt
+        request = {
+            "model": claude_model,
+            "max_tokens": budget.max_tokens,
+            "temperature": temperature,
+            "messages": messages
+        }
+        if budget.stop:
+            request["stop_sequences"] = budget.stop
         if system_prompt:
-            full_prompt = f"{system_prompt}\n\nHuman: {prompt}\n\nAssistant:"
+            # Native system parameter marked as a cacheable prefix; providers
+            # only cache prefixes of at least 1024 tokens
+            request["system"] = [{
+                "type": "text",
+                "text": system_prompt,
+                "cache_control": {"type": "ephemeral"}
+            }]
+        return request
+    
+    def _anthropic_usage(self, usage) -> Dict[str, int]:
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        return {
+            "input_tokens": usage.input_tokens + cache_read + cache_write,
+            "cached_input_tokens": cache_read,
+            "cache_write_tokens": cache_write,
+            "output_tokens": usage.output_tokens,
+        }
+    
+    async def _anthropic_completion(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        model: str,
+        budget: OutputBudget,
+        temperature: float,
+        json_mode: bool = False
+    ) -> Tuple[str, Dict[str, int]]:
+        """Generate completion using Anthropic Claude"""
         
         response = await self.anthropic_client.messages.create(
-            model=claude_model,
-            max_tokens=max_tokens,
-            temperature=temperature,
-            messages=[{"role": "user", "content": full_prompt}]
+            **self._anthropic_request(prompt, system_prompt, model, budget, temperature, json_mode)
         )
         
-        return response.content[0].text
+        text = response.content[0].text
+        if json_mode:
+            text = "{" + text
+        usage = self._anthropic_usage(response.usage)
+        usage["truncated"] = int(response.stop_reason == "max_tokens")
+        return text, usage
     
-    async def _mock_completion(self, prompt: str, system_prompt: Optional[str]) -> str:
+    async def _anthropic_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        model: str,
+        budget: OutputBudget,
+        temperature: float,
+        json_mode: bool,
+        usage: Dict[str, int]
+    ) -> AsyncIterator[str]:
+        """Stream completion deltas from Anthropic, filling in usage at the end"""
+        
+        request = self._anthropic_request(prompt, system_prompt, model, budget, temperature, json_mode)
+        if json_mode:
+            yield "{"
+        
+        async with self.anthropic_client.messages.stream(**request) as stream:
+            async for text in stream.text_stream:
+                yield text
+            final_message = await stream.get_final_message()
+        
+        usage.update(self._anthropic_usage(final_message.usage))
+        usage["truncated"] = int(final_message.stop_reason == "max_tokens")
+    
+    async def _mock_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        json_mode: bool = False
+    ) -> AsyncIterator[str]:
+        """Mock streaming for development/testing"""
+        text = await self._mock_completion(prompt, system_prompt, json_mode)
+        for i in range(0, len(text), 16):
+            yield text[i:i + 16]
+            await asyncio.sleep(0)
+    
+    async def _mock_completion(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        json_mode: bool = False
+    ) -> str:
         """Mock completion for development/testing"""
         
         # Simulate API delay
         await asyncio.sleep(0.5)
         
+        if json_mode:
+            return self._mock_json(prompt)
+        
         # Return mock responses based on prompt content
         if "research" in prompt.lower():
             return """
@@ -213,57 +577,110 @@ class LLMService:
             - Confidence score: 0.85
             - Next steps identified
             """
-    
+
+    def _mock_json(self, prompt: str) -> str:
+        """Mock JSON-mode response for development/testing"""
+
+        if '"ideas"' in prompt:
+            return json.dumps({
+                "ideas": [
+                    {
+                        "title": title,
+                        "description": f"Hook: {hook}. Walk through real examples and a simple plan to start.",
+                        "estimated_views": views,
+                        "difficulty_score": 0.4,
+                        "viral_potential": 0.7,
+                        "monetization_potential": 0.6,
+                        "target_keywords": ["ai tools", "productivity"],
+                        "content_type": "tutorial",
+                        "estimated_duration": 10
+                    }
+                    for title, hook, views in [
+                        ("5 AI Tools That Save Me 10 Hours a Week", "most people use AI wrong", 120000),
+                        ("I Automated My Morning Routine With AI", "this took 20 minutes to set up", 80000),
+                        ("The Beginner's Guide to Prompt Writing", "one sentence changes every answer", 60000)
+                    ]
+                ]
+            })
+
+        if "script" in prompt.lower():
+            return json.dumps({
+                "title": "5 AI Tools That Will Replace Your Job (But Make You Rich)",
+                "description": "The exact AI tools people use to earn more, and how to start with them today.",
+                "total_duration": 510.0,
+                "keywords": ["AI tools", "automation", "productivity"],
+                "tags": ["ai", "productivity", "side hustle"],
+                "hooks": ["If you're not using these 5 AI tools, you're already behind."],
+                "call_to_actions": ["Subscribe for a new AI tool every week"],
+                "scenes": [
+                    {"duration": 15.0, "content_type": "text", "content": "Hook: you're already behind without these tools", "transition": "cut", "effects": ["zoom_in"]},
+                    {"duration": 15.0, "content_type": "text", "content": "Promise: the exact tools and process", "transition": "fade", "effects": []},
+                    {"duration": 450.0, "content_type": "text", "content": "Tools 1-5 with examples", "transition": "slide", "effects": ["captions"]},
+                    {"duration": 30.0, "content_type": "text", "content": "Call to action", "transition": "fade", "effects": []}
+                ]
+            })
+
+        return json.dumps({
+            "summary": f"Mock AI response for: {prompt[:100]}",
+            "recommendations": ["Analysis completed", "Next steps identified"],
+            "confidence": 0.85
+        })
+
     async def generate_embeddings(self, text: str, model: str = "text-embedding-ada-002") -> List[float]:
         """Generate embeddings for text"""
+        return (await self.generate_embeddings_batch([text], model))[0]
+    
+    async def generate_embeddings_batch(
+        self,
+        texts: List[str],
+        model: str = "text-embedding-ada-002"
+    ) -> List[List[float]]:
+        """Embeddings for many texts: cached ones from Redis, the rest in batched requests"""
+        if not texts:
+            return []
         
+        vectors = await embedding_cache.get_many(model, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            embedded = await self._embed_batch(missing, model)
+            vectors = [vector if vector is not None else embedded[text] for text, vector in zip(texts, vectors)]
+        return vectors
+    
+    async def _embed_batch(self, texts: List[str], model: str) -> Dict[str, List[float]]:
         try:
             if self.openai_client:
-                response = await self.openai_client.embeddings.create(
-                    model=model,
-                    input=text
-                )
-                return response.data[0].embedding
+                embedded: Dict[str, List[float]] = {}
+                for start in range(0, len(texts), settings.EMBEDDING_BATCH_SIZE):
+                    chunk = texts[start:start + settings.EMBEDDING_BATCH_SIZE]
+                    await rate_limiter.acquire("openai", settings.OPENAI_REQUESTS_PER_MINUTE)
+                    async with llm_slots.slot():
+                        response = await self.openai_client.embeddings.create(
+                            model=model,
+                            input=chunk
+                        )
+                    for item in response.data:
+                        embedded[chunk[item.index]] = item.embedding
+                await embedding_cache.set_many(model, embedded)
+                return embedded
             else:
                 # Return mock embeddings for development
                 import random
-                return [random.random() for _ in range(1536)]
-                
+                return {text: [random.random() for _ in range(1536)] for text in texts}
+        
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Embedding generation failed: {e}")
-            # Return mock embeddings as fallback
+            # Return mock embeddings as fallback; these are never cached
             import random
-            return [random.random() for _ in range(1536)]
+            return {text: [random.random() for _ in range(1536)] for text in texts}
     
     async def analyze_sentiment(self, text: str) -> Dict[str, Any]:
-        """Analyze sentiment of text"""
-        
-        prompt = f"""
-        Analyze the sentiment of this text and provide a detailed breakdown:
-        
-        Text: "{text}"
-        
-        Provide:
-        1. Overall sentiment (positive/negative/neutral)
-        2. Sentiment score (-1 to 1)
-        3. Key emotional indicators
-        4. Tone analysis
-        5. Audience reception prediction
-        
-        Format as JSON.
-        """
+        """Analyze sentiment of text; the LLM is only used if the lexicon score is ambiguous"""
         
         try:
-            response = await self.generate_completion(prompt, max_tokens=500)
-            # In a real implementation, you would parse the JSON response
-            return {
-                "sentiment": "positive",
-                "score": 0.7,
-                "confidence": 0.85,
-                "emotions": ["excitement", "curiosity"],
-                "tone": "enthusiastic",
-                "raw_response": response
-            }
+            results = await sentiment_analyzer.analyze([text], llm=self)
+            return results[0]
         except Exception as e:
             logger.error(f"Sentiment analysis failed: {e}")
             return {
@@ -0,0 +1,152 @@
+import json
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..config import settings
+from ..models import MemoryPayload
+
+# Payload fields that are indexed in Qdrant and usable as search filters
+MEMORY_INDEXED_FIELDS = ["agent_id", "task_type", "channel_id", "niche"]
+
+# Only these fields are ever requested back from Qdrant, so legacy points that
+# still carry a full ``input_data`` blob do not inflate search responses
+MEMORY_PAYLOAD_FIELDS = list(MemoryPayload.model_fields.keys())
+
+BLOB_KEY_PREFIX = "memory_blob"
+
+
+def _clean(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def extract_memory_fields(input_data: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """Pull the identifying fields of a task out of its (untrusted) input data"""
+    channel_config = input_data.get("channel_config") or {}
+    if not isinstance(channel_config, dict):
+        channel_config = {}
+
+    niche = _clean(input_data.get("niche") or channel_config.get("niche"))
+
+    return {
+        "channel_id": _clean(
+            input_data.get("channel_id")
+            or channel_config.get("channel_id")
+            or channel_config.get("id")
+        ),
+        "niche": niche.lower() if niche else None,
+        "topic": _clean(input_data.get("topic")),
+        "video_id": _clean(input_data.get("video_id")),
+    }
+
+
+def truncate_utf8(text: str, max_bytes: int) -> str:
+    """Truncate text so that its UTF-8 encoding fits in max_bytes"""
+    encoded = text.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return text
+    return encoded[:max(max_bytes, 0)].decode("utf-8", errors="ignore")
+
+
+def result_to_text(result: Dict[str, Any]) -> str:
+    """Flatten a task result into plain text for summaries and embeddings"""
+    parts = []
+    for key, value in result.items():
+        if isinstance(value, str):
+            parts.append(f"{key}: {value.strip()}")
+        else:
+            parts.append(f"{key}: {json.dumps(value, default=str)}")
+    return "\n".join(parts)
+
+
+def blob_key(point_id: str) -> str:
+    return f"{BLOB_KEY_PREFIX}:{point_id}"
+
+
+def build_memory_payload(
+    point_id: str,
+    task_id: str,
+    agent_id: str,
+    agent_name: str,
+    task_type: Optional[str],
+    input_data: Dict[str, Any],
+    result: Dict[str, Any],
+) -> Tuple[MemoryPayload, Optional[str]]:
+    """
+    Build a bounded memory payload for a task result.
+
+    The task input (and with it any previously loaded context) is never stored;
+    only the fixed identifying fields are kept. If the full result does not fit
+    in MEMORY_PAYLOAD_MAX_BYTES it is returned separately so the caller can move
+    it to the blob store, and the payload keeps a truncated summary instead.
+    """
+    result_json = json.dumps(result, default=str)
+    text = result_to_text(result)
+
+    payload = MemoryPayload(
+        task_id=task_id,
+        agent_id=agent_id,
+        agent_name=agent_name,
+        task_type=task_type,
+        timestamp=time.time(),
+        summary=text[:settings.MEMORY_SUMMARY_MAX_CHARS],
+        result=result,
+        result_bytes=len(result_json.encode("utf-8")),
+        **extract_memory_fields(input_data)
+    )
+
+    if len(payload.model_dump_json().encode("utf-8")) <= settings.MEMORY_PAYLOAD_MAX_BYTES:
+        return payload, None
+
+    # Too large: keep the result out of the point and shrink the summary to fit
+    payload.result = None
+    payload.result_ref = blob_key(point_id)
+    payload.summary = ""
+    remaining = settings.MEMORY_PAYLOAD_MAX_BYTES - len(payload.model_dump_json().encode("utf-8"))
+    # Leave headroom for JSON escaping of the summary
+    payload.summary = truncate_utf8(text[:settings.MEMORY_SUMMARY_MAX_CHARS], remaining // 2)
+
+    return payload, result_json
+
+
+def build_embedding_text(payload: MemoryPayload, result: Dict[str, Any]) -> str:
+    """Bounded text used to embed a memory point"""
+    header = " | ".join(
+        value for value in (payload.task_type, payload.niche, payload.topic) if value
+    )
+    body = result_to_text(result)
+    return f"{header}\n{body}"[:settings.MEMORY_EMBED_MAX_CHARS]
+
+
+def build_query_text(task_type: str, input_data: Dict[str, Any]) -> str:
+    """Bounded query text for context search, ignoring previously loaded context"""
+    query_data = {k: v for k, v in input_data.items() if k != "context"}
+    fields = extract_memory_fields(query_data)
+    header = " | ".join(
+        value for value in (task_type, fields["niche"], fields["topic"]) if value
+    )
+    body = json.dumps(query_data, default=str)
+    return f"{header}\n{body}"[:settings.MEMORY_EMBED_MAX_CHARS]
+
+
+async def store_blob(redis, key: str, data: str):
+    """Move an oversized result to the blob store"""
+    await redis.setex(key, settings.MEMORY_BLOB_TTL, data)
+
+
+async def load_blob(redis, key: str) -> Optional[Dict[str, Any]]:
+    """Load a full result previously moved to the blob store"""
+    data = await redis.get(key)
+    if not data:
+        return None
+    return json.loads(data)
+
+
+def context_payloads(hits: List[Any]) -> List[Dict[str, Any]]:
+    """Convert Qdrant hits into context entries"""
+    return [
+        {**(hit.payload or {}), "id": str(hit.id), "score": getattr(hit, "score", None)}
+        for hit in hits
+    ]
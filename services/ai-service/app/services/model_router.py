@@ -0,0 +1,177 @@
+import logging
+import random
+from typing import Dict, Any, Optional, Tuple
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+TIERS = ["fast", "standard", "flagship"]
+
+# Default tier per task type. Short, formulaic tasks go to the fast tier;
+# long-horizon planning keeps the flagship model.
+ROUTING_TABLE: Dict[str, str] = {
+    "trend_analysis": "fast",
+    "viral_prediction": "fast",
+    "hook_generation": "fast",
+    "content_optimization": "fast",
+    "sentiment_analysis": "fast",
+    "competitor_analysis": "standard",
+    "comprehensive_research": "standard",
+    "script_generation": "standard",
+    "script_outline": "standard",
+    "script_segment": "standard",
+    "script_stitching": "fast",
+    "content_ideation": "standard",
+    "orchestrate_video_creation": "standard",
+    "performance_optimization": "standard",
+    "performance_analysis": "standard",
+    "strategic_planning": "flagship",
+}
+
+# Where traffic goes when a tier is unhealthy, in order of preference
+TIER_FALLBACKS: Dict[str, list] = {
+    "fast": ["standard"],
+    "standard": ["fast", "flagship"],
+    "flagship": ["standard"],
+}
+
+EWMA_ALPHA = 0.2
+MIN_SAMPLES = 5
+
+
+def tier_models(tier: str) -> Dict[str, str]:
+    return {
+        "fast": {"openai": settings.FAST_MODEL, "anthropic": settings.ANTHROPIC_FAST_MODEL},
+        "standard": {"openai": settings.DEFAULT_MODEL, "anthropic": settings.ANTHROPIC_DEFAULT_MODEL},
+        "flagship": {"openai": settings.FLAGSHIP_MODEL, "anthropic": settings.ANTHROPIC_FLAGSHIP_MODEL},
+    }[tier]
+
+
+def latency_budget(tier: str, output_tokens: Optional[int] = None) -> float:
+    """
+    Allowed latency of one call. Tier budgets cover a call that produces up
+    to DEFAULT_OUTPUT_TOKENS; longer outputs get proportionally more time, so
+    long scripts are not mistaken for a slow tier.
+    """
+    budget = {
+        "fast": settings.FAST_TIER_LATENCY_BUDGET,
+        "standard": settings.STANDARD_TIER_LATENCY_BUDGET,
+        "flagship": settings.FLAGSHIP_TIER_LATENCY_BUDGET,
+    }[tier]
+    return budget * max(1.0, (output_tokens or 0) / settings.DEFAULT_OUTPUT_TOKENS)
+
+
+class TierStats:
+    """
+    Exponentially weighted error rate and latency of one provider/tier.
+
+    Latency is tracked relative to each call's budget (1.0 = on budget) and
+    only for successful calls; failures only move the error rate.
+    """
+
+    def __init__(self):
+        self.samples = 0
+        self.latency_samples = 0
+        self.latency_ratio = 0.0
+        self.error_rate = 0.0
+
+    def record(self, latency_ratio: Optional[float], ok: bool):
+        self.samples += 1
+        outcome = 0.0 if ok else 1.0
+        if self.samples == 1:
+            self.error_rate = outcome
+        else:
+            self.error_rate += EWMA_ALPHA * (outcome - self.error_rate)
+        if not ok or latency_ratio is None:
+            return
+        self.latency_samples += 1
+        if self.latency_samples == 1:
+            self.latency_ratio = latency_ratio
+        else:
+            self.latency_ratio += EWMA_ALPHA * (latency_ratio - self.latency_ratio)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "latency_ratio": round(self.latency_ratio, 3),
+            "error_rate": round(self.error_rate, 3)
+        }
+
+
+class ModelRouter:
+    """Maps agent/task types to model tiers, shifting traffic away from unhealthy tiers"""
+
+    def __init__(self):
+        self.stats: Dict[Tuple[str, str], TierStats] = {}
+
+    def base_tier(self, agent_type: Optional[str], task_type: Optional[str]) -> str:
+        overrides = settings.MODEL_ROUTING_OVERRIDES
+        for key in (f"{agent_type}:{task_type}", task_type):
+            if overrides.get(key) in TIERS:
+                return overrides[key]
+        for key in (f"{agent_type}:{task_type}", task_type):
+            if key in ROUTING_TABLE:
+                return ROUTING_TABLE[key]
+        return "standard"
+
+    def is_healthy(self, provider: str, tier: str) -> bool:
+        stats = self.stats.get((provider, tier))
+        if stats is None or stats.samples < MIN_SAMPLES:
+            return True
+        if stats.error_rate > settings.MODEL_ROUTER_MAX_ERROR_RATE:
+            return False
+        return stats.latency_samples < MIN_SAMPLES or stats.latency_ratio <= 1.0
+
+    def route(
+        self,
+        agent_type: Optional[str],
+        task_type: Optional[str],
+        provider: str
+    ) -> Tuple[str, str]:
+        """Pick (tier, model) for a call"""
+        tier = self.base_tier(agent_type, task_type)
+
+        # A small share of traffic keeps probing an unhealthy tier so it can recover
+        if not self.is_healthy(provider, tier) and random.random() >= settings.MODEL_ROUTER_PROBE_RATE:
+            for fallback in TIER_FALLBACKS[tier]:
+                if self.is_healthy(provider, fallback):
+                    logger.debug(f"Routing {task_type} from {tier} to {fallback} tier")
+                    tier = fallback
+                    break
+
+        return tier, tier_models(tier).get(provider, settings.DEFAULT_MODEL)
+
+    def resolve(self, model: str, provider: str) -> Tuple[Optional[str], str]:
+        """Find the tier of an explicit model name and its equivalent on this provider"""
+        for tier in reversed(TIERS):
+            models = tier_models(tier)
+            if model in models.values():
+                return tier, models.get(provider, model)
+        return None, model
+
+    def record(
+        self,
+        provider: str,
+        tier: str,
+        latency: float,
+        ok: bool,
+        output_tokens: Optional[int] = None
+    ):
+        """Record a call; latency counts against the budget for its output length"""
+        stats = self.stats.get((provider, tier))
+        if stats is None:
+            stats = self.stats[(provider, tier)] = TierStats()
+        stats.record(latency / latency_budget(tier, output_tokens) if ok else None, ok)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            f"{provider}:{tier}": {
+                **stats.to_dict(),
+                "healthy": self.is_healthy(provider, tier)
+            }
+            for (provider, tier), stats in self.stats.items()
+        }
+
+
+model_router = ModelRouter()
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from ..agents import get_agent
+from ..config import settings
+from ..database import async_session_maker, get_redis, is_ready
+from .result_cache import result_cache, unrecorded
+from .shared_state import worker_id
+
+logger = logging.getLogger(__name__)
+
+PREWARM_LOCK_KEY = "prewarm:cycle"
+
+# Cached task types that are prewarmed from the keys production requested,
+# since their keys hold request data (topic, audience, trends) that cannot be
+# derived from the channel; the cache keys are valid task input as they are
+REQUESTED_KEY_TASKS = [
+    ("research_agent", "comprehensive_research"),
+    ("manus", "content_ideation"),
+]
+
+ACTIVE_CHANNELS_QUERY = text("""
+    SELECT id, niche
+    FROM channels
+    WHERE is_active AND niche IS NOT NULL AND niche <> ''
+    ORDER BY updated_at DESC
+""")
+
+
+def in_off_peak_window(now: Optional[datetime] = None) -> bool:
+    """Whether the current UTC hour is inside the prewarm window (may wrap midnight)"""
+    hour = (now or datetime.now(timezone.utc)).hour
+    start, end = settings.PREWARM_WINDOW_START_HOUR, settings.PREWARM_WINDOW_END_HOUR
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def seconds_left_in_window(now: Optional[datetime] = None) -> float:
+    now = now or datetime.now(timezone.utc)
+    end = now.replace(hour=settings.PREWARM_WINDOW_END_HOUR, minute=0, second=0, microsecond=0)
+    remaining = (end - now).total_seconds()
+    if remaining <= 0:
+        remaining += 24 * 3600
+    return remaining
+
+
+async def load_active_channels() -> List[Dict[str, str]]:
+    """Active channels and their niches from the channels table"""
+    async with async_session_maker() as session:
+        rows = (await session.execute(ACTIVE_CHANNELS_QUERY)).all()
+    return [{"channel_id": str(row.id), "niche": row.niche.strip()} for row in rows]
+
+
+def build_prewarm_jobs(
+    channels: List[Dict[str, str]],
+    requested: Dict[str, List[Dict[str, Any]]]
+) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """
+    (agent, task type, input) per cached result worth prewarming.
+
+    Trends depend only on the niche, so every active niche is prewarmed.
+    Research and ideation replay the keys requested recently for an active
+    niche or channel.
+    """
+    niches = set(channel["niche"].lower() for channel in channels)
+    channel_ids = set(channel["channel_id"] for channel in channels)
+    jobs = [
+        ("trend_predictor", "trend_analysis", {"niche": niche})
+        for niche in sorted(niches)
+    ]
+    for agent_name, task_type in REQUESTED_KEY_TASKS:
+        for key in requested.get(task_type, []):
+            # Per-channel keys need an active channel, niche-level ones an active niche
+            if "channel_id" in key:
+                active = key["channel_id"] in channel_ids
+            else:
+                active = key.get("niche") in niches
+            if active:
+                jobs.append((agent_name, task_type, dict(key)))
+    return jobs
+
+
+async def prewarm_once() -> Dict[str, Any]:
+    """
+    Run every prewarm job once, spread evenly over what is left of the window.
+
+    Jobs go through the agents, so fresh results are skipped and stale ones are
+    refreshed; LLM calls stay under the shared provider rate limits.
+    """
+    channels = await load_active_channels()
+    requested = {
+        task_type: await result_cache.requested_keys(task_type, settings.PREWARM_REQUESTED_MAX_AGE)
+        for _, task_type in REQUESTED_KEY_TASKS
+    }
+    jobs = build_prewarm_jobs(channels, requested)
+    if not jobs:
+        return {"jobs": 0}
+
+    spacing = min(seconds_left_in_window() / len(jobs), settings.PREWARM_MAX_JOB_SPACING)
+    outcomes: Dict[str, int] = {}
+    logger.info(f"Prewarming {len(jobs)} results for {len(channels)} active channels")
+
+    for agent_name, task_type, input_data in jobs:
+        started = time.time()
+        # Prewarm lookups must not keep their own keys alive
+        with unrecorded():
+            response = await get_agent(agent_name).process_task(
+                task_id=f"prewarm:{task_type}:{input_data.get('channel_id') or input_data['niche']}",
+                task_type=task_type,
+                input_data=input_data
+            )
+        outcome = response.cache_status or response.status
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        if not in_off_peak_window():
+            logger.info("Prewarm window closed, leaving the remaining jobs for the next cycle")
+            break
+        await asyncio.sleep(max(spacing - (time.time() - started), 0.0))
+
+    logger.info(f"Prewarm cycle finished: {outcomes}")
+    return {"jobs": len(jobs), "outcomes": outcomes}
+
+
+async def _acquire_cycle_lock() -> bool:
+    """One prewarm cycle per interval across all workers and replicas"""
+    redis = await get_redis()
+    return bool(await redis.set(
+        PREWARM_LOCK_KEY, worker_id(), nx=True, ex=settings.PREWARM_INTERVAL
+    ))
+
+
+async def run_prewarm_scheduler():
+    """Background task: prewarm cached results during the off-peak window"""
+    if not settings.PREWARM_ENABLED:
+        return
+    while True:
+        try:
+            if is_ready() and in_off_peak_window() and await _acquire_cycle_lock():
+                await prewarm_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Prewarm cycle failed: {e}")
+        await asyncio.sleep(settings.PREWARM_CHECK_INTERVAL)
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Dict, Tuple
+
+from ..config import settings
+from ..database import get_redis
+from .deadline import DeadlineExceeded, remaining
+from .saturation import saturation
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Fixed-window request limiter.
+
+    Each limit gets a window close to the configured width that holds a whole
+    number of requests at exactly the per-minute rate. Counters live in Redis so every worker process and replica draws from the
+    same budget; if Redis is unavailable each process falls back to a local
+    counter.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self.local_counts: Dict[str, int] = {}
+
+    def limit_window(self, per_minute: int) -> Tuple[int, float]:
+        """Requests per window and the window length (seconds) for a per-minute rate"""
+        limit = max(1, math.ceil(per_minute * self.window / 60))
+        return limit, limit * 60 / per_minute
+
+    async def _increment(self, key: str, window: float) -> int:
+        try:
+            redis = await get_redis()
+            pipe = redis.pipeline(transaction=True)
+            pipe.incr(key)
+            pipe.expire(key, max(int(math.ceil(window * 2)), 1))
+            count, _ = await pipe.execute()
+            return int(count)
+        except Exception as e:
+            logger.debug(f"Rate limiter falling back to local counter: {e}")
+            # Drop counters of windows that have passed
+            if len(self.local_counts) > 1000:
+                self.local_counts.clear()
+            self.local_counts[key] = self.local_counts.get(key, 0) + 1
+            return self.local_counts[key]
+
+    async def acquire(self, name: str, per_minute: int) -> float:
+        """
+        Wait for a request slot; returns the time spent waiting.
+
+        Gives up with DeadlineExceeded when the running task's deadline would
+        pass before the next window opens.
+        """
+        if per_minute <= 0:
+            return 0.0
+
+        limit, window = self.limit_window(per_minute)
+        wait_started = None
+        try:
+            while True:
+                window_index = int(time.time() // window)
+                count = await self._increment(f"ratelimit:{name}:{limit}:{window_index}", window)
+                if count <= limit:
+                    saturation.rate_limit_acquired(name)
+                    return time.time() - wait_started if wait_started is not None else 0.0
+                delay = (window_index + 1) * window - time.time()
+                delay = max(delay, 0.01)
+                left = remaining()
+                if left is not None and left < delay:
+                    # Do not take a slot of the next window for a request
+                    # that will be abandoned before it is sent
+                    raise DeadlineExceeded("Task deadline exceeded while rate limited")
+                if wait_started is None:
+                    wait_started = time.time()
+                    saturation.rate_limit_wait_started(name)
+                await asyncio.sleep(delay)
+        finally:
+            # Abandoned and cancelled waits leave the gauge too, but only
+            # granted slots count as acquisitions
+            if wait_started is not None:
+                saturation.rate_limit_wait_finished(name, time.time() - wait_started)
+
+
+rate_limiter = RateLimiter(window=settings.RATE_LIMIT_WINDOW)
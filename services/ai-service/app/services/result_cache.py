@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Awaitable, Callable, List, NamedTuple, Set, Tuple
+
+from ..config import settings
+from ..database import get_redis
+from .deadline import no_deadline
+from .shared_state import worker_id
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_PREFIX = "result_cache"
+# Per namespace: keys requested recently, scored by last request time
+REQUESTED_KEYS_PREFIX = "result_cache_requested"
+
+_record_requests: ContextVar[bool] = ContextVar("result_cache_record_requests", default=True)
+
+# Cache outcomes reported to callers
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+class Uncacheable(NamedTuple):
+    """A degraded value returned by compute: served to its callers, never cached"""
+    value: Any
+
+
+def _unwrap(value: Any) -> Any:
+    return value.value if isinstance(value, Uncacheable) else value
+
+
+@contextmanager
+def unrecorded():
+    """Lookups in this block (e.g. prewarm jobs) are not recorded as requested keys"""
+    token = _record_requests.set(False)
+    try:
+        yield
+    finally:
+        _record_requests.reset(token)
+
+
+class ResultCache:
+    """
+    Stale-while-revalidate cache for task results shared by many requests.
+
+    Entries live in Redis for fresh_ttl + stale_ttl seconds. Fresh entries are
+    returned as is. Stale entries are returned immediately while a single
+    refresh runs in the background; a SET NX lock makes it one refresh across
+    all workers. Only cold misses wait for the computation, and concurrent
+    misses for the same key in this process share one computation.
+
+    compute runs once per computation, whoever triggered it, so work that must
+    happen once per new result (such as storing it in agent memory) belongs in
+    compute. It returns Uncacheable(value) for a degraded result that should
+    be retried by the next request instead of being served for hours.
+
+    Every requested key is recorded so that prewarming refreshes exactly the
+    keys production asks for.
+    """
+
+    def __init__(self):
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.refreshes: Set[asyncio.Task] = set()
+
+    def _key(self, namespace: str, key: Dict[str, Any]) -> str:
+        digest = hashlib.sha256(
+            json.dumps(key, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()[:32]
+        return f"{RESULT_CACHE_PREFIX}:{namespace}:{digest}"
+
+    async def get_or_compute(
+        self,
+        namespace: str,
+        key: Dict[str, Any],
+        compute: Callable[[], Awaitable[Any]],
+        fresh_ttl: int,
+        stale_ttl: int
+    ) -> Tuple[Any, str]:
+        """Return (value, outcome) where outcome is fresh, stale or miss"""
+        if not settings.RESULT_CACHE_ENABLED:
+            return _unwrap(await compute()), MISS
+
+        cache_key = self._key(namespace, key)
+        entry = await self._read(cache_key, namespace, key)
+        if entry is not None:
+            if time.time() - entry["created_at"] < fresh_ttl:
+                return entry["value"], FRESH
+            await self._refresh_in_background(cache_key, compute, fresh_ttl, stale_ttl)
+            return entry["value"], STALE
+
+        future = self.inflight.get(cache_key)
+        if future is None:
+            future = asyncio.ensure_future(
+                self._compute_and_store(cache_key, compute, fresh_ttl, stale_ttl)
+            )
+            self.inflight[cache_key] = future
+            future.add_done_callback(lambda _: self.inflight.pop(cache_key, None))
+        # Shielded so a cancelled caller does not cancel the shared computation
+        return _unwrap(await asyncio.shield(future)), MISS
+
+    async def _read(self, cache_key: str, namespace: str, key: Dict[str, Any]):
+        try:
+            redis = await get_redis()
+            pipe = redis.pipeline(transaction=False)
+            pipe.get(cache_key)
+            if _record_requests.get():
+                pipe.zadd(
+                    f"{REQUESTED_KEYS_PREFIX}:{namespace}",
+                    {json.dumps(key, sort_keys=True, default=str): time.time()}
+                )
+            data = (await pipe.execute())[0]
+        except Exception as e:
+            logger.warning(f"Result cache read failed for {cache_key}: {e}")
+            return None
+        return json.loads(data) if data else None
+
+    async def _compute_and_store(
+        self,
+        cache_key: str,
+        compute: Callable[[], Awaitable[Any]],
+        fresh_ttl: int,
+        stale_ttl: int
+    ) -> Any:
+        # Tasks inherit the deadline of the request that created them; the
+        # result is shared with waiters that may have none
+        with no_deadline():
+            value = await compute()
+        if isinstance(value, Uncacheable):
+            # A stale entry, if any, stays in place
+            logger.info(f"Not caching degraded result for {cache_key}")
+            return value
+        try:
+            redis = await get_redis()
+            await redis.setex(
+                cache_key,
+                fresh_ttl + stale_ttl,
+                json.dumps({"value": value, "created_at": time.time()}, default=str)
+            )
+        except Exception as e:
+            logger.warning(f"Result cache write failed for {cache_key}: {e}")
+        return value
+
+    async def requested_keys(self, namespace: str, max_age: int) -> List[Dict[str, Any]]:
+        """Keys of a namespace requested in the last max_age seconds, oldest first"""
+        requested = f"{REQUESTED_KEYS_PREFIX}:{namespace}"
+        redis = await get_redis()
+        await redis.zremrangebyscore(requested, "-inf", time.time() - max_age)
+        return [json.loads(member) for member in await redis.zrange(requested, 0, -1)]
+
+    async def _refresh_in_background(
+        self,
+        cache_key: str,
+        compute: Callable[[], Awaitable[Any]],
+        fresh_ttl: int,
+        stale_ttl: int
+    ):
+        if cache_key in self.inflight:
+            return
+        lock_key = f"{cache_key}:refresh"
+        try:
+            redis = await get_redis()
+            acquired = await redis.set(
+                lock_key, worker_id(), nx=True, ex=settings.RESULT_CACHE_REFRESH_LOCK_TTL
+            )
+        except Exception as e:
+            logger.warning(f"Result cache refresh lock failed for {cache_key}: {e}")
+            return
+        if not acquired:
+            return
+
+        async def refresh():
+            try:
+                await self._compute_and_store(cache_key, compute, fresh_ttl, stale_ttl)
+            except Exception as e:
+                logger.error(f"Background refresh of {cache_key} failed: {e}")
+            finally:
+                try:
+                    await redis.delete(lock_key)
+                except Exception:
+                    pass
+
+        task = asyncio.create_task(refresh())
+        self.inflight[cache_key] = task
+        self.refreshes.add(task)
+        task.add_done_callback(self.refreshes.discard)
+        task.add_done_callback(lambda _: self.inflight.pop(cache_key, None))
+
+
+result_cache = ResultCache()
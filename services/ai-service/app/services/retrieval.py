@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from typing import Dict, Any, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from qdrant_client.models import FieldCondition, Filter, MatchValue, SearchRequest
+
+from ..config import settings
+from ..database import get_qdrant, get_search_params
+from ..models import RetrievalPolicy
+from .memory import MEMORY_PAYLOAD_FIELDS, context_payloads, extract_memory_fields
+from .vector_cache import vector_cache
+
+logger = logging.getLogger(__name__)
+
+# Default for tasks without a policy: no context is fetched at all
+NO_CONTEXT = RetrievalPolicy()
+
+
+class MemorySearch(NamedTuple):
+    """One search in a batch"""
+    collection: str
+    vector: np.ndarray
+    top_k: int = 5
+    score_threshold: Optional[float] = None
+    conditions: Optional[Dict[str, str]] = None
+
+
+def as_vector(vector: Sequence[float]) -> np.ndarray:
+    """Embeddings travel as float32 arrays rather than Python float lists"""
+    return np.asarray(vector, dtype=np.float32)
+
+
+def build_filter_conditions(policy: RetrievalPolicy, input_data: Dict[str, Any]) -> Dict[str, str]:
+    """Payload values a hit must share with the task (e.g. same channel/niche)"""
+    fields = extract_memory_fields(input_data)
+    return {
+        field: fields[field]
+        for field in policy.filter_fields
+        if fields.get(field)
+    }
+
+
+def build_payload_filter(conditions: Optional[Dict[str, str]]) -> Optional[Filter]:
+    """Translate filter conditions into a Qdrant filter"""
+    if not conditions:
+        return None
+    return Filter(must=[
+        FieldCondition(key=field, match=MatchValue(value=value))
+        for field, value in conditions.items()
+    ])
+
+
+def _merge_hits(primary: List[Dict[str, Any]], secondary: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+    seen = {hit["id"] for hit in primary}
+    merged = primary + [hit for hit in secondary if hit["id"] not in seen]
+    merged.sort(key=lambda hit: hit.get("score") or 0.0, reverse=True)
+    return merged[:top_k]
+
+
+def _search_request(search: MemorySearch, with_vector: bool) -> SearchRequest:
+    return SearchRequest(
+        vector=search.vector,
+        filter=build_payload_filter(search.conditions),
+        limit=search.top_k,
+        score_threshold=search.score_threshold,
+        with_payload=MEMORY_PAYLOAD_FIELDS,
+        with_vector=with_vector,
+        params=get_search_params()
+    )
+
+
+async def search_memory_batch(searches: List[MemorySearch]) -> List[List[Dict[str, Any]]]:
+    """
+    Run several memory searches, possibly across collections, in one step.
+
+    Searches are grouped into one search_batch request per collection, sent
+    concurrently (over a single HTTP/2 channel when gRPC is enabled), and
+    merged with the local vector tier, which holds points written since
+    Qdrant last indexed them. If Qdrant is unavailable for a collection, the
+    local hits are served instead.
+    """
+    results = [
+        vector_cache.search(
+            search.collection,
+            search.vector,
+            search.top_k,
+            score_threshold=search.score_threshold,
+            conditions=search.conditions
+        )
+        for search in searches
+    ]
+
+    # The local tier only holds recent points; better matches may only be in
+    # Qdrant, so it is always consulted
+    by_collection: Dict[str, List[int]] = {}
+    for i, search in enumerate(searches):
+        by_collection.setdefault(search.collection, []).append(i)
+    if not by_collection:
+        return results
+
+    admit = vector_cache.enabled and settings.VECTOR_CACHE_ADMIT_ON_MISS
+    qdrant = await get_qdrant()
+    responses = await asyncio.gather(
+        *[
+            qdrant.search_batch(
+                collection_name=collection,
+                requests=[_search_request(searches[i], admit) for i in indices]
+            )
+            for collection, indices in by_collection.items()
+        ],
+        return_exceptions=True
+    )
+
+    for (collection, indices), response in zip(by_collection.items(), responses):
+        if isinstance(response, Exception):
+            logger.warning(f"Qdrant search on {collection} failed, serving local tier: {response}")
+            continue
+        for i, hits in zip(indices, response):
+            if admit:
+                for hit in hits:
+                    if isinstance(hit.vector, list):
+                        vector_cache.add(collection, str(hit.id), hit.vector, hit.payload or {})
+            results[i] = _merge_hits(context_payloads(hits), results[i], searches[i].top_k)
+
+    return results
+
+
+async def search_memory(
+    policy: RetrievalPolicy,
+    query_vector: Sequence[float],
+    conditions: Optional[Dict[str, str]] = None
+) -> List[Dict[str, Any]]:
+    """Search the policy's collections in a single batch and tag hits by collection"""
+    vector = as_vector(query_vector)
+    collections = [policy.collection] + policy.extra_collections
+    batch = await search_memory_batch([
+        MemorySearch(
+            collection=collection,
+            vector=vector,
+            top_k=policy.top_k,
+            score_threshold=policy.score_threshold,
+            conditions=conditions
+        )
+        for collection in collections
+    ])
+    return [
+        {**hit, "collection": collection}
+        for collection, hits in zip(collections, batch)
+        for hit in hits
+    ]
@@ -0,0 +1,283 @@
+import asyncio
+import json
+import logging
+import socket
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Deque, List, Optional
+
+from ..config import settings
+from ..database import get_redis
+from .shared_state import worker_id
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "assos"
+
+
+def _host_key() -> str:
+    return f"saturation:{socket.gethostname()}"
+
+
+class LLMSlots:
+    """
+    Process-wide cap on concurrent provider calls.
+
+    Waiting for a slot is the clearest sign that a replica is saturated on
+    LLM I/O while its CPU stays idle, so slot use is exported as a gauge.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_use = 0
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.capacity <= 0:
+            self.in_use += 1
+            try:
+                yield
+            finally:
+                self.in_use -= 1
+            return
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.capacity)
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_use += 1
+        try:
+            yield
+        finally:
+            self.in_use -= 1
+            self._semaphore.release()
+
+
+class SaturationMonitor:
+    """
+    Queue depth, in-flight work and wait times of this worker process.
+
+    All updates are plain counter increments on the event loop; a snapshot is
+    only built when the metrics endpoints are read or shared with the other
+    workers of the host.
+    """
+
+    def __init__(self):
+        self.subscriptions: Dict[str, Any] = {}
+        self.queues: Dict[str, asyncio.Queue] = {}
+        # Receive times of the queued messages per subject, oldest first
+        self.received_at: Dict[str, Deque[float]] = defaultdict(deque)
+        self.subject_in_flight: Dict[str, int] = defaultdict(int)
+        self.agent_in_flight: Dict[str, int] = defaultdict(int)
+        self.rate_limit_waiting: Dict[str, int] = defaultdict(int)
+        self.rate_limit_wait_seconds: Dict[str, float] = defaultdict(float)
+        self.rate_limit_acquisitions: Dict[str, int] = defaultdict(int)
+
+    def register_subject(self, subject: str, queue: asyncio.Queue, subscription: Any = None):
+        self.queues[subject] = queue
+        self.subscriptions[subject] = subscription
+
+    def message_received(self, subject: str):
+        self.received_at[subject].append(time.time())
+
+    def message_started(self, subject: str):
+        if self.received_at[subject]:
+            self.received_at[subject].popleft()
+        self.subject_in_flight[subject] += 1
+
+    def message_finished(self, subject: str):
+        self.subject_in_flight[subject] -= 1
+
+    def task_started(self, agent_key: str):
+        self.agent_in_flight[agent_key] += 1
+
+    def task_finished(self, agent_key: str):
+        self.agent_in_flight[agent_key] -= 1
+
+    def rate_limit_wait_started(self, name: str):
+        self.rate_limit_waiting[name] += 1
+
+    def rate_limit_wait_finished(self, name: str, waited: float):
+        """End of a wait, whether it got a slot or was given up"""
+        self.rate_limit_waiting[name] -= 1
+        self.rate_limit_wait_seconds[name] += waited
+
+    def rate_limit_acquired(self, name: str):
+        self.rate_limit_acquisitions[name] += 1
+
+    def _pending(self, subject: str) -> int:
+        pending = self.queues[subject].qsize()
+        subscription = self.subscriptions.get(subject)
+        if subscription is not None:
+            # Messages NATS delivered that are not in our queue yet
+            pending += subscription.pending_msgs
+        return pending
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "subjects": {
+                subject: {
+                    "pending": self._pending(subject),
+                    "in_flight": self.subject_in_flight[subject],
+                    "oldest_age": (
+                        round(now - self.received_at[subject][0], 3) if self.received_at[subject] else 0.0
+                    ),
+                }
+                for subject in self.queues
+            },
+            "agents": {agent: {"in_flight": count} for agent, count in self.agent_in_flight.items()},
+            "llm_slots": {
+                "capacity": llm_slots.capacity,
+                "in_use": llm_slots.in_use,
+                "waiting": llm_slots.waiting,
+            },
+            "rate_limiter": {
+                name: {
+                    "waiting": self.rate_limit_waiting[name],
+                    "wait_seconds_total": round(self.rate_limit_wait_seconds[name], 3),
+                    "acquisitions_total": self.rate_limit_acquisitions[name],
+                }
+                for name in self.rate_limit_acquisitions.keys() | self.rate_limit_waiting.keys()
+            },
+        }
+
+
+def merge_snapshots(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Totals over worker snapshots; ages keep the maximum"""
+    merged: Dict[str, Any] = {
+        "workers": len(snapshots),
+        "subjects": {},
+        "agents": {},
+        "llm_slots": {"capacity": 0, "in_use": 0, "waiting": 0},
+        "rate_limiter": {},
+    }
+    for snapshot in snapshots:
+        for group in ("subjects", "agents", "rate_limiter"):
+            for name, values in snapshot.get(group, {}).items():
+                totals = merged[group].setdefault(name, {})
+                for field, value in values.items():
+                    if field == "oldest_age":
+                        totals[field] = max(totals.get(field, 0.0), value)
+                    else:
+                        totals[field] = totals.get(field, 0) + value
+        for field, value in snapshot.get("llm_slots", {}).items():
+            merged["llm_slots"][field] += value
+
+    slots = merged["llm_slots"]
+    merged["llm_slot_utilization"] = round(slots["in_use"] / slots["capacity"], 3) if slots["capacity"] else None
+    return merged
+
+
+async def publish_snapshot():
+    """Share this worker's snapshot with the other workers of the host"""
+    redis = await get_redis()
+    key = _host_key()
+    snapshot = {**saturation.snapshot(), "reported_at": time.time()}
+    pipe = redis.pipeline(transaction=True)
+    pipe.hset(key, worker_id(), json.dumps(snapshot))
+    pipe.expire(key, int(settings.SATURATION_PUBLISH_INTERVAL * 3) + 1)
+    await pipe.execute()
+
+
+async def collect_saturation() -> Dict[str, Any]:
+    """
+    Saturation of the whole host (pod).
+
+    With preforked workers a scrape reaches one of them at random, so each
+    worker publishes its snapshot to Redis and the answering worker merges
+    the fresh ones. A single worker, or a Redis outage, reports only itself.
+    """
+    own = saturation.snapshot()
+    if settings.WORKERS <= 1 or not settings.SHARED_STATE_ENABLED:
+        return merge_snapshots([own])
+
+    try:
+        redis = await get_redis()
+        reported = await redis.hgetall(_host_key())
+    except Exception as e:
+        logger.warning(f"Failed to load worker saturation snapshots: {e}")
+        return merge_snapshots([own])
+
+    own_id = worker_id()
+    stale_before = time.time() - settings.SATURATION_PUBLISH_INTERVAL * 3
+    snapshots = [own]
+    for worker, raw in reported.items():
+        worker = worker.decode() if isinstance(worker, bytes) else worker
+        if worker == own_id:
+            continue
+        snapshot = json.loads(raw)
+        if snapshot.get("reported_at", 0) >= stale_before:
+            snapshots.append(snapshot)
+    return merge_snapshots(snapshots)
+
+
+def _labels(**labels: str) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def prometheus_text(merged: Dict[str, Any]) -> str:
+    """Prometheus text exposition of a merged snapshot"""
+    metrics = [
+        ("subject_pending_messages", "gauge", "Messages received or buffered but not started",
+         [(_labels(subject=s), v["pending"]) for s, v in merged["subjects"].items()]),
+        ("subject_in_flight_messages", "gauge", "Messages being handled",
+         [(_labels(subject=s), v["in_flight"]) for s, v in merged["subjects"].items()]),
+        ("subject_oldest_message_age_seconds", "gauge", "Age of the oldest queued message",
+         [(_labels(subject=s), v["oldest_age"]) for s, v in merged["subjects"].items()]),
+        ("agent_in_flight_tasks", "gauge", "Tasks being processed per agent",
+         [(_labels(agent=a), v["in_flight"]) for a, v in merged["agents"].items()]),
+        ("llm_slots_capacity", "gauge", "Concurrent LLM call slots (0 = unbounded)",
+         [("", merged["llm_slots"]["capacity"])]),
+        ("llm_slots_in_use", "gauge", "LLM calls in progress",
+         [("", merged["llm_slots"]["in_use"])]),
+        ("llm_slots_waiting", "gauge", "Calls waiting for an LLM slot",
+         [("", merged["llm_slots"]["waiting"])]),
+        ("rate_limiter_waiting", "gauge", "Requests waiting for a provider rate limit window",
+         [(_labels(provider=p), v["waiting"]) for p, v in merged["rate_limiter"].items()]),
+        ("rate_limiter_wait_seconds_total", "counter", "Time spent waiting for provider rate limits",
+         [(_labels(provider=p), v["wait_seconds_total"]) for p, v in merged["rate_limiter"].items()]),
+        ("rate_limiter_acquisitions_total", "counter", "Provider rate limit acquisitions",
+         [(_labels(provider=p), v["acquisitions_total"]) for p, v in merged["rate_limiter"].items()]),
+        ("workers", "gauge", "Worker processes included in these metrics",
+         [("", merged["workers"])]),
+    ]
+
+    lines = []
+    for name, kind, description, samples in metrics:
+        name = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+    return "\n".join(lines) + "\n"
+
+
+async def run_saturation_publisher():
+    """Background task: publish this worker's snapshot while other workers share the host"""
+    if settings.WORKERS <= 1 or not settings.SHARED_STATE_ENABLED:
+        return
+
+    while True:
+        try:
+            await publish_snapshot()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"Failed to publish saturation snapshot: {e}")
+        await asyncio.sleep(settings.SATURATION_PUBLISH_INTERVAL)
+
+
+llm_slots = LLMSlots(settings.LLM_MAX_CONCURRENCY)
+saturation = SaturationMonitor()
@@ -0,0 +1,290 @@
+import asyncio
+import json
+import logging
+import re
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+from ..config import settings
+from .deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# Word weights in [-1, 1], tuned for short YouTube comments
+LEXICON: Dict[str, float] = {
+    # positive
+    "good": 0.5, "great": 0.8, "awesome": 0.9, "amazing": 0.9, "excellent": 0.9,
+    "love": 0.8, "loved": 0.8, "loving": 0.7, "like": 0.3, "liked": 0.4,
+    "best": 0.8, "nice": 0.5, "cool": 0.5, "perfect": 0.9, "fantastic": 0.9,
+    "brilliant": 0.9, "helpful": 0.7, "useful": 0.6, "informative": 0.6,
+    "clear": 0.4, "interesting": 0.5, "fun": 0.6, "funny": 0.5, "enjoyed": 0.7,
+    "enjoy": 0.6, "beautiful": 0.7, "wow": 0.6, "thanks": 0.5, "thank": 0.5,
+    "appreciate": 0.6, "underrated": 0.6, "legend": 0.7, "incredible": 0.9,
+    "impressive": 0.7, "inspiring": 0.8, "masterpiece": 1.0, "subscribed": 0.6,
+    "recommend": 0.6, "glad": 0.5, "happy": 0.6, "favorite": 0.7, "favourite": 0.7,
+    "fire": 0.5, "goat": 0.7, "gem": 0.7, "wholesome": 0.7, "quality": 0.4,
+    "easy": 0.3, "worth": 0.4, "win": 0.5, "lol": 0.3, "haha": 0.3,
+    "❤": 0.8, "❤️": 0.8, "😍": 0.9, "😂": 0.4, "🔥": 0.6, "👍": 0.6, "🙏": 0.5, "😊": 0.6,
+    # negative
+    "bad": -0.6, "terrible": -0.9, "awful": -0.9, "horrible": -0.9, "worst": -0.9,
+    "hate": -0.8, "hated": -0.8, "boring": -0.6, "dislike": -0.6, "disliked": -0.6,
+    "useless": -0.8, "waste": -0.7, "wasted": -0.7, "clickbait": -0.8, "scam": -0.9,
+    "fake": -0.7, "wrong": -0.5, "misleading": -0.7, "annoying": -0.6, "stupid": -0.7,
+    "dumb": -0.6, "trash": -0.8, "garbage": -0.8, "cringe": -0.6, "confusing": -0.5,
+    "poor": -0.5, "disappointed": -0.7, "disappointing": -0.7, "sad": -0.4,
+    "angry": -0.6, "unsubscribed": -0.8, "unsubscribe": -0.7, "lies": -0.7,
+    "lie": -0.6, "overrated": -0.5, "slow": -0.3, "loud": -0.3, "ads": -0.3,
+    "problem": -0.3, "issue": -0.3, "broken": -0.5, "fail": -0.6, "failed": -0.6,
+    "meh": -0.3, "ugh": -0.5, "sucks": -0.8, "worse": -0.6,
+    "👎": -0.7, "😡": -0.8, "😠": -0.7, "🤮": -0.9, "😴": -0.5,
+}
+
+NEGATORS = {
+    "not", "no", "never", "nothing", "nobody", "neither", "nor", "without", "hardly",
+    "dont", "don't", "doesnt", "doesn't", "didnt", "didn't", "isnt", "isn't",
+    "wasnt", "wasn't", "cant", "can't", "cannot", "wont", "won't", "aint", "ain't",
+}
+
+INTENSIFIERS = {
+    "very": 1.5, "really": 1.4, "so": 1.3, "super": 1.5, "extremely": 1.8,
+    "absolutely": 1.6, "totally": 1.4, "literally": 1.2, "incredibly": 1.6, "too": 1.2,
+}
+
+# Tokens after a negator whose polarity is flipped
+NEGATION_SCOPE = 3
+NEGATION_FACTOR = -0.75
+
+# Squashes raw sums into [-1, 1]
+NORMALIZATION_ALPHA = 1.5
+NEUTRAL_BAND = 0.05
+
+TOKEN_PATTERN = re.compile(r"[a-z']+|[☀-➿\U0001f300-\U0001faff]️?")
+
+LLM_ITEM_MAX_CHARS = 300
+
+# Batches larger than this are scored in a worker thread
+OFFLOAD_THRESHOLD = 2000
+
+
+def label_for(score: float) -> str:
+    if score >= NEUTRAL_BAND:
+        return "positive"
+    if score <= -NEUTRAL_BAND:
+        return "negative"
+    return "neutral"
+
+
+class LexiconSentimentModel:
+    """
+    Vectorized lexicon scorer.
+
+    Texts are tokenized once and flattened into a single token array; weights,
+    negation windows and intensifiers are then applied as array operations and
+    summed per text with bincount, so a batch costs a few NumPy passes.
+    """
+
+    def __init__(self):
+        vocabulary = sorted(set(LEXICON) | NEGATORS | set(INTENSIFIERS))
+        self.index = {token: i for i, token in enumerate(vocabulary)}
+        self.weights = np.array([LEXICON.get(token, 0.0) for token in vocabulary], dtype=np.float32)
+        self.is_negator = np.array([token in NEGATORS for token in vocabulary], dtype=bool)
+        self.boost = np.array([INTENSIFIERS.get(token, 1.0) for token in vocabulary], dtype=np.float32)
+
+    def tokenize(self, text: str) -> List[str]:
+        return TOKEN_PATTERN.findall(text.lower().replace("’", "'"))
+
+    def score(self, texts: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Per-text score in [-1, 1], lexicon hit counts and token counts"""
+        n = len(texts)
+        ids: List[int] = []
+        doc: List[int] = []
+        positions: List[int] = []
+        lengths = np.zeros(n, dtype=np.int32)
+        index = self.index
+        for i, text in enumerate(texts):
+            tokens = self.tokenize(text or "")
+            lengths[i] = len(tokens)
+            for position, token in enumerate(tokens):
+                token_id = index.get(token)
+                if token_id is not None:
+                    ids.append(token_id)
+                    doc.append(i)
+                    positions.append(position)
+        # Only known tokens are kept, with their positions for the windows below
+        if not ids:
+            zeros = np.zeros(n, dtype=np.float32)
+            return {"score": zeros, "positive": zeros, "negative": zeros, "tokens": lengths}
+
+        ids_arr = np.asarray(ids, dtype=np.int32)
+        doc_arr = np.asarray(doc, dtype=np.int32)
+        pos_arr = np.asarray(positions, dtype=np.int32)
+        weights = self.weights[ids_arr].copy()
+        negator = self.is_negator[ids_arr]
+        boost = self.boost[ids_arr]
+
+        # Flip polarity of words that follow a negator in the same text, and
+        # scale words that directly follow an intensifier
+        negated = np.zeros(len(ids_arr), dtype=bool)
+        for shift in range(1, NEGATION_SCOPE + 1):
+            if shift >= len(ids_arr):
+                break
+            in_scope = (doc_arr[shift:] == doc_arr[:-shift]) & (pos_arr[shift:] - pos_arr[:-shift] <= NEGATION_SCOPE)
+            negated[shift:] |= negator[:-shift] & in_scope
+        weights[negated] *= NEGATION_FACTOR
+        if len(ids_arr) > 1:
+            adjacent = (doc_arr[1:] == doc_arr[:-1]) & (pos_arr[1:] - pos_arr[:-1] == 1)
+            weights[1:] *= np.where(adjacent, boost[:-1], 1.0)
+
+        raw = np.bincount(doc_arr, weights=weights, minlength=n)
+        positive = np.bincount(doc_arr, weights=(weights > 0).astype(np.float32), minlength=n)
+        negative = np.bincount(doc_arr, weights=(weights < 0).astype(np.float32), minlength=n)
+        score = raw / np.sqrt(raw * raw + NORMALIZATION_ALPHA)
+
+        return {
+            "score": score.astype(np.float32),
+            "positive": positive,
+            "negative": negative,
+            "tokens": lengths,
+        }
+
+
+class SentimentAnalyzer:
+    """Bulk sentiment: local lexicon scores, LLM only for ambiguous items"""
+
+    def __init__(self):
+        self.model = LexiconSentimentModel()
+
+    def ambiguous_mask(self, scored: Dict[str, np.ndarray]) -> np.ndarray:
+        """Mixed-polarity texts near zero, and longer texts the lexicon does not cover"""
+        hits = scored["positive"] + scored["negative"]
+        mixed = (scored["positive"] > 0) & (scored["negative"] > 0)
+        uncertain = np.abs(scored["score"]) < settings.SENTIMENT_AMBIGUOUS_MARGIN
+        uncovered = (hits == 0) & (scored["tokens"] >= settings.SENTIMENT_ESCALATION_MIN_TOKENS)
+        return (mixed & uncertain) | uncovered
+
+    async def analyze(
+        self,
+        texts: Sequence[str],
+        llm=None,
+        escalate: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Score texts; ambiguous ones are re-scored by the LLM in packed prompts when llm is given"""
+        if len(texts) > OFFLOAD_THRESHOLD:
+            # Keep the event loop responsive while a large batch is scored
+            scored = await asyncio.to_thread(self.model.score, texts)
+        else:
+            scored = self.model.score(texts)
+        scores = scored["score"].astype(np.float64)
+        hits = scored["positive"] + scored["negative"]
+        # Confidence grows with polarity strength and lexicon coverage
+        confidence = np.clip(
+            0.5 + 0.3 * np.abs(scores) + 0.2 * np.minimum(hits / np.maximum(scored["tokens"], 1) * 4, 1.0),
+            0.0, 1.0
+        )
+        sources = np.full(len(texts), "lexicon", dtype=object)
+
+        ambiguous = np.flatnonzero(self.ambiguous_mask(scored))
+        if escalate and llm is not None and ambiguous.size:
+            ambiguous = ambiguous[:settings.SENTIMENT_MAX_ESCALATIONS]
+            llm_scores = await self._score_with_llm(llm, [texts[i] for i in ambiguous])
+            for i, llm_score in zip(ambiguous, llm_scores):
+                if llm_score is not None:
+                    scores[i] = llm_score
+                    confidence[i] = 0.85
+                    sources[i] = "llm"
+
+        return [
+            {
+                "sentiment": label_for(scores[i]),
+                "score": round(float(scores[i]), 4),
+                "confidence": round(float(confidence[i]), 3),
+                "source": sources[i],
+            }
+            for i in range(len(texts))
+        ]
+
+    async def _score_with_llm(self, llm, texts: List[str]) -> List[Optional[float]]:
+        size = settings.SENTIMENT_LLM_BATCH_SIZE
+        batches = [texts[start:start + size] for start in range(0, len(texts), size)]
+        semaphore = asyncio.Semaphore(settings.SENTIMENT_LLM_CONCURRENCY)
+
+        async def run(batch: List[str]) -> List[Optional[float]]:
+            async with semaphore:
+                return await self._score_batch(llm, batch)
+
+        results = await asyncio.gather(*[run(batch) for batch in batches])
+        return [score for batch in results for score in batch]
+
+    async def _score_batch(self, llm, texts: List[str]) -> List[Optional[float]]:
+        """Many comments in one prompt, one score per numbered item"""
+        listing = "\n".join(
+            f"{i}. {json.dumps(text[:LLM_ITEM_MAX_CHARS], ensure_ascii=False)}"
+            for i, text in enumerate(texts)
+        )
+        prompt = f"""Rate the sentiment of each YouTube comment from -1 (very negative) to 1 (very positive).
+
+        Comments:
+        {listing}
+
+        Respond with a single JSON object {{"scores": [{{"i": <number>, "score": <float>}}, ...]}}
+        with one entry per comment.
+        """
+        scores: List[Optional[float]] = [None] * len(texts)
+        try:
+            response = await llm.generate_completion(
+                prompt,
+                task_type="sentiment_analysis",
+                json_mode=True,
+                max_tokens=32 + 16 * len(texts)
+            )
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            # The lexicon scores stand
+            logger.warning(f"LLM sentiment batch of {len(texts)} items failed: {e}")
+            return scores
+
+        try:
+            entries = json.loads(response[response.find("{"):response.rfind("}") + 1]).get("scores") or []
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"Unparseable sentiment batch of {len(texts)} items: {e}")
+            return scores
+        for entry in entries:
+            try:
+                index, score = int(entry["i"]), float(entry["score"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= index < len(texts):
+                scores[index] = max(-1.0, min(1.0, score))
+        return scores
+
+
+def aggregate_by_video(video_ids: Sequence[Optional[str]], results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-video comment counts, mean score and label shares"""
+    keys = np.array([video_id or "" for video_id in video_ids], dtype=object)
+    if keys.size == 0:
+        return {}
+    videos, inverse = np.unique(keys, return_inverse=True)
+    scores = np.array([result["score"] for result in results], dtype=np.float64)
+    labels = np.array([result["sentiment"] for result in results], dtype=object)
+
+    counts = np.bincount(inverse, minlength=len(videos))
+    mean = np.bincount(inverse, weights=scores, minlength=len(videos)) / counts
+    shares = {
+        label: np.bincount(inverse, weights=(labels == label).astype(np.float64), minlength=len(videos)) / counts
+        for label in ("positive", "neutral", "negative")
+    }
+
+    return {
+        video: {
+            "comments": int(counts[v]),
+            "mean_score": round(float(mean[v]), 4),
+            **{f"{label}_share": round(float(share[v]), 4) for label, share in shares.items()},
+        }
+        for v, video in enumerate(videos)
+        if video
+    }
+
+
+sentiment_analyzer = SentimentAnalyzer()
@@ -0,0 +1,164 @@
+import asyncio
+import base64
+import json
+import logging
+import os
+import socket
+from typing import Dict, Any, Optional, Sequence
+
+import numpy as np
+
+from ..config import settings
+from ..database import get_redis
+from .vector_cache import vector_cache
+
+logger = logging.getLogger(__name__)
+
+VECTOR_CACHE_CHANNEL = "vector_cache:points"
+CONFIDENCE_HISTORY = 100
+
+
+def worker_id() -> str:
+    # Evaluated per call: with a preloaded app the pid changes after fork
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class SharedAgentMetrics:
+    """Agent metrics aggregated in Redis across worker processes and replicas"""
+
+    def _key(self, agent_key: str) -> str:
+        return f"agent_metrics:{agent_key}"
+
+    async def record(self, agent_key: str, execution_time: float, confidence_score: float):
+        if not settings.SHARED_STATE_ENABLED:
+            return
+        try:
+            redis = await get_redis()
+            key = self._key(agent_key)
+            pipe = redis.pipeline(transaction=True)
+            pipe.hincrby(key, "tasks_completed", 1)
+            pipe.hincrbyfloat(key, "total_execution_time", execution_time)
+            pipe.lpush(f"{key}:confidence", confidence_score)
+            pipe.ltrim(f"{key}:confidence", 0, CONFIDENCE_HISTORY - 1)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record shared metrics for {agent_key}: {e}")
+
+    async def record_usage(self, agent_key: str, usage: Dict[str, int]):
+        """Accumulate LLM token usage, including prompt cache hits"""
+        if not settings.SHARED_STATE_ENABLED:
+            return
+        try:
+            redis = await get_redis()
+            key = f"{self._key(agent_key)}:llm_usage"
+            pipe = redis.pipeline(transaction=True)
+            for field, value in usage.items():
+                if value:
+                    pipe.hincrby(key, field, int(value))
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record LLM usage for {agent_key}: {e}")
+
+    async def load_usage(self, agent_key: str) -> Optional[Dict[str, int]]:
+        if not settings.SHARED_STATE_ENABLED:
+            return None
+        try:
+            redis = await get_redis()
+            usage = await redis.hgetall(f"{self._key(agent_key)}:llm_usage")
+        except Exception as e:
+            logger.warning(f"Failed to load LLM usage for {agent_key}: {e}")
+            return None
+        return {k.decode() if isinstance(k, bytes) else k: int(v) for k, v in usage.items()}
+
+    async def load(self, agent_key: str) -> Optional[Dict[str, Any]]:
+        """Aggregated metrics, or None if shared state is unavailable"""
+        if not settings.SHARED_STATE_ENABLED:
+            return None
+        try:
+            redis = await get_redis()
+            key = self._key(agent_key)
+            pipe = redis.pipeline(transaction=False)
+            pipe.hgetall(key)
+            pipe.lrange(f"{key}:confidence", 0, -1)
+            totals, scores = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to load shared metrics for {agent_key}: {e}")
+            return None
+
+        totals = {k.decode() if isinstance(k, bytes) else k: float(v) for k, v in totals.items()}
+        scores = [float(score) for score in reversed(scores)]
+        tasks_completed = int(totals.get("tasks_completed", 0))
+
+        return {
+            "tasks_completed": tasks_completed,
+            "success_rate": (
+                sum(1 for score in scores if score > 0.7) / len(scores) if scores else 0.0
+            ),
+            "avg_execution_time": (
+                totals.get("total_execution_time", 0.0) / tasks_completed if tasks_completed else 0.0
+            ),
+            "confidence_scores": scores
+        }
+
+
+async def publish_vector_cache_point(
+    collection: str,
+    point_id: str,
+    vector: Sequence[float],
+    payload: Dict[str, Any]
+):
+    """Share a newly stored memory point with the local vector tiers of other workers"""
+    if not (settings.SHARED_STATE_ENABLED and vector_cache.enabled):
+        return
+    try:
+        redis = await get_redis()
+        message = {
+            "origin": worker_id(),
+            "collection": collection,
+            "id": point_id,
+            "vector": base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode(),
+            "payload": payload
+        }
+        await redis.publish(VECTOR_CACHE_CHANNEL, json.dumps(message, default=str))
+    except Exception as e:
+        logger.warning(f"Failed to publish vector cache point: {e}")
+
+
+async def _listen_vector_cache_points():
+    redis = await get_redis()
+    pubsub = redis.pubsub()
+    await pubsub.subscribe(VECTOR_CACHE_CHANNEL)
+    own_id = worker_id()
+    try:
+        async for message in pubsub.listen():
+            if message.get("type") != "message":
+                continue
+            try:
+                data = json.loads(message["data"])
+                if data["origin"] == own_id:
+                    continue
+                vector = np.frombuffer(base64.b64decode(data["vector"]), dtype=np.float32)
+                vector_cache.add(data["collection"], data["id"], vector, data["payload"])
+            except Exception as e:
+                logger.warning(f"Ignoring malformed vector cache message: {e}")
+    finally:
+        await pubsub.unsubscribe(VECTOR_CACHE_CHANNEL)
+        await pubsub.close()
+
+
+async def run_vector_cache_sync():
+    """Apply memory points stored by other workers to this worker's vector tier"""
+    if not (settings.SHARED_STATE_ENABLED and vector_cache.enabled):
+        return
+
+    while True:
+        try:
+            await _listen_vector_cache_points()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Vector cache sync interrupted, reconnecting: {e}")
+            await asyncio.sleep(5)
+
+
+shared_metrics = SharedAgentMetrics()
@@ -0,0 +1,132 @@
+import math
+from typing import Dict, Any, List, NamedTuple, Optional
+
+from ..config import settings
+
+# Output a task type needs when its size does not depend on a duration
+TASK_OUTPUT_TOKENS: Dict[str, int] = {
+    "trend_analysis": 600,
+    "viral_prediction": 400,
+    "hook_generation": 300,
+    "content_optimization": 800,
+    "sentiment_analysis": 300,
+    "competitor_analysis": 1000,
+    "comprehensive_research": 1200,
+    "orchestrate_video_creation": 1000,
+    "strategic_planning": 2000,
+    "video_strategy": 2000,  # strategy step of orchestrate_video_creation
+    "performance_optimization": 1500,
+    "performance_analysis": 1200,
+    "script_outline": 700,
+    "script_stitching": 400,
+}
+
+# Task types whose output is spoken script, sized from the requested duration
+DURATION_TASKS = {"script_generation", "script_segment"}
+
+# Output per item for task types sized from the requested number of items
+ITEM_TOKENS: Dict[str, int] = {
+    "content_ideation": 180,  # one JSON idea; its description holds the hook and talking points
+}
+
+# Appended to free-text prompts and passed as a stop sequence, so the model
+# stops at the end of the answer instead of running on to the token limit
+END_MARKER = "<<END>>"
+END_INSTRUCTION = f"\n\nWhen you are done, write {END_MARKER} on its own line."
+
+# Scene/JSON structure on top of the spoken words
+JSON_OVERHEAD = 1.25
+
+
+class OutputBudget(NamedTuple):
+    """Output token allowance of one completion"""
+    task_type: Optional[str]
+    max_tokens: int
+    expected_tokens: int
+    stop: List[str]
+
+
+class BudgetStats:
+    """Over- and under-generation of one task type against its budget"""
+
+    def __init__(self):
+        self.calls = 0
+        self.output_tokens = 0
+        self.expected_tokens = 0
+        self.max_tokens = 0
+        self.truncated = 0
+        self.over_generated = 0
+        self.under_generated = 0
+
+    def record(self, budget: OutputBudget, output_tokens: int, truncated: bool):
+        self.calls += 1
+        self.output_tokens += output_tokens
+        self.expected_tokens += budget.expected_tokens
+        self.max_tokens += budget.max_tokens
+        if truncated:
+            self.truncated += 1
+        elif output_tokens > budget.expected_tokens * settings.TOKEN_BUDGET_OVER_RATIO:
+            self.over_generated += 1
+        elif output_tokens < budget.expected_tokens * settings.TOKEN_BUDGET_UNDER_RATIO:
+            self.under_generated += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "avg_output_tokens": self.output_tokens / self.calls if self.calls else 0.0,
+            "avg_expected_tokens": self.expected_tokens / self.calls if self.calls else 0.0,
+            "utilization": self.output_tokens / self.max_tokens if self.max_tokens else 0.0,
+            "truncated": self.truncated,
+            "over_generated": self.over_generated,
+            "under_generated": self.under_generated,
+        }
+
+
+def script_tokens(duration_minutes: float, json_mode: bool = False) -> int:
+    """Tokens needed to script duration_minutes of narration"""
+    words = max(duration_minutes, 0.0) * settings.SCRIPT_WORDS_PER_MINUTE
+    tokens = words * settings.TOKENS_PER_WORD
+    if json_mode:
+        tokens *= JSON_OVERHEAD
+    return int(math.ceil(tokens))
+
+
+class TokenBudget:
+    """Derives max_tokens and stop sequences per call and tracks how well they fit"""
+
+    def __init__(self):
+        self.stats: Dict[str, BudgetStats] = {}
+
+    def budget(
+        self,
+        task_type: Optional[str],
+        duration_minutes: Optional[float] = None,
+        json_mode: bool = False,
+        items: Optional[int] = None
+    ) -> OutputBudget:
+        if task_type in DURATION_TASKS and duration_minutes:
+            expected = script_tokens(duration_minutes, json_mode)
+        elif task_type in ITEM_TOKENS and items:
+            expected = ITEM_TOKENS[task_type] * items
+        else:
+            expected = TASK_OUTPUT_TOKENS.get(task_type, settings.DEFAULT_OUTPUT_TOKENS)
+
+        max_tokens = int(math.ceil(expected * settings.TOKEN_BUDGET_HEADROOM)) + settings.TOKEN_BUDGET_SLACK
+        max_tokens = min(max_tokens, settings.MAX_TOKENS)
+
+        # A stop sequence cannot mark the end of a JSON object, which ends on "}"
+        stop = [] if json_mode else [END_MARKER]
+        return OutputBudget(task_type, max_tokens, min(expected, max_tokens), stop)
+
+    def record(self, budget: OutputBudget, output_tokens: int, truncated: bool):
+        key = budget.task_type or "default"
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = BudgetStats()
+        stats.record(budget, output_tokens, truncated)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {task_type: stats.to_dict() for task_type, stats in self.stats.items()}
+
+
+token_budget = TokenBudget()
@@ -0,0 +1,142 @@
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+from ..config import settings
+from .memory import MEMORY_INDEXED_FIELDS
+
+
+class LocalVectorTier:
+    """
+    Most recent/hot points of one collection, held in-process.
+
+    Vectors are stored unit-normalised in a contiguous float32 matrix so a
+    cosine search is a single matrix-vector product. Once the tier is full
+    the least recently written slot is reused; upserting an existing point
+    makes it the most recent again.
+    """
+
+    def __init__(self, capacity: int, dim: int):
+        self.capacity = capacity
+        self.dim = dim
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.ids: List[Optional[str]] = [None] * capacity
+        self.payloads: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self.filter_values = {
+            field: np.full(capacity, None, dtype=object)
+            for field in MEMORY_INDEXED_FIELDS
+        }
+        self.slots: Dict[str, int] = {}
+        # Write sequence number per slot; the lowest is evicted next
+        self.written = np.zeros(capacity, dtype=np.int64)
+        self.clock = 0
+        self.size = 0
+
+    def upsert(self, point_id: str, vector: Sequence[float], payload: Dict[str, Any]):
+        """Insert or refresh a point, evicting the oldest slot when full"""
+        vector = np.asarray(vector, dtype=np.float32)
+        if vector.shape != (self.dim,):
+            return
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return
+
+        slot = self.slots.get(point_id)
+        if slot is None:
+            if self.size < self.capacity:
+                slot = self.size
+                self.size += 1
+            else:
+                slot = int(self.written.argmin())
+                del self.slots[self.ids[slot]]
+            self.slots[point_id] = slot
+
+        self.clock += 1
+        self.written[slot] = self.clock
+        self.vectors[slot] = vector / norm
+        self.ids[slot] = point_id
+        self.payloads[slot] = payload
+        for field, values in self.filter_values.items():
+            values[slot] = payload.get(field)
+
+    def search(
+        self,
+        query_vector: Sequence[float],
+        top_k: int,
+        score_threshold: Optional[float] = None,
+        conditions: Optional[Dict[str, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Vectorized cosine top-k over the cached points"""
+        if self.size == 0 or top_k <= 0:
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if query.shape != (self.dim,) or norm == 0.0:
+            return []
+
+        scores = self.vectors[:self.size] @ (query / norm)
+
+        mask = np.ones(self.size, dtype=bool)
+        for field, value in (conditions or {}).items():
+            mask &= self.filter_values[field][:self.size] == value
+        if score_threshold is not None:
+            mask &= scores >= score_threshold
+
+        candidates = np.flatnonzero(mask)
+        if candidates.size == 0:
+            return []
+
+        k = min(top_k, candidates.size)
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            {**self.payloads[i], "id": self.ids[i], "score": float(scores[i])}
+            for i in top
+        ]
+
+
+class VectorCache:
+    """Per-collection local vector tiers"""
+
+    def __init__(self, capacity: int, enabled: bool = True):
+        self.capacity = capacity
+        self.enabled = enabled
+        self.tiers: Dict[str, LocalVectorTier] = {}
+
+    def add(self, collection: str, point_id: str, vector: Sequence[float], payload: Dict[str, Any]):
+        """Write-through of a stored or fetched point"""
+        if not self.enabled or vector is None:
+            return
+        tier = self.tiers.get(collection)
+        if tier is None:
+            tier = LocalVectorTier(self.capacity, len(vector))
+            self.tiers[collection] = tier
+        tier.upsert(point_id, vector, payload)
+
+    def search(
+        self,
+        collection: str,
+        query_vector: Sequence[float],
+        top_k: int,
+        score_threshold: Optional[float] = None,
+        conditions: Optional[Dict[str, str]] = None
+    ) -> List[Dict[str, Any]]:
+        tier = self.tiers.get(collection) if self.enabled else None
+        if tier is None:
+            return []
+        return tier.search(query_vector, top_k, score_threshold, conditions)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "capacity": self.capacity,
+            "collections": {name: tier.size for name, tier in self.tiers.items()}
+        }
+
+
+vector_cache = VectorCache(
+    capacity=settings.VECTOR_CACHE_SIZE,
+    enabled=settings.VECTOR_CACHE_ENABLED
+)
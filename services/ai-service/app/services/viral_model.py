@@ -0,0 +1,305 @@
+import argparse
+import asyncio
+import bisect
+import logging
+import os
+import re
+import time
+import zlib
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+from ..config import settings
+from ..database import async_session_maker
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+DIGIT_RE = re.compile(r"\d")
+UPPER_RE = re.compile(r"[A-Z]")
+
+# One row per video with its views at VIRAL_MODEL_HORIZON_DAYS after publishing
+TRAINING_QUERY = text("""
+    SELECT v.id, v.channel_id, v.title, v.description, v.metadata,
+           (v.script ->> 'total_duration')::float AS duration_seconds,
+           c.niche,
+           MAX(d.views) FILTER (
+               WHERE d.bucket_start <= COALESCE(v.published_at, v.created_at) + make_interval(days => :horizon)
+           ) AS views
+    FROM videos v
+    JOIN channels c ON c.id = v.channel_id
+    JOIN youtube_analytics_daily d ON d.video_id = v.id
+    WHERE v.title IS NOT NULL
+      AND COALESCE(v.published_at, v.created_at) <= NOW() - make_interval(days => :horizon)
+    GROUP BY v.id, c.niche
+""")
+
+
+def _bucket(value: float, edges: Sequence[float]) -> int:
+    return bisect.bisect_right(edges, value)
+
+
+def idea_features(idea: Dict[str, Any], niche: Optional[str] = None) -> List[str]:
+    """
+    Categorical features of one idea (or published video) as strings.
+
+    Title words and bigrams, description words, keywords, niche and content
+    type, plus bucketed title length, duration and a few title patterns.
+    """
+    title = str(idea.get("title") or "")
+    words = TOKEN_RE.findall(title.lower())
+    niche = (idea.get("niche") or niche or "general").strip().lower()
+
+    features = [f"niche={niche}", f"title_len={_bucket(len(words), (4, 7, 10, 14))}"]
+    features += [f"w={word}" for word in words]
+    features += [f"b={a}_{b}" for a, b in zip(words, words[1:])]
+    features += [f"nw={niche}:{word}" for word in words]
+    features += [f"d={word}" for word in set(TOKEN_RE.findall(str(idea.get("description") or "").lower()[:500]))]
+
+    keywords = idea.get("target_keywords") or idea.get("keywords") or idea.get("tags") or []
+    if isinstance(keywords, str):
+        keywords = keywords.split(",")
+    features += [f"k={str(keyword).strip().lower()}" for keyword in keywords if str(keyword).strip()]
+
+    if idea.get("content_type"):
+        features.append(f"type={str(idea['content_type']).strip().lower()}")
+    duration = idea.get("estimated_duration")
+    if isinstance(duration, (int, float)) and duration > 0:
+        features.append(f"minutes={_bucket(float(duration), (1, 5, 10, 20, 40))}")
+    if DIGIT_RE.search(title):
+        features.append("has_number")
+    if "?" in title:
+        features.append("question")
+    if title and len(UPPER_RE.findall(title)) > len(title) / 3:
+        features.append("shouting")
+    return features
+
+
+@lru_cache(maxsize=200000)
+def _hashed(feature: str, bits: int) -> int:
+    # crc32 is stable across processes, unlike hash()
+    return zlib.crc32(feature.encode("utf-8")) & ((1 << bits) - 1)
+
+
+def encode(feature_lists: Sequence[List[str]], bits: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Hash feature lists into sparse (row, column) index arrays of a binary matrix"""
+    rows: List[int] = []
+    cols: List[int] = []
+    for r, features in enumerate(feature_lists):
+        hashed = {_hashed(feature, bits) for feature in features}
+        rows.extend([r] * len(hashed))
+        cols.extend(hashed)
+    return np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30.0, 30.0)))
+
+
+class ViralModel:
+    """
+    Logistic regression over hashed idea features.
+
+    The artifact is a compressed .npz with the weight vector, bias and
+    training metadata; unseen hash buckets keep a zero weight, so it stays
+    small after compression.
+    """
+
+    def __init__(self, weights: np.ndarray, bias: float, meta: Optional[Dict[str, Any]] = None):
+        self.weights = weights.astype(np.float32)
+        self.bias = float(bias)
+        self.bits = int(np.log2(len(weights)))
+        self.meta = meta or {}
+
+    @property
+    def version(self) -> str:
+        return str(self.meta.get("trained_at", "untrained"))
+
+    @property
+    def holdout_auc(self) -> Optional[float]:
+        value = float(self.meta.get("holdout_auc", np.nan))
+        return round(value, 2) if np.isfinite(value) else None
+
+    def score(self, ideas: Sequence[Dict[str, Any]], niche: Optional[str] = None) -> np.ndarray:
+        """Probability of each idea being a top performer, in one batched pass"""
+        if not ideas:
+            return np.zeros(0)
+        rows, cols = encode([idea_features(idea, niche) for idea in ideas], self.bits)
+        logits = self.bias + np.bincount(rows, weights=self.weights[cols], minlength=len(ideas))
+        return _sigmoid(logits)
+
+    def explain(self, idea: Dict[str, Any], niche: Optional[str] = None, k: int = 3) -> List[str]:
+        """Features that pushed an idea's score up the most"""
+        contributions = {
+            feature: float(self.weights[_hashed(feature, self.bits)])
+            for feature in idea_features(idea, niche)
+        }
+        ranked = sorted(contributions.items(), key=lambda item: -item[1])
+        return [feature for feature, weight in ranked[:k] if weight > 0]
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(
+            path,
+            weights=self.weights,
+            bias=np.float64(self.bias),
+            **{f"meta_{key}": np.asarray(value) for key, value in self.meta.items()}
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "ViralModel":
+        with np.load(path) as data:
+            meta = {key[5:]: data[key].item() for key in data.files if key.startswith("meta_")}
+            return cls(data["weights"], float(data["bias"]), meta)
+
+
+def train(
+    feature_lists: Sequence[List[str]],
+    labels: np.ndarray,
+    bits: Optional[int] = None,
+    epochs: Optional[int] = None,
+    learning_rate: float = 0.5,
+    l2: Optional[float] = None
+) -> ViralModel:
+    """Full-batch AdaGrad logistic regression on the hashed binary features"""
+    bits = bits or settings.VIRAL_MODEL_HASH_BITS
+    epochs = epochs or settings.VIRAL_MODEL_EPOCHS
+    l2 = settings.VIRAL_MODEL_L2 if l2 is None else l2
+    labels = np.asarray(labels, dtype=np.float64)
+    n, dim = len(labels), 1 << bits
+
+    rows, cols = encode(feature_lists, bits)
+    weights = np.zeros(dim)
+    bias = float(np.log((labels.mean() + 1e-6) / (1 - labels.mean() + 1e-6)))
+    grad_sq = np.zeros(dim)
+    bias_grad_sq = 0.0
+
+    for _ in range(epochs):
+        logits = bias + np.bincount(rows, weights=weights[cols], minlength=n)
+        error = _sigmoid(logits) - labels
+        grad = np.bincount(cols, weights=error[rows], minlength=dim) / n + l2 * weights
+        grad_sq += grad ** 2
+        weights -= learning_rate * grad / (np.sqrt(grad_sq) + 1e-8)
+        bias_grad = float(error.mean())
+        bias_grad_sq += bias_grad ** 2
+        bias -= learning_rate * bias_grad / (np.sqrt(bias_grad_sq) + 1e-8)
+
+    return ViralModel(weights, bias)
+
+
+def auc(labels: np.ndarray, scores: np.ndarray) -> Optional[float]:
+    """ROC AUC via the rank-sum formulation"""
+    labels = np.asarray(labels, dtype=bool)
+    positives, negatives = labels.sum(), (~labels).sum()
+    if not positives or not negatives:
+        return None
+    ranks = np.empty(len(scores))
+    ranks[np.argsort(scores, kind="stable")] = np.arange(1, len(scores) + 1)
+    return float((ranks[labels].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+
+
+def label_top_performers(channel_ids: Sequence[str], views: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Label videos in the top VIRAL_MODEL_POSITIVE_QUANTILE of their own channel.
+
+    Relative labels keep large channels from dominating; channels with fewer
+    than VIRAL_MODEL_MIN_CHANNEL_VIDEOS videos are left out (mask False).
+    """
+    channel_keys, channel_index = np.unique(np.asarray(channel_ids, dtype=object), return_inverse=True)
+    counts = np.bincount(channel_index, minlength=len(channel_keys))
+    thresholds = np.full(len(channel_keys), np.inf)
+    for c in np.flatnonzero(counts >= settings.VIRAL_MODEL_MIN_CHANNEL_VIDEOS):
+        thresholds[c] = np.quantile(views[channel_index == c], settings.VIRAL_MODEL_POSITIVE_QUANTILE)
+    mask = counts[channel_index] >= settings.VIRAL_MODEL_MIN_CHANNEL_VIDEOS
+    return views > thresholds[channel_index], mask
+
+
+def _training_example(row: Any) -> Dict[str, Any]:
+    metadata = row.metadata if isinstance(row.metadata, dict) else {}
+    return {
+        "title": row.title,
+        "description": row.description,
+        "niche": row.niche,
+        "keywords": metadata.get("keywords") or metadata.get("tags") or [],
+        "content_type": metadata.get("content_type"),
+        "estimated_duration": row.duration_seconds / 60 if row.duration_seconds else None,
+    }
+
+
+async def load_training_rows() -> List[Any]:
+    async with async_session_maker() as session:
+        result = await session.execute(TRAINING_QUERY, {"horizon": settings.VIRAL_MODEL_HORIZON_DAYS})
+        return [row for row in result.all() if row.views is not None]
+
+
+async def train_from_database(output: str) -> Dict[str, Any]:
+    """Train on published videos and their youtube_analytics history, then save the artifact"""
+    rows = await load_training_rows()
+    labels, mask = label_top_performers(
+        [str(row.channel_id) for row in rows],
+        np.array([float(row.views) for row in rows])
+    )
+    rows = [row for row, keep in zip(rows, mask) if keep]
+    labels = labels[mask]
+    if len(rows) < 2 * settings.VIRAL_MODEL_MIN_CHANNEL_VIDEOS:
+        raise ValueError(f"Not enough analytics history to train: {len(rows)} videos")
+
+    feature_lists = [idea_features(_training_example(row)) for row in rows]
+    # Deterministic holdout by video id
+    holdout = np.array([zlib.crc32(str(row.id).encode("utf-8")) % 5 == 0 for row in rows])
+
+    model = train([f for f, h in zip(feature_lists, holdout) if not h], labels[~holdout])
+    holdout_auc = (
+        auc(labels[holdout], model.score([_training_example(row) for row, h in zip(rows, holdout) if h]))
+        if holdout.any() else None
+    )
+
+    # Final model uses every example
+    model = train(feature_lists, labels)
+    model.meta = {
+        "trained_at": int(time.time()),
+        "examples": len(rows),
+        "positive_rate": float(labels.mean()),
+        "holdout_auc": holdout_auc if holdout_auc is not None else float("nan"),
+    }
+    model.save(output)
+    logger.info(f"Viral model trained on {len(rows)} videos (holdout AUC {holdout_auc}), saved to {output}")
+    return model.meta
+
+
+_model: Optional[ViralModel] = None
+_model_mtime: Optional[float] = None
+
+
+def get_viral_model() -> Optional[ViralModel]:
+    """The trained artifact, reloaded when the file changes; None if not trained yet"""
+    global _model, _model_mtime
+    path = settings.VIRAL_MODEL_PATH
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        if _model_mtime != -1.0:
+            logger.warning(f"Viral model artifact not found at {path}")
+        _model, _model_mtime = None, -1.0
+        return None
+    if mtime != _model_mtime:
+        try:
+            _model = ViralModel.load(path)
+            logger.info(f"Loaded viral model {_model.version} from {path}")
+        except Exception as e:
+            logger.error(f"Failed to load viral model from {path}: {e}")
+            _model = None
+        _model_mtime = mtime
+    return _model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the viral-potential scoring model")
+    parser.add_argument("--output", default=settings.VIRAL_MODEL_PATH)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(train_from_database(args.output)))
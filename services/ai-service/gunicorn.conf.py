@@ -0,0 +1,17 @@
+# Multi-worker deployment: preforked uvicorn workers sharing one preloaded app.
+# Started by main.py when WORKERS > 1, or directly with
+#   gunicorn -c gunicorn.conf.py main:app
+from app.config import settings
+
+bind = "0.0.0.0:8000"
+workers = max(settings.WORKERS, 1)
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import the app once in the master so workers fork with modules already
+# loaded. Connections and SDK clients are created lazily, after the fork.
+preload_app = True
+
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+loglevel = settings.LOG_LEVEL.lower()
@@ -1,14 +1,20 @@
 import asyncio
 import logging
+import os
 from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.config import settings
-from app.database import init_db
+from app.database import dependency_status, is_ready, run_init_db
 from app.messaging import MessageProcessor
 from app.api import router
+from app.services.analytics_store import run_partition_maintenance
+from app.services.prewarm import run_prewarm_scheduler
+from app.services.saturation import collect_saturation, prometheus_text, run_saturation_publisher
+from app.services.shared_state import run_vector_cache_sync
 
 # Configure logging
 logging.basicConfig(
@@ -24,22 +30,36 @@ async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     logger.info("Starting ASSOS AI Service")
     
-    # Initialize database
-    await init_db()
+    # Initialize dependencies in the background, retrying failed ones; /ready reports when done
+    init_task = asyncio.create_task(run_init_db())
     
     # Start message processor
     message_processor = MessageProcessor()
     task = asyncio.create_task(message_processor.start())
     
+    # Keep this worker's local vector tier in sync with the others
+    sync_task = asyncio.create_task(run_vector_cache_sync())
+    
+    # Precompute niche and channel results during off-peak hours
+    prewarm_task = asyncio.create_task(run_prewarm_scheduler())
+    
+    # Create youtube_analytics partitions ahead of incoming snapshots
+    partition_task = asyncio.create_task(run_partition_maintenance())
+    
+    # Share this worker's saturation with the other workers of the host
+    saturation_task = asyncio.create_task(run_saturation_publisher())
+    
     yield
     
     # Cleanup
     logger.info("Shutting down ASSOS AI Service")
-    task.cancel()
-    try:
-        await task
-    except asyncio.CancelledError:
-        pass
+    await message_processor.stop()
+    for background_task in (init_task, task, sync_task, prewarm_task, partition_task, saturation_task):
+        background_task.cancel()
+        try:
+            await background_task
+        except (asyncio.CancelledError, Exception):
+            pass
 
 
 # Create FastAPI app
@@ -64,7 +84,39 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 200 once Postgres, Redis and Qdrant are initialized"""
+    ready = is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "dependencies": dependency_status
+        }
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Saturation gauges in Prometheus text format: queue depth, in-flight work, LLM slots"""
+    return PlainTextResponse(
+        prometheus_text(await collect_saturation()),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/saturation")
+async def saturation_summary():
+    """The same saturation signals as /metrics, as compact JSON for the autoscaler"""
+    return await collect_saturation()
+
+
 if __name__ == "__main__":
+    if settings.WORKERS > 1:
+        # Preforked workers with the app preloaded, see gunicorn.conf.py
+        os.execvp("gunicorn", ["gunicorn", "-c", "gunicorn.conf.py", "main:app"])
+    
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
@@ -0,0 +1,131 @@
+import pytest
+
+
+def _bytes(value):
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode("utf-8")
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeRedis:
+    """In-memory subset of redis.asyncio used by the services (bytes in, bytes out)"""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = _bytes(value)
+        return True
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = _bytes(value)
+        return True
+
+    async def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    async def expire(self, key, ttl):
+        return key in self.data
+
+    async def incr(self, key):
+        self.data[key] = _bytes(int(self.data.get(key, b"0")) + 1)
+        return int(self.data[key])
+
+    async def hset(self, key, field=None, value=None, mapping=None):
+        fields = dict(mapping or {})
+        if field is not None:
+            fields[field] = value
+        self.data.setdefault(key, {}).update({_bytes(k): _bytes(v) for k, v in fields.items()})
+        return len(fields)
+
+    async def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    async def hmget(self, key, fields):
+        values = self.data.get(key, {})
+        return [values.get(_bytes(field)) for field in fields]
+
+    async def hdel(self, key, *fields):
+        values = self.data.get(key, {})
+        return sum(values.pop(_bytes(field), None) is not None for field in fields)
+
+    # Sorted sets are kept as {member: score}
+    async def zadd(self, key, mapping):
+        scores = self.data.setdefault(key, {})
+        added = sum(_bytes(member) not in scores for member in mapping)
+        scores.update({_bytes(member): score for member, score in mapping.items()})
+        return added
+
+    async def zcard(self, key):
+        return len(self.data.get(key, {}))
+
+    def _ranked(self, key):
+        return sorted(self.data.get(key, {}).items(), key=lambda item: (item[1], item[0]))
+
+    async def zrange(self, key, start, end):
+        members = [member for member, _ in self._ranked(key)]
+        return members[start:end + 1 if end != -1 else None]
+
+    async def zrevrange(self, key, start, end):
+        members = [member for member, _ in self._ranked(key)][::-1]
+        return members[start:end + 1 if end != -1 else None]
+
+    async def zremrangebyscore(self, key, low, high):
+        low, high = float(low), float(high)
+        scores = self.data.get(key, {})
+        removed = [member for member, score in scores.items() if low <= score <= high]
+        for member in removed:
+            del scores[member]
+        return len(removed)
+
+    async def zrem(self, key, *members):
+        scores = self.data.get(key, {})
+        return sum(scores.pop(_bytes(member), None) is not None for member in members)
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Patch get_redis in the given modules with one shared in-memory Redis"""
+    redis = FakeRedis()
+
+    async def get_redis():
+        return redis
+
+    def install(*modules):
+        for module in modules:
+            monkeypatch.setattr(module, "get_redis", get_redis)
+        return redis
+
+    return install
@@ -0,0 +1,92 @@
+import pytest
+from pydantic import ValidationError
+
+from app.models import ABExperiment
+from app.services.ab_testing import (
+    CONTINUE,
+    EQUIVALENT,
+    INSUFFICIENT_DATA,
+    WINNER,
+    analyze_experiments,
+)
+
+
+def experiment(experiment_id, *variants):
+    return {
+        "experiment_id": experiment_id,
+        "variants": [
+            {"name": name, "impressions": impressions, "clicks": clicks}
+            for name, impressions, clicks in variants
+        ],
+    }
+
+
+def by_id(results):
+    return {result["experiment_id"]: result for result in results}
+
+
+def test_decisions_follow_loss_threshold_and_minimum_impressions():
+    results = by_id(analyze_experiments([
+        # 4% vs 8% CTR on plenty of traffic
+        experiment("clear", ("control", 20_000, 800), ("b", 20_000, 1_600)),
+        # Identical CTRs, enough traffic to rule out a loss above 0.1 pp
+        experiment("same", ("control", 200_000, 10_000), ("b", 200_000, 10_000)),
+        # A 0.5 pp gap on little traffic is not settled either way
+        experiment("open", ("control", 1_500, 75), ("b", 1_500, 82)),
+        # One variant has not reached AB_TEST_MIN_IMPRESSIONS
+        experiment("early", ("control", 50_000, 2_000), ("b", 999, 200)),
+    ], seed=1))
+
+    assert results["clear"]["decision"] == WINNER
+    assert results["clear"]["winner"] == "b"
+    assert results["clear"]["leader_prob_best"] > 0.99
+    assert results["same"]["decision"] == EQUIVALENT
+    assert results["same"]["winner"] is None
+    assert results["open"]["decision"] == CONTINUE
+    assert results["open"]["winner"] is None
+    assert results["early"]["decision"] == INSUFFICIENT_DATA
+    assert results["early"]["winner"] is None
+
+
+def test_zero_traffic_variant_keeps_the_experiment_undecided():
+    [result] = analyze_experiments([
+        experiment("new", ("control", 10_000, 500), ("b", 0, 0), ("c", 0, 0)),
+    ], seed=1)
+
+    assert result["decision"] == INSUFFICIENT_DATA
+    fresh = result["variants"][1]
+    assert fresh["ctr"] is None
+    # Uniform prior without data
+    assert fresh["posterior_mean"] == 0.5
+    assert abs(sum(variant["prob_best"] for variant in result["variants"]) - 1.0) < 1e-6
+
+
+def test_single_variant_experiments_are_never_decided():
+    [result] = analyze_experiments([experiment("alone", ("control", 500_000, 25_000))], seed=1)
+
+    assert result["decision"] == INSUFFICIENT_DATA
+    assert result["winner"] is None
+    with pytest.raises(ValidationError):
+        ABExperiment(variants=[{"name": "control", "impressions": 500_000, "clicks": 25_000}])
+
+
+def test_padding_variants_never_win_and_bad_counts_are_clamped():
+    results = by_id(analyze_experiments([
+        experiment("two", ("control", 5_000, 250), ("b", 5_000, 260)),
+        experiment("three", ("control", 5_000, 250), ("b", 5_000, 260), ("c", 5_000, 300)),
+        experiment("broken", ("control", 100, 150), ("b", -5, 3)),
+        {"experiment_id": "empty", "variants": []},
+    ], seed=1))
+
+    assert "empty" not in results
+    assert len(results["two"]["variants"]) == 2
+    assert abs(sum(variant["prob_best"] for variant in results["two"]["variants"]) - 1.0) < 1e-6
+    control, broken = results["broken"]["variants"]
+    assert (control["clicks"], control["ctr"]) == (100, 1.0)
+    assert (broken["impressions"], broken["clicks"]) == (0, 0)
+
+
+def test_same_seed_same_result():
+    experiments = [experiment("x", ("control", 3_000, 120), ("b", 3_000, 135))]
+
+    assert analyze_experiments(experiments, seed=3) == analyze_experiments(experiments, seed=3)
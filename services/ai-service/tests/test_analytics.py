@@ -0,0 +1,134 @@
+import random
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import numpy as np
+
+from app.services.analytics import DAY, AnalyticsFrame, analyze_frame, format_findings, robust_z
+
+NOW = datetime(2026, 10, 1, tzinfo=timezone.utc).timestamp()
+
+
+def snapshots(video_id, daily_views, ctr=0.05, title=None, **extra):
+    """One cumulative snapshot per day, the last one at NOW"""
+    total = 0
+    rows = []
+    for age, views in zip(range(len(daily_views) - 1, -1, -1), daily_views):
+        total += views
+        rows.append({
+            "video_id": video_id, "title": title, "collected_at": NOW - age * DAY,
+            "views": total, "likes": total // 20, "comments": total // 100, "shares": 0,
+            "ctr": ctr, **extra,
+        })
+    return rows
+
+
+def reference_recent_views(rows, start, end):
+    """View growth of snapshots collected in [start, end), one video at a time"""
+    by_video = {}
+    for row in sorted(rows, key=lambda r: (r["video_id"], r["collected_at"])):
+        by_video.setdefault(row["video_id"], []).append(row)
+    totals = {}
+    for video_id, video_rows in by_video.items():
+        totals[video_id] = sum(
+            max(current["views"] - previous["views"], 0)
+            for previous, current in zip(video_rows, video_rows[1:])
+            if start <= current["collected_at"] < end
+        )
+    return totals
+
+
+def test_from_records_sorts_by_video_and_time_and_parses_inputs():
+    frame = AnalyticsFrame.from_records([
+        {"video_id": "b", "collected_at": "2026-09-02T00:00:00Z", "views": "20"},
+        {"video_id": "a", "collected_at": datetime(2026, 9, 3, tzinfo=timezone.utc), "views": 5, "title": "A"},
+        {"video_id": "b", "collected_at": NOW, "views": None, "ctr": "n/a"},
+        {"video_id": "a", "collected_at": 0, "views": 1},
+    ])
+
+    assert list(frame.video_ids) == ["a", "b"]
+    assert list(frame.titles) == ["A", ""]
+    assert frame.video_index.tolist() == [0, 0, 1, 1]
+    assert frame.columns["views"][:3].tolist() == [1.0, 5.0, 20.0]
+    assert np.isnan(frame.columns["views"][3]) and np.isnan(frame.columns["ctr"][3])
+
+
+def test_decimal_epochs_from_postgres_keep_their_collection_time():
+    # asyncpg decodes EXTRACT(EPOCH FROM ...) as Decimal
+    rows = [
+        {**row, "collected_at": Decimal(str(row["collected_at"])) + Decimal("0.123456")}
+        for row in snapshots("v1", [100, 50, 25])
+    ]
+
+    frame = AnalyticsFrame.from_records(rows)
+    result = analyze_frame(frame, now=NOW + 1)
+
+    assert frame.collected_at.tolist() == [float(row["collected_at"]) for row in rows]
+    assert result["channel"]["recent_views"] == 75
+
+
+def test_recent_views_and_growth_match_a_per_video_loop():
+    rng = random.Random(5)
+    rows = []
+    for n in range(6):
+        rows += snapshots(f"v{n}", [rng.randint(0, 500) for _ in range(25)])
+    rng.shuffle(rows)
+
+    result = analyze_frame(AnalyticsFrame.from_records(rows), now=NOW)
+
+    recent = reference_recent_views(rows, NOW - 7 * DAY, NOW + 1)
+    prior = reference_recent_views(rows, NOW - 14 * DAY, NOW - 7 * DAY)
+    channel = result["channel"]
+    assert channel["videos"] == 6 and channel["snapshots"] == 150
+    assert channel["recent_views"] == sum(recent.values())
+    expected_growth = (sum(recent.values()) - sum(prior.values())) / sum(prior.values())
+    assert abs(channel["growth_rate"] - expected_growth) < 1e-4
+    for video in result["top_videos"]:
+        assert video["recent_views"] == recent[video["video_id"]]
+    ranked = [video["recent_views"] for video in result["top_videos"]]
+    assert ranked == sorted(ranked, reverse=True)
+
+
+def test_channel_rates_are_weighted_by_views_and_missing_values_skipped():
+    rows = (
+        snapshots("big", [900, 100], ctr=0.02, estimated_revenue=10)
+        + snapshots("small", [50, 50], ctr=0.10, estimated_revenue=1)
+        + snapshots("unknown", [30, 70], ctr=None)
+    )
+
+    channel = analyze_frame(AnalyticsFrame.from_records(rows), now=NOW)["channel"]
+
+    assert channel["total_views"] == 1200
+    assert channel["ctr"] == round((0.02 * 1000 + 0.10 * 100) / 1100, 4)
+    assert channel["rpm"] == round(11 / 1200 * 1000, 2)
+    assert channel["estimated_revenue"] == 11.0
+
+
+def test_outliers_are_flagged_by_robust_z_score():
+    rows = []
+    for n in range(12):
+        rows += snapshots(f"v{n}", [1000 + 10 * n, 100], ctr=0.05 + 0.001 * n)
+    rows += snapshots("viral", [250_000, 50_000], ctr=0.051, title="Viral one")
+
+    outliers = analyze_frame(AnalyticsFrame.from_records(rows), now=NOW)["outliers"]
+
+    views = [o for o in outliers if o["metric"] == "views"]
+    assert [(o["video_id"], o["title"], o["direction"]) for o in views] == [("viral", "Viral one", "over")]
+    assert not [o for o in outliers if o["metric"] == "ctr"]
+
+
+def test_robust_z_without_spread_flags_nothing():
+    assert np.isnan(robust_z(np.array([3.0, 3.0, 3.0, np.nan]))).all()
+    assert np.isnan(robust_z(np.array([np.nan, np.nan]))).all()
+
+
+def test_empty_frame_and_findings_text():
+    empty = analyze_frame(AnalyticsFrame.from_records([]))
+
+    assert empty == {"videos": 0, "snapshots": 0}
+    assert format_findings(empty) == "No analytics data available."
+
+    findings = analyze_frame(AnalyticsFrame.from_records(snapshots("v1", [10, 20], title="First")), now=NOW)
+    text = format_findings(findings)
+    assert text.startswith("Channel: videos=1, snapshots=2, total_views=30")
+    assert "- First: views=30, recent_views=20" in text
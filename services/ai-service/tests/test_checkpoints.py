@@ -0,0 +1,159 @@
+import asyncio
+from typing import Any, Dict
+
+from app.agents.base_agent import BaseAgent
+from app.agents.manus_agent import ManusAgent
+from app.models import AgentResponse
+from app.services import checkpoints
+from app.services.checkpoints import input_fingerprint, open_checkpoint
+from app.services.result_cache import Uncacheable
+
+
+def counting_step(calls, name, value):
+    async def compute():
+        calls.append(name)
+        return value
+    return compute
+
+
+def test_fingerprint_ignores_key_order_and_volatile_fields():
+    first = {"niche": "tech", "channel_config": {"a": 1, "b": 2}, "task_id": "t1", "context": ["x"]}
+    retried = {"channel_config": {"b": 2, "a": 1}, "niche": "tech", "task_id": "t2"}
+
+    assert input_fingerprint(first) == input_fingerprint(retried)
+    assert input_fingerprint(first) != input_fingerprint({**first, "niche": "gaming"})
+
+
+def test_retry_resumes_after_the_completed_steps(fake_redis):
+    fake_redis(checkpoints)
+    input_data = {"niche": "tech", "task_id": "video_1"}
+    calls = []
+
+    async def run(fail_at=None):
+        checkpoint = await open_checkpoint("orchestrate_video_creation", "video_1", input_data)
+        research = await checkpoint.step("research", counting_step(calls, "research", "findings"))
+        if fail_at == "strategy":
+            raise RuntimeError("worker crashed")
+        strategy = await checkpoint.step("strategy", counting_step(calls, "strategy", {"plan": [1, 2]}))
+        return checkpoint, research, strategy
+
+    try:
+        asyncio.run(run(fail_at="strategy"))
+    except RuntimeError:
+        pass
+
+    checkpoint, research, strategy = asyncio.run(run())
+
+    assert calls == ["research", "strategy"]
+    assert checkpoint.resumed == ["research"]
+    assert research == "findings"
+    assert strategy == {"plan": [1, 2]}
+
+
+def test_checkpoint_of_a_different_input_is_replaced(fake_redis):
+    redis = fake_redis(checkpoints)
+    calls = []
+
+    async def run(niche):
+        checkpoint = await open_checkpoint("orchestrate_video_creation", "video_1", {"niche": niche})
+        await checkpoint.step("research", counting_step(calls, niche, niche))
+        return checkpoint
+
+    asyncio.run(run("tech"))
+    changed = asyncio.run(run("gaming"))
+
+    assert calls == ["tech", "gaming"]
+    assert changed.resumed == []
+    stored = redis.data["checkpoint:orchestrate_video_creation:video_1"]
+    assert stored[b"research"] == b'"gaming"'
+
+
+def test_without_task_id_every_step_runs(fake_redis):
+    redis = fake_redis(checkpoints)
+    calls = []
+
+    async def run():
+        checkpoint = await open_checkpoint("orchestrate_video_creation", None, {"niche": "tech"})
+        return await checkpoint.step("research", counting_step(calls, "research", "findings"))
+
+    asyncio.run(run())
+    asyncio.run(run())
+
+    assert calls == ["research", "research"]
+    assert redis.data == {}
+
+
+def test_degraded_steps_are_not_checkpointed(fake_redis):
+    redis = fake_redis(checkpoints)
+    calls = []
+
+    async def run():
+        checkpoint = await open_checkpoint("orchestrate_video_creation", "video_1", {"niche": "tech"})
+        await checkpoint.step("research", counting_step(calls, "research", "findings"))
+        strategy = await checkpoint.step("strategy", counting_step(calls, "strategy", Uncacheable("raw text")))
+        return checkpoint, strategy
+
+    asyncio.run(run())
+    checkpoint, strategy = asyncio.run(run())
+
+    assert calls == ["research", "strategy", "strategy"]
+    assert checkpoint.resumed == ["research"]
+    assert strategy == "raw text"
+    assert b"strategy" not in redis.data["checkpoint:orchestrate_video_creation:video_1"]
+
+
+def test_completed_orchestration_is_not_replayed(fake_redis):
+    redis = fake_redis(checkpoints)
+    agent = ManusAgent()
+    calls = []
+
+    async def generate(task_type, prompt, **kwargs):
+        calls.append(kwargs.get("system_task_type", "research"))
+        return '{"plan": %d}' % len(calls) if kwargs.get("json_mode") else f"findings {len(calls)}"
+
+    async def execution_plan(strategy, input_data):
+        return {"strategy": strategy}
+
+    agent._generate = generate
+    agent._create_execution_plan = execution_plan
+    # The NATS handler reuses one task_id per video
+    input_data = {"video_id": "1", "task_id": "video_1", "channel_config": {"niche": "tech"}}
+
+    first = asyncio.run(agent.execute_task("orchestrate_video_creation", dict(input_data)))
+    second = asyncio.run(agent.execute_task("orchestrate_video_creation", dict(input_data)))
+
+    assert calls == ["research", "video_strategy", "research", "video_strategy"]
+    assert first.result["content_strategy"] == {"plan": 2}
+    assert second.result["content_strategy"] == {"plan": 4}
+    assert second.result["resumed_steps"] == []
+    assert redis.data == {}
+
+
+class RecordingAgent(BaseAgent):
+    def __init__(self):
+        super().__init__("recording", "Recording", "recording")
+        self.seen: Dict[str, Any] = {}
+
+    async def execute_task(self, task_type: str, input_data: Dict[str, Any]) -> AgentResponse:
+        self.seen = input_data
+        return AgentResponse(agent_id=self.agent_id, task_id=input_data["task_id"], status="completed")
+
+    async def get_capabilities(self) -> Dict[str, Any]:
+        return {}
+
+    async def _update_metrics(self, execution_time: float, confidence_score: float):
+        pass
+
+    async def _store_results(self, *args, **kwargs):
+        pass
+
+
+def test_process_task_passes_task_id_without_mutating_the_callers_input():
+    agent = RecordingAgent()
+    input_data = {"niche": "tech"}
+
+    response = asyncio.run(agent.process_task("task-1", "unknown", input_data))
+
+    assert response.status == "completed"
+    assert agent.seen["task_id"] == "task-1"
+    assert input_data == {"niche": "tech"}
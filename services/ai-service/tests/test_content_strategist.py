@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+import pytest
+
+from app.agents import content_strategist
+from app.agents.content_strategist import ContentStrategistAgent
+from app.config import settings
+
+SCENES = [
+    {"duration": 20, "content": "Opening"},
+    {"duration": 40, "content": "Main point"},
+]
+SCRIPT = {
+    "title": "Ten tips", "description": "Tips", "scenes": SCENES, "total_duration": 60,
+    "keywords": [], "tags": [], "hooks": [], "call_to_actions": [],
+}
+
+
+@pytest.fixture
+def events(monkeypatch):
+    published = []
+
+    async def publish_event(subject, data):
+        published.append((subject, data))
+
+    monkeypatch.setattr(content_strategist, "publish_event", publish_event)
+    monkeypatch.setattr(settings, "DEDUP_ENABLED", False)
+    return published
+
+
+def streaming_agent(text, fail=False):
+    agent = ContentStrategistAgent()
+
+    async def stream(task_type, prompt, **kwargs):
+        for i in range(0, len(text), 7):
+            yield text[i:i + 7]
+        if fail:
+            raise RuntimeError("provider error")
+
+    agent._stream = stream
+    return agent
+
+
+def statuses(events):
+    return [data for subject, data in events if subject == settings.SCRIPT_EVENTS_SUBJECT]
+
+
+def scenes(events):
+    return [data for subject, data in events if subject == settings.SCENE_EVENTS_SUBJECT]
+
+
+def test_completed_script_ends_with_a_completed_status(events):
+    agent = streaming_agent(json.dumps(SCRIPT))
+
+    response = asyncio.run(agent.execute_task("script_generation", {"task_id": "t1", "target_duration": 1}))
+
+    assert response.result["script"]["title"] == "Ten tips"
+    assert [event["scene_index"] for event in scenes(events)] == [0, 1]
+    assert statuses(events) == [
+        {"task_id": "t1", "video_id": None, "status": "completed", "scene_count": 2, "reason": None}
+    ]
+    assert events[-1][0] == settings.SCRIPT_EVENTS_SUBJECT
+
+
+def test_invalid_or_duplicate_scripts_and_errors_fail_the_published_scenes(events):
+    # Scenes stream out before the final validation fails on the missing title
+    invalid = streaming_agent(json.dumps({**SCRIPT, "title": None}))
+    asyncio.run(invalid.execute_task("script_generation", {"task_id": "invalid", "target_duration": 1}))
+
+    duplicate = streaming_agent(json.dumps(SCRIPT))
+
+    async def check_novelty(input_data, script):
+        return {"label": script.title, "duplicate_of": "10 tips"}
+
+    duplicate._check_novelty = check_novelty
+    asyncio.run(duplicate.execute_task("script_generation", {"task_id": "duplicate", "target_duration": 1}))
+
+    broken = streaming_agent(json.dumps(SCRIPT)[:40], fail=True)
+    with pytest.raises(RuntimeError):
+        asyncio.run(broken.execute_task("script_generation", {"task_id": "broken", "target_duration": 1}))
+
+    assert len(scenes(events)) == 4
+    assert [(event["task_id"], event["status"]) for event in statuses(events)] == [
+        ("invalid", "failed"), ("duplicate", "rejected"), ("broken", "failed")
+    ]
+    assert statuses(events)[1]["reason"] == "Near-duplicate of '10 tips'"
+    assert statuses(events)[2]["reason"] == "provider error"
+
+
+def test_long_form_segments_are_published_as_each_one_is_written(events):
+    agent = ContentStrategistAgent()
+    order = []
+    second_segment_done = asyncio.Event()
+
+    async def generate(task_type, prompt, **kwargs):
+        if task_type == "script_outline":
+            return json.dumps({"title": "Long one", "segments": [
+                {"title": "A", "summary": "first", "duration": 100},
+                {"title": "B", "summary": "second", "duration": 300},
+            ]})
+        if task_type == "script_segment":
+            first = "segment 1" in prompt
+            if first:
+                # The first segment finishes last; its scenes must not wait for the outline order
+                await second_segment_done.wait()
+            else:
+                second_segment_done.set()
+            order.append("first" if first else "second")
+            name = "a" if first else "b"
+            return json.dumps({"scenes": [{"duration": 10, "content": f"{name}1"}, {"duration": 30, "content": f"{name}2"}]})
+        return json.dumps({"boundaries": [{"transition": "fade", "bridge": "Next,"}]})
+
+    agent._generate = generate
+    response = asyncio.run(agent.execute_task("script_generation", {"task_id": "long", "target_duration": 12}))
+
+    published = [(e["segment_index"], e["scene_index"], e["scene"]["content"]) for e in scenes(events)]
+    assert order == ["second", "first"]
+    # Written segments go out in completion order, then the boundary scenes the stitch pass changed
+    assert published == [
+        (1, 0, "b1"), (1, 1, "b2"), (0, 0, "a1"), (0, 1, "a2"),
+        (0, 1, "a2"), (1, 0, "Next, b1"),
+    ]
+    assert scenes(events)[4]["scene"]["transition"] == "fade"
+    script = response.result["script"]
+    # Each segment is fitted to its share of the 12 minutes
+    assert [scene["duration"] for scene in script["scenes"]] == [45.0, 135.0, 135.0, 405.0]
+    assert script["total_duration"] == 720.0
+    assert statuses(events)[-1]["scene_count"] == 4
@@ -0,0 +1,30 @@
+import asyncio
+
+from app import database
+from app.config import settings
+
+
+def test_background_init_retries_only_the_failed_dependencies(monkeypatch):
+    calls = []
+    failures = {"redis": 2}
+
+    def check(name):
+        async def run():
+            calls.append(name)
+            if failures.get(name):
+                failures[name] -= 1
+                raise ConnectionError(f"{name} unavailable")
+        return run
+
+    monkeypatch.setattr(database, "dependency_status", {})
+    monkeypatch.setattr(database, "_dependency_checks", lambda: {
+        name: (check(name), 1.0) for name in ("postgres", "redis", "qdrant")
+    })
+    monkeypatch.setattr(settings, "DEPENDENCY_RETRY_INTERVAL", 0)
+
+    asyncio.run(database.run_init_db())
+
+    assert calls.count("postgres") == calls.count("qdrant") == 1
+    assert calls.count("redis") == 3
+    assert database.is_ready()
+    assert database.dependency_status["redis"] == {"ready": True, "error": None}
@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.deadline import (
+    DeadlineExceeded,
+    check_deadline,
+    current_deadline,
+    deadline_after,
+    deadline_scope,
+    no_deadline,
+    remaining,
+)
+
+
+def test_deadline_after_and_remaining():
+    assert deadline_after(None) is None
+    assert deadline_after(0) is None
+    assert remaining() is None
+    check_deadline()
+
+    deadline = deadline_after(5)
+    assert 4.9 < remaining(deadline) <= 5
+    with pytest.raises(DeadlineExceeded):
+        check_deadline(time.time() - 1)
+
+
+def test_expired_scope_cancels_the_block_and_raises_deadline_exceeded():
+    finished = []
+
+    async def main():
+        async with deadline_scope(time.time() + 0.05):
+            assert current_deadline() is not None
+            await asyncio.sleep(1)
+            finished.append(True)
+
+    started = time.time()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(main())
+
+    assert time.time() - started < 0.5
+    assert finished == []
+
+
+def test_past_deadline_fails_before_running_the_block():
+    ran = []
+
+    async def main():
+        async with deadline_scope(time.time() - 1):
+            ran.append(True)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(main())
+    assert ran == []
+
+
+def test_earlier_enclosing_deadline_wins():
+    async def main():
+        outer = time.time() + 0.05
+        async with deadline_scope(outer):
+            async with deadline_scope(time.time() + 10):
+                assert current_deadline() == outer
+                await asyncio.sleep(1)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(main())
+
+
+def test_inner_deadline_expires_first_and_the_outer_scope_continues():
+    async def main():
+        async with deadline_scope(time.time() + 10):
+            outer = current_deadline()
+            with pytest.raises(DeadlineExceeded):
+                async with deadline_scope(time.time() + 0.05):
+                    await asyncio.sleep(1)
+            assert current_deadline() == outer
+            return "outer finished"
+
+    assert asyncio.run(main()) == "outer finished"
+    assert current_deadline() is None
+
+
+def test_timeouts_from_inside_the_block_are_not_relabelled():
+    async def main():
+        async with deadline_scope(time.time() + 10):
+            await asyncio.wait_for(asyncio.sleep(1), timeout=0.01)
+
+    with pytest.raises(TimeoutError) as raised:
+        asyncio.run(main())
+    assert not isinstance(raised.value, DeadlineExceeded)
+
+
+def test_no_deadline_detaches_and_restores():
+    async def main():
+        deadline = time.time() + 10
+        async with deadline_scope(deadline):
+            with no_deadline():
+                assert current_deadline() is None
+                assert remaining() is None
+            assert current_deadline() == deadline
+
+    asyncio.run(main())
+
+
+def test_tasks_inherit_the_deadline_of_their_creator():
+    async def child():
+        return current_deadline()
+
+    async def main():
+        deadline = time.time() + 10
+        async with deadline_scope(deadline):
+            inherited = await asyncio.gather(child(), asyncio.create_task(child()))
+        return deadline, inherited
+
+    deadline, inherited = asyncio.run(main())
+    assert inherited == [deadline, deadline]
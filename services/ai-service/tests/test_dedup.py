@@ -0,0 +1,132 @@
+import asyncio
+import random
+
+import numpy as np
+
+from app.services import dedup
+from app.services.dedup import PRIME, MinHasher, NearDuplicateIndex, ScopeIndex, normalize
+
+WORDS = (
+    "python video channel growth tips beginners editing camera lighting audio script hook "
+    "retention thumbnail title algorithm budget gear studio travel cooking recipe fitness "
+    "workout gaming review unboxing productivity habits morning routine money investing"
+).split()
+
+
+def random_title(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(12))
+
+
+def one_word_changed(rng, text):
+    words = text.split()
+    words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return " ".join(words)
+
+
+def test_signature_matches_exact_integer_arithmetic_at_the_uint64_limit():
+    hasher = MinHasher(num_perm=16, shingle_size=5)
+    # Largest coefficients: a * h + b must still fit in 64 bits
+    hasher.a[:8] = 2 ** 32 - 1
+    hasher.b[:8] = 2 ** 32 - 1
+    text = "über long title with unicode ☃ and digits 1234567890 " * 8
+
+    hashes = hasher.shingle_hashes(text)
+    expected = [
+        min((int(a) * int(h) + int(b)) % int(PRIME) for h in hashes)
+        for a, b in zip(hasher.a, hasher.b)
+    ]
+
+    assert hashes.max() < 2 ** 32
+    assert hasher.signature(text).tolist() == expected
+
+
+def test_short_and_formatting_variants_hash_alike():
+    hasher = MinHasher(num_perm=64, shingle_size=5)
+
+    assert normalize("  10 Python Tips -- for BEGINNERS!! ") == "10 python tips for beginners"
+    assert (hasher.signature("10 Python Tips for Beginners!") == hasher.signature("10 python tips, for beginners")).all()
+    # Shorter than one shingle
+    assert hasher.signature("ai").shape == (64,)
+
+
+def test_lsh_finds_near_duplicates_and_ignores_unrelated_titles():
+    rng = random.Random(0)
+    hasher = MinHasher(num_perm=128, shingle_size=5)
+    index = ScopeIndex(bands=32)
+    titles = [random_title(rng) for _ in range(200)]
+    for i, title in enumerate(titles):
+        index.add(str(i), title, hasher.signature(title))
+
+    found = 0
+    for i, title in enumerate(titles):
+        match = index.query(hasher.signature(one_word_changed(rng, title)))
+        found += match is not None and match[0] == i and match[1] >= 0.6
+    unrelated = [index.query(hasher.signature(random_title(rng))) for _ in range(200)]
+
+    assert found / len(titles) >= 0.95
+    assert all(match is None or match[1] < 0.6 for match in unrelated)
+
+
+def test_filter_new_rejects_repeats_across_calls_and_within_a_batch(fake_redis):
+    fake_redis(dedup)
+    rng = random.Random(1)
+    original = random_title(rng)
+    other = random_title(rng)
+
+    async def main():
+        index = NearDuplicateIndex()
+        first = await index.filter_new("channel:1", dedup.IDEA, [(original, "original")])
+        second = await index.filter_new("channel:1", dedup.IDEA, [
+            (one_word_changed(rng, original), "rephrased"),
+            (other, "other"),
+            (other + "!", "other again"),
+        ])
+        # Other scopes are separate indexes
+        third = await index.filter_new("channel:2", dedup.IDEA, [(original, "original")])
+        return first, second, third
+
+    first, second, third = asyncio.run(main())
+
+    assert first == ([0], [])
+    kept, rejected = second
+    assert kept == [1]
+    assert [(r["label"], r["duplicate_of"]) for r in rejected] == [
+        ("rephrased", "original"), ("other again", "other")
+    ]
+    assert third == ([0], [])
+
+
+def test_registered_items_survive_a_reload_and_feed_the_avoid_list(fake_redis):
+    fake_redis(dedup)
+
+    async def main():
+        writer = NearDuplicateIndex()
+        for label in ["first idea title", "second idea title", "third idea title"]:
+            await writer.filter_new("niche:tech", dedup.IDEA, [(label * 3, label)])
+            await asyncio.sleep(0.001)
+
+        reader = NearDuplicateIndex()
+        kept, rejected = await reader.filter_new("niche:tech", dedup.IDEA, [("second idea title" * 3, "again")])
+        labels = await reader.recent_labels("niche:tech", dedup.IDEA, limit=2)
+        return kept, rejected, labels
+
+    kept, rejected, labels = asyncio.run(main())
+
+    assert kept == []
+    assert rejected[0]["duplicate_of"] == "second idea title"
+    assert labels == ["third idea title", "second idea title"]
+
+
+def test_crowded_buckets_fall_back_to_a_full_scan():
+    hasher = MinHasher(num_perm=32, shingle_size=5)
+    index = ScopeIndex(bands=8)
+    # Templated titles share most shingles and land in the same buckets
+    for n in range(10):
+        title = f"top ten gadgets of the year part {n}"
+        index.add(str(n), title, hasher.signature(title))
+
+    row, similarity = index.query(hasher.signature("top ten gadgets of the year part 7"))
+
+    assert index.labels[row] == "top ten gadgets of the year part 7"
+    assert similarity == 1.0
+    assert np.count_nonzero(index.signatures[len(index):]) == 0
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from app.services.json_stream import JSONArrayStreamParser, extract_json_object
+
+SCRIPT = {
+    "title": "Scenes [1] {draft}",
+    "description": "Has a \"scenes\": [ key inside a string",
+    "scenes": [
+        {"content": "Hello {world}", "duration": 5},
+        {"content": "She said \"stop\" and left }]", "duration": 7.5, "tags": ["a", "b"]},
+        {"content": "Back\\slash \\\" still inside", "nested": {"x": [1, {"y": 2}]}},
+    ],
+    "tags": [{"not": "a scene"}],
+}
+
+
+def feed_in_chunks(parser, text, size):
+    elements = []
+    for start in range(0, len(text), size):
+        elements.extend(parser.feed(text[start:start + size]))
+    return elements
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10_000])
+def test_elements_are_the_same_at_every_chunk_size(size):
+    text = "```json\n" + json.dumps(SCRIPT) + "\n```"
+    parser = JSONArrayStreamParser("scenes")
+
+    elements = feed_in_chunks(parser, text, size)
+
+    assert elements == SCRIPT["scenes"]
+    assert parser.emitted == 3
+    assert parser.text() == text
+
+
+def test_each_element_is_emitted_by_the_chunk_that_closes_it():
+    parser = JSONArrayStreamParser("scenes")
+
+    assert parser.feed('{"scenes": [{"content": "a"') == []
+    assert parser.feed('}, {"content": "b"}') == [{"content": "a"}, {"content": "b"}]
+    assert parser.feed("]}") == []
+
+
+def test_key_must_match_at_the_top_level():
+    text = json.dumps({"meta": {"scenes": [{"content": "nested"}]}, "scenes": [{"content": "top"}]})
+
+    assert JSONArrayStreamParser("scenes").feed(text) == [{"content": "top"}]
+
+
+def test_non_object_and_broken_elements_are_skipped():
+    parser = JSONArrayStreamParser("scenes")
+
+    elements = parser.feed('{"scenes": [1, "two", [3], {"content": "ok"}, {"content": tru}]}')
+
+    assert elements == [{"content": "ok"}]
+    assert parser.emitted == 1
+
+
+def test_extract_json_object_tolerates_fences_and_prose():
+    text = 'Sure, here it is:\n```json\n{"ideas": [{"title": "x"}]}\n```\nAnything else?'
+
+    assert extract_json_object(text) == {"ideas": [{"title": "x"}]}
+    with pytest.raises(ValueError):
+        extract_json_object("no object here")
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services import llm_service as llm_service_module
+from app.services.llm_service import LLMService
+from app.services.model_router import ModelRouter
+from app.services.token_budget import OutputBudget
+
+BUDGET = OutputBudget(task_type=None, max_tokens=500, expected_tokens=400, stop=[])
+
+
+class FailingCompletions:
+    def __init__(self):
+        self.requests = []
+
+    async def create(self, **request):
+        self.requests.append(request)
+        raise RuntimeError("400 Invalid parameter: response_format")
+
+
+class FakeOpenAI:
+    def __init__(self):
+        self.chat = type("Chat", (), {})()
+        self.chat.completions = FailingCompletions()
+
+
+@pytest.fixture
+def openai_client(monkeypatch):
+    client = FakeOpenAI()
+    monkeypatch.setattr(llm_service_module, "get_openai_client", lambda: client)
+    monkeypatch.setattr(llm_service_module, "model_router", ModelRouter())
+    monkeypatch.setattr(settings, "OPENAI_REQUESTS_PER_MINUTE", 0)
+    return client
+
+
+def test_json_mode_only_sends_response_format_to_models_that_accept_it():
+    service = LLMService()
+
+    gpt4 = service._openai_request("Reply in JSON", None, "gpt-4", BUDGET, 0.7, json_mode=True)
+    gpt4o = service._openai_request("Reply in JSON", None, "gpt-4o", BUDGET, 0.7, json_mode=True)
+    plain = service._openai_request("Hello", None, "gpt-4o", BUDGET, 0.7, json_mode=False)
+
+    assert "response_format" not in gpt4
+    assert gpt4o["response_format"] == {"type": "json_object"}
+    assert "response_format" not in plain
+    # The standard and flagship tiers default to a model with JSON mode
+    assert "response_format" in service._openai_request("{}", None, settings.DEFAULT_MODEL, BUDGET, 0.7, True)
+    assert "response_format" in service._openai_request("{}", None, settings.FLAGSHIP_MODEL, BUDGET, 0.7, True)
+
+
+def test_provider_errors_are_raised_instead_of_served_as_mock_output(openai_client, monkeypatch):
+    # A deployment that keeps gpt-4 on the standard tier
+    monkeypatch.setattr(settings, "DEFAULT_MODEL", "gpt-4")
+    service = LLMService()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(service.generate_completion("Reply in JSON", model="gpt-4", provider="openai", json_mode=True))
+
+    async def consume():
+        return [delta async for delta in service.stream_completion("Hi", model="gpt-4", provider="openai")]
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(consume())
+
+    assert "response_format" not in openai_client.chat.completions.requests[0]
+    stats = llm_service_module.model_router.stats[("openai", "standard")]
+    assert stats.samples == 2 and stats.error_rate > 0
+
+
+def test_without_a_client_development_gets_mock_output(monkeypatch):
+    monkeypatch.setattr(llm_service_module, "get_openai_client", lambda: None)
+    monkeypatch.setattr(llm_service_module, "model_router", ModelRouter())
+
+    completion = asyncio.run(LLMService().generate_completion("Reply in JSON", provider="openai", json_mode=True))
+
+    assert completion.startswith("{")
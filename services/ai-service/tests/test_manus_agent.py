@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+from app.agents import manus_agent
+from app.agents.manus_agent import ManusAgent
+from app.config import settings
+from app.services import result_cache as result_cache_module
+from app.services.result_cache import ResultCache
+
+
+def idea(title):
+    return {
+        "title": title, "description": "Hook and talking points", "estimated_views": 10000,
+        "difficulty_score": 0.3, "viral_potential": 0.6, "monetization_potential": 0.4,
+        "target_keywords": [title], "content_type": "tutorial", "estimated_duration": 8,
+    }
+
+
+def test_candidate_pool_is_generated_in_concurrent_batches(fake_redis, monkeypatch):
+    fake_redis(result_cache_module)
+    monkeypatch.setattr(manus_agent, "result_cache", ResultCache())
+    for name, value in {
+        "DEDUP_ENABLED": False,
+        "IDEATION_CANDIDATE_POOL": 25,
+        "IDEATION_BATCH_SIZE": 10,
+        "IDEATION_FINAL_COUNT": 5,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    agent = ManusAgent()
+    calls = []
+    running = []
+
+    async def generate(task_type, prompt, **kwargs):
+        calls.append(kwargs["items"])
+        batch = len(calls)
+        running.append(batch)
+        await asyncio.sleep(0.01)
+        running.append(-batch)
+        if batch == 2:
+            return "not json"
+        return json.dumps({"ideas": [idea(f"idea {batch}-{i}") for i in range(kwargs["items"])]})
+
+    async def attach_context(*args, **kwargs):
+        pass
+
+    async def store_computed(*args, **kwargs):
+        pass
+
+    agent._generate = generate
+    agent._attach_context = attach_context
+    agent._store_computed = store_computed
+
+    response = asyncio.run(agent.execute_task("content_ideation", {"niche": "tech"}))
+
+    assert calls == [10, 10, 5]
+    # All batches were started before the first one finished
+    assert running[:3] == [1, 2, 3]
+    # The unparseable batch is skipped, the others make up the pool
+    assert response.result["candidates"] == 15
+    assert len(response.result["content_ideas"]) == 5
+    assert "parse_error" not in response.result
@@ -0,0 +1,51 @@
+import pytest
+
+from app.config import settings
+from app.services.model_router import MIN_SAMPLES, ModelRouter, latency_budget
+
+
+@pytest.fixture(autouse=True)
+def router_settings(monkeypatch):
+    for name, value in {
+        "STANDARD_TIER_LATENCY_BUDGET": 30.0,
+        "DEFAULT_OUTPUT_TOKENS": 1000,
+        "MODEL_ROUTER_MAX_ERROR_RATE": 0.25,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+
+
+def test_long_outputs_get_a_proportionally_larger_budget():
+    assert latency_budget("standard") == 30.0
+    assert latency_budget("standard", output_tokens=200) == 30.0
+    assert latency_budget("standard", output_tokens=4000) == 120.0
+
+
+def test_long_scripts_do_not_mark_the_tier_unhealthy():
+    router = ModelRouter()
+    for _ in range(MIN_SAMPLES * 2):
+        # 90s for a 4000-token script is within budget
+        router.record("openai", "standard", 90.0, ok=True, output_tokens=4000)
+
+    assert router.is_healthy("openai", "standard")
+
+    for _ in range(MIN_SAMPLES * 2):
+        router.record("openai", "standard", 90.0, ok=True, output_tokens=500)
+
+    assert not router.is_healthy("openai", "standard")
+
+
+def test_failures_count_as_errors_not_latency():
+    router = ModelRouter()
+    router.record("openai", "standard", 300.0, ok=False)
+    for _ in range(MIN_SAMPLES * 2):
+        router.record("openai", "standard", 5.0, ok=True, output_tokens=500)
+
+    stats = router.stats[("openai", "standard")]
+    assert stats.latency_ratio == pytest.approx(5.0 / 30.0)
+    assert router.is_healthy("openai", "standard")
+
+    for _ in range(MIN_SAMPLES):
+        router.record("openai", "standard", 0.1, ok=False)
+
+    assert not router.is_healthy("openai", "standard")
+    assert stats.latency_ratio == pytest.approx(5.0 / 30.0)
@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import pytest
+
+from app.agents import manus_agent, research_agent
+from app.agents.manus_agent import ManusAgent
+from app.agents.research_agent import ResearchAgent
+from app.config import settings
+from app.services import result_cache as result_cache_module
+from app.services import shared_state
+from app.services.prewarm import build_prewarm_jobs
+from app.services.result_cache import FRESH, MISS, ResultCache, unrecorded
+
+CHANNELS = [{"channel_id": "c1", "niche": "Tech"}]
+IDEAS = json.dumps({"ideas": [{
+    "title": "Build an AI agent in 10 minutes", "description": "Walkthrough", "estimated_views": 50000,
+    "difficulty_score": 0.4, "viral_potential": 0.7, "monetization_potential": 0.5,
+    "target_keywords": ["ai agent"], "content_type": "tutorial", "estimated_duration": 10,
+}]})
+
+
+@pytest.fixture
+def cache(fake_redis, monkeypatch):
+    fake_redis(result_cache_module, shared_state)
+    cache = ResultCache()
+    for module in (result_cache_module, research_agent, manus_agent):
+        monkeypatch.setattr(module, "result_cache", cache)
+    monkeypatch.setattr(settings, "DEDUP_ENABLED", False)
+    return cache
+
+
+def fake_llm(agent, text):
+    async def generate(task_type, prompt, **kwargs):
+        return text
+
+    async def store_results(*args, **kwargs):
+        pass
+
+    async def attach_context(*args, **kwargs):
+        pass
+
+    agent._generate = generate
+    agent._attach_context = attach_context
+    agent._store_results = store_results
+    return agent
+
+
+def test_prewarm_jobs_replay_the_keys_production_requested(cache):
+    research = fake_llm(ResearchAgent(), "findings")
+    manus = fake_llm(ManusAgent(), IDEAS)
+    requests = [
+        (research, "comprehensive_research", {"niche": "Tech ", "topic": "AI Tools", "depth": "deep"}),
+        (manus, "content_ideation", {
+            "niche": "Tech", "channel_config": {"channel_id": "c1"},
+            "audience_data": {"age": "18-24"}, "trending_topics": ["agents"],
+        }),
+        # Not an active channel or niche
+        (research, "comprehensive_research", {"niche": "cooking", "topic": "bread"}),
+        (manus, "content_ideation", {"niche": "tech", "channel_id": "c9"}),
+    ]
+
+    async def main():
+        for agent, task_type, input_data in requests:
+            response = await agent.process_task("request", task_type, input_data)
+            assert response.cache_status == MISS
+        requested = {
+            task_type: await cache.requested_keys(task_type, 3600)
+            for task_type in ("comprehensive_research", "content_ideation")
+        }
+        jobs = build_prewarm_jobs(CHANNELS, requested)
+        agents = {"research_agent": research, "manus": manus}
+        outcomes = []
+        for agent_name, task_type, input_data in jobs:
+            if agent_name in agents:
+                with unrecorded():
+                    response = await agents[agent_name].process_task("prewarm", task_type, input_data)
+                outcomes.append((task_type, response.cache_status))
+        return jobs, outcomes
+
+    jobs, outcomes = asyncio.run(main())
+
+    assert [(task_type, input_data.get("topic") or input_data.get("channel_id") or input_data["niche"]) for _, task_type, input_data in jobs] == [
+        ("trend_analysis", "tech"), ("comprehensive_research", "ai tools"), ("content_ideation", "c1"),
+    ]
+    # The prewarm inputs hit the entries the requests created
+    assert outcomes == [("comprehensive_research", FRESH), ("content_ideation", FRESH)]
+
+
+def test_prewarm_lookups_do_not_record_their_keys(cache):
+    async def compute():
+        return "value"
+
+    async def main():
+        with unrecorded():
+            await cache.get_or_compute("comprehensive_research", {"niche": "tech", "topic": "x"}, compute, 60, 60)
+        await cache.get_or_compute("comprehensive_research", {"niche": "tech", "topic": "y"}, compute, 60, 60)
+        return await cache.requested_keys("comprehensive_research", 3600)
+
+    assert asyncio.run(main()) == [{"niche": "tech", "topic": "y"}]
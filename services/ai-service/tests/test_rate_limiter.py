@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import rate_limiter as rate_limiter_module
+from app.services.deadline import DeadlineExceeded, deadline_scope
+from app.services.rate_limiter import RateLimiter
+from app.services.saturation import SaturationMonitor
+
+
+@pytest.fixture
+def monitor(monkeypatch, fake_redis):
+    fake_redis(rate_limiter_module)
+    monitor = SaturationMonitor()
+    monkeypatch.setattr(rate_limiter_module, "saturation", monitor)
+    return monitor
+
+
+def wait_for_next_window(window):
+    # Start right after a window boundary so the test does not straddle one
+    time.sleep(window - time.time() % window + 0.01)
+
+
+def test_waiting_caller_gets_the_next_window(monitor):
+    limiter = RateLimiter(window=0.2)
+    wait_for_next_window(0.2)
+
+    async def main():
+        first = await limiter.acquire("openai", 300)
+        second = await limiter.acquire("openai", 300)
+        return first, second
+
+    first, second = asyncio.run(main())
+
+    assert first == 0.0
+    assert 0 < second < 0.3
+    stats = monitor.snapshot()["rate_limiter"]["openai"]
+    assert stats["acquisitions_total"] == 2
+    assert stats["waiting"] == 0
+    assert stats["wait_seconds_total"] > 0
+
+
+def test_deadline_before_the_next_window_is_not_an_acquisition(monitor):
+    limiter = RateLimiter(window=0.5)
+    wait_for_next_window(0.5)
+
+    async def main():
+        await limiter.acquire("anthropic", 120)
+        async with deadline_scope(time.time() + 0.05):
+            await limiter.acquire("anthropic", 120)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(main())
+
+    stats = monitor.snapshot()["rate_limiter"]["anthropic"]
+    assert stats["acquisitions_total"] == 1
+    assert stats["waiting"] == 0
+
+
+def test_cancelled_wait_leaves_the_gauge_without_an_acquisition(monitor):
+    limiter = RateLimiter(window=1.0)
+    wait_for_next_window(1.0)
+
+    async def main():
+        await limiter.acquire("openai", 60)
+        waiter = asyncio.create_task(limiter.acquire("openai", 60))
+        await asyncio.sleep(0.05)
+        assert monitor.rate_limit_waiting["openai"] == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(main())
+
+    stats = monitor.snapshot()["rate_limiter"]["openai"]
+    assert stats["acquisitions_total"] == 1
+    assert stats["waiting"] == 0
+    assert stats["wait_seconds_total"] >= 0.05
+
+
+def test_windows_hold_a_whole_number_of_requests_at_the_configured_rate():
+    limiter = RateLimiter(window=1.0)
+
+    assert limiter.limit_window(60) == (1, 1.0)
+    assert limiter.limit_window(50) == (1, 1.2)
+    assert limiter.limit_window(500) == (9, 1.08)
+    for per_minute in (1, 7, 50, 61, 500, 3500):
+        limit, window = limiter.limit_window(per_minute)
+        assert limit * 60 / window == pytest.approx(per_minute)
+
+
+def test_rates_below_one_request_per_window_wait_a_longer_window(monitor):
+    # 150/min allows one request per 0.4s, twice the configured window
+    limiter = RateLimiter(window=0.2)
+    wait_for_next_window(0.4)
+
+    async def main():
+        first = await limiter.acquire("openai", 150)
+        second = await limiter.acquire("openai", 150)
+        return first, second
+
+    first, second = asyncio.run(main())
+
+    assert first == 0.0
+    assert 0.3 < second < 0.5
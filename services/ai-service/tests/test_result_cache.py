@@ -0,0 +1,164 @@
+import asyncio
+import time
+
+import pytest
+
+from app.agents import trend_predictor
+from app.agents.trend_predictor import TrendPredictorAgent
+from app.config import settings
+from app.services import result_cache as result_cache_module
+from app.services import shared_state
+from app.services.deadline import DeadlineExceeded, check_deadline, deadline_scope
+from app.services.result_cache import FRESH, MISS, STALE, ResultCache, Uncacheable
+
+
+def slow_compute(calls, delay=0.2, value="fresh value"):
+    async def compute():
+        calls.append(time.time())
+        await asyncio.sleep(delay)
+        # What an LLM call does before reaching the provider
+        check_deadline()
+        return value
+    return compute
+
+
+def test_shared_miss_outlives_the_deadline_of_the_caller_that_started_it(fake_redis):
+    fake_redis(result_cache_module)
+    cache = ResultCache()
+    calls = []
+    compute = slow_compute(calls)
+
+    async def short_deadline_caller():
+        async with deadline_scope(time.time() + 0.05):
+            return await cache.get_or_compute("trends", {"niche": "tech"}, compute, 60, 60)
+
+    async def caller_without_deadline():
+        await asyncio.sleep(0.01)
+        return await cache.get_or_compute("trends", {"niche": "tech"}, compute, 60, 60)
+
+    async def main():
+        return await asyncio.gather(
+            short_deadline_caller(), caller_without_deadline(), return_exceptions=True
+        )
+
+    short, unbounded = asyncio.run(main())
+    assert isinstance(short, DeadlineExceeded)
+    assert unbounded == ("fresh value", MISS)
+    assert len(calls) == 1
+
+
+def test_result_of_abandoned_computation_is_cached(fake_redis):
+    fake_redis(result_cache_module)
+    cache = ResultCache()
+    calls = []
+    compute = slow_compute(calls, delay=0.1)
+
+    async def main():
+        with pytest.raises(DeadlineExceeded):
+            async with deadline_scope(time.time() + 0.02):
+                await cache.get_or_compute("trends", {"niche": "tech"}, compute, 60, 60)
+        await asyncio.sleep(0.15)
+        return await cache.get_or_compute("trends", {"niche": "tech"}, compute, 60, 60)
+
+    assert asyncio.run(main()) == ("fresh value", FRESH)
+    assert len(calls) == 1
+
+
+def test_background_refresh_ignores_deadline_of_triggering_request(fake_redis):
+    fake_redis(result_cache_module)
+    cache = ResultCache()
+    calls = []
+
+    async def main():
+        await cache.get_or_compute("trends", {"niche": "tech"}, slow_compute(calls, delay=0, value="old"), 0, 60)
+        async with deadline_scope(time.time() + 0.05):
+            stale = await cache.get_or_compute(
+                "trends", {"niche": "tech"}, slow_compute(calls, delay=0.1, value="new"), 0, 60
+            )
+        await asyncio.gather(*cache.refreshes)
+        refreshed = await cache.get_or_compute(
+            "trends", {"niche": "tech"}, slow_compute(calls, value="unused"), 60, 60
+        )
+        return stale, refreshed
+
+    stale, refreshed = asyncio.run(main())
+    assert stale == ("old", STALE)
+    assert refreshed == ("new", FRESH)
+    assert len(calls) == 2
+
+
+def test_degraded_values_are_served_to_every_waiter_but_not_cached(fake_redis):
+    fake_redis(result_cache_module)
+    cache = ResultCache()
+    calls = []
+
+    async def degraded():
+        calls.append(time.time())
+        await asyncio.sleep(0.05)
+        return Uncacheable({"content_ideas": "raw text", "parse_error": "bad json"})
+
+    async def main():
+        first, second = await asyncio.gather(
+            cache.get_or_compute("ideas", {"niche": "tech"}, degraded, 60, 60),
+            cache.get_or_compute("ideas", {"niche": "tech"}, degraded, 60, 60),
+        )
+        retried = await cache.get_or_compute("ideas", {"niche": "tech"}, slow_compute(calls, delay=0), 60, 60)
+        return first, second, retried
+
+    first, second, retried = asyncio.run(main())
+    assert first == second == ({"content_ideas": "raw text", "parse_error": "bad json"}, MISS)
+    assert retried == ("fresh value", MISS)
+    assert len(calls) == 2
+
+
+def test_degraded_refresh_keeps_the_stale_entry(fake_redis):
+    fake_redis(result_cache_module)
+    cache = ResultCache()
+
+    async def degraded():
+        return Uncacheable("degraded")
+
+    async def main():
+        await cache.get_or_compute("trends", {"niche": "tech"}, slow_compute([], delay=0, value="old"), 0, 60)
+        await cache.get_or_compute("trends", {"niche": "tech"}, degraded, 0, 60)
+        await asyncio.gather(*cache.refreshes)
+        return await cache.get_or_compute("trends", {"niche": "tech"}, degraded, 0, 60)
+
+    assert asyncio.run(main()) == ("old", STALE)
+
+
+def test_cached_task_results_are_stored_once_per_computation(fake_redis, monkeypatch):
+    fake_redis(result_cache_module, shared_state)
+    monkeypatch.setattr(result_cache_module, "result_cache", ResultCache())
+    monkeypatch.setattr(trend_predictor, "result_cache", result_cache_module.result_cache)
+    agent = TrendPredictorAgent()
+    stored = []
+
+    async def generate(task_type, prompt, **kwargs):
+        await asyncio.sleep(0.05)
+        return f"analysis {len(stored)}"
+
+    async def store_results(task_id, task_type, input_data, response, deadline=None):
+        stored.append((task_id, response.result))
+
+    agent._generate = generate
+    agent._store_results = store_results
+
+    async def main():
+        # Two coalesced misses, a fresh hit, then a stale hit that refreshes
+        await asyncio.gather(
+            agent.process_task("a", "trend_analysis", {"niche": "tech"}),
+            agent.process_task("b", "trend_analysis", {"niche": "tech"}),
+        )
+        await agent.process_task("c", "trend_analysis", {"niche": "tech"})
+        monkeypatch.setattr(settings, "TREND_CACHE_FRESH_TTL", 0)
+        stale = await agent.process_task("d", "trend_analysis", {"niche": "tech"})
+        await asyncio.gather(*result_cache_module.result_cache.refreshes)
+        return stale
+
+    stale = asyncio.run(main())
+    assert stale.cache_status == STALE
+    assert stored == [
+        ("a", {"trend_analysis": "analysis 0"}),
+        ("d", {"trend_analysis": "analysis 1"}),
+    ]
@@ -0,0 +1,96 @@
+import asyncio
+import math
+import random
+
+import numpy as np
+
+from app.services.sentiment import (
+    INTENSIFIERS,
+    LEXICON,
+    NEGATION_FACTOR,
+    NEGATION_SCOPE,
+    NEGATORS,
+    NORMALIZATION_ALPHA,
+    LexiconSentimentModel,
+    SentimentAnalyzer,
+)
+
+model = LexiconSentimentModel()
+
+
+def reference_score(text):
+    """Token-by-token version of the lexicon rules for a single text"""
+    tokens = model.tokenize(text)
+    raw = 0.0
+    for position, token in enumerate(tokens):
+        weight = LEXICON.get(token, 0.0)
+        window = tokens[max(0, position - NEGATION_SCOPE):position]
+        if any(previous in NEGATORS for previous in window):
+            weight *= NEGATION_FACTOR
+        if position and tokens[position - 1] in INTENSIFIERS:
+            weight *= INTENSIFIERS[tokens[position - 1]]
+        raw += weight
+    return raw / math.sqrt(raw * raw + NORMALIZATION_ALPHA)
+
+
+def test_negation_and_intensifiers():
+    scores = model.score(["good", "not good", "not really good", "very good", "not that it was ever bad"])["score"]
+
+    good, not_good, not_really_good, very_good, far_negation = scores
+    assert good > 0 and not_good < 0 and not_really_good < 0
+    assert very_good > good
+    # "bad" is 4 tokens after "not": outside the window
+    assert far_negation < 0
+
+
+def test_negation_does_not_cross_into_the_next_text():
+    texts = ["this is not", "great", "never", "bad", "not", "", "good"]
+
+    scores = model.score(texts)["score"]
+
+    assert scores[1] > 0
+    assert scores[3] < 0
+    assert scores[5] == 0
+    assert scores[6] > 0
+    assert scores[1] == model.score(["great"])["score"][0]
+
+
+def test_batch_scores_match_the_per_text_reference():
+    rng = random.Random(11)
+    vocabulary = list(LEXICON) + list(NEGATORS) + list(INTENSIFIERS) + ["video", "the", "was", "it"]
+    texts = [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(0, 12))) for _ in range(500)]
+
+    scores = model.score(texts)["score"]
+
+    expected = np.array([reference_score(text) for text in texts], dtype=np.float32)
+    np.testing.assert_allclose(scores, expected, atol=1e-5)
+
+
+def test_counts_tokens_emoji_and_curly_apostrophes():
+    scored = model.score(["I don’t like it", "🔥🔥 👎", None, "no lexicon words here"])
+
+    assert scored["tokens"].tolist() == [4, 3, 0, 4]
+    assert scored["score"][0] < 0
+    assert scored["score"][1] > 0
+    assert scored["score"][2] == scored["score"][3] == 0
+    assert scored["positive"].tolist() == [0, 2, 0, 0]
+    assert scored["negative"].tolist() == [1, 1, 0, 0]
+
+
+def test_ambiguous_items_are_escalated_to_the_llm():
+    class FakeLLM:
+        def __init__(self):
+            self.prompts = []
+
+        async def generate_completion(self, prompt, **kwargs):
+            self.prompts.append(prompt)
+            return '{"scores": [{"i": 0, "score": -0.9}]}'
+
+    llm = FakeLLM()
+    texts = ["love it", "great video but the audio is bad", "wow"]
+
+    results = asyncio.run(SentimentAnalyzer().analyze(texts, llm=llm))
+
+    assert [result["source"] for result in results] == ["lexicon", "llm", "lexicon"]
+    assert results[1]["sentiment"] == "negative"
+    assert len(llm.prompts) == 1
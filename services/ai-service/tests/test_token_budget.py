@@ -0,0 +1,103 @@
+import pytest
+
+from app.config import settings
+from app.services.token_budget import END_MARKER, ITEM_TOKENS, TASK_OUTPUT_TOKENS, TokenBudget, script_tokens
+
+
+@pytest.fixture(autouse=True)
+def budget_settings(monkeypatch):
+    for name, value in {
+        "SCRIPT_WORDS_PER_MINUTE": 150,
+        "TOKENS_PER_WORD": 1.35,
+        "DEFAULT_OUTPUT_TOKENS": 1000,
+        "TOKEN_BUDGET_HEADROOM": 1.2,
+        "TOKEN_BUDGET_SLACK": 64,
+        "TOKEN_BUDGET_OVER_RATIO": 1.5,
+        "TOKEN_BUDGET_UNDER_RATIO": 0.5,
+        "MAX_TOKENS": 4000,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+
+
+def test_script_budget_scales_with_duration():
+    budgets = TokenBudget()
+
+    one = budgets.budget("script_generation", duration_minutes=1)
+    two = budgets.budget("script_generation", duration_minutes=2)
+
+    # 150 words * 1.35 tokens
+    assert one.expected_tokens == 203
+    assert one.max_tokens == 308  # ceil(203 * 1.2) + 64
+    assert two.expected_tokens == 405
+    assert one.stop == [END_MARKER]
+
+
+def test_json_scripts_get_structure_overhead_and_no_stop_sequence():
+    budget = TokenBudget().budget("script_segment", duration_minutes=2, json_mode=True)
+
+    assert budget.expected_tokens == script_tokens(2, json_mode=True) == 507  # ceil(405 * 1.25)
+    assert budget.stop == []
+
+
+def test_fixed_size_tasks_and_unknown_tasks():
+    budgets = TokenBudget()
+
+    hooks = budgets.budget("hook_generation", duration_minutes=30)
+    unknown = budgets.budget("something_new")
+    default = budgets.budget(None)
+
+    # A duration only matters for script tasks
+    assert hooks.expected_tokens == TASK_OUTPUT_TOKENS["hook_generation"]
+    assert unknown.expected_tokens == default.expected_tokens == 1000
+    assert default.task_type is None
+
+
+def test_item_tasks_are_sized_from_the_requested_count():
+    budgets = TokenBudget()
+
+    batch = budgets.budget("content_ideation", json_mode=True, items=10)
+    pool = budgets.budget("content_ideation", json_mode=True, items=30)
+
+    assert batch.expected_tokens == 10 * ITEM_TOKENS["content_ideation"]
+    assert batch.max_tokens < 4000
+    # A whole pool of 30 ideas would be cut off at MAX_TOKENS
+    assert pool.expected_tokens == pool.max_tokens == 4000 < 30 * ITEM_TOKENS["content_ideation"]
+    assert budgets.budget("content_ideation").expected_tokens == 1000
+
+
+def test_long_scripts_are_capped_at_max_tokens():
+    budget = TokenBudget().budget("script_generation", duration_minutes=60)
+
+    assert budget.max_tokens == 4000
+    assert budget.expected_tokens == 4000
+    assert script_tokens(60) > 4000
+
+
+def test_zero_or_negative_duration_falls_back_to_the_default():
+    budgets = TokenBudget()
+
+    assert budgets.budget("script_generation", duration_minutes=0).expected_tokens == 1000
+    assert script_tokens(-3) == 0
+
+
+def test_stats_classify_each_call_against_its_budget():
+    budgets = TokenBudget()
+    budget = budgets.budget("content_optimization")  # expects 800
+
+    budgets.record(budget, 800, truncated=False)
+    budgets.record(budget, 1300, truncated=False)
+    budgets.record(budget, 300, truncated=False)
+    budgets.record(budget, budget.max_tokens, truncated=True)
+    budgets.record(budgets.budget(None), 10, truncated=False)
+
+    stats = budgets.get_stats()
+    assert stats["content_optimization"] == {
+        "calls": 4,
+        "avg_output_tokens": (800 + 1300 + 300 + budget.max_tokens) / 4,
+        "avg_expected_tokens": 800.0,
+        "utilization": (800 + 1300 + 300 + budget.max_tokens) / (4 * budget.max_tokens),
+        "truncated": 1,
+        "over_generated": 1,
+        "under_generated": 1,
+    }
+    assert stats["default"]["under_generated"] == 1
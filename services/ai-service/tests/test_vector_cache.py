@@ -0,0 +1,64 @@
+import asyncio
+
+import numpy as np
+from qdrant_client.models import ScoredPoint
+
+from app.services import retrieval
+from app.services.retrieval import MemorySearch
+from app.services.vector_cache import LocalVectorTier, VectorCache
+
+
+def unit(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_full_tier_evicts_the_least_recently_written_point():
+    tier = LocalVectorTier(capacity=3, dim=2)
+    tier.upsert("a", unit(1, 0), {})
+    tier.upsert("b", unit(0, 1), {})
+    tier.upsert("c", unit(1, 1), {})
+    # Re-writing "a" makes it the most recent, so "b" goes first
+    tier.upsert("a", unit(1, 0), {"niche": "tech"})
+    tier.upsert("d", unit(-1, 0), {})
+    tier.upsert("e", unit(0, -1), {})
+
+    assert set(tier.slots) == {"a", "d", "e"}
+    assert tier.size == 3
+    assert tier.search(unit(1, 0), top_k=1, conditions={"niche": "tech"})[0]["id"] == "a"
+
+
+def test_local_hits_are_merged_with_qdrant_even_when_they_fill_top_k(monkeypatch):
+    cache = VectorCache(capacity=8)
+    cache.add("memories", "recent", unit(0.8, 0.6), {"summary": "recent"})
+    monkeypatch.setattr(retrieval, "vector_cache", cache)
+
+    class FakeQdrant:
+        def __init__(self):
+            self.requests = []
+
+        async def search_batch(self, collection_name, requests):
+            self.requests.append((collection_name, requests))
+            return [[ScoredPoint(id="older", version=1, score=0.99, payload={"summary": "older"})]]
+
+    qdrant = FakeQdrant()
+
+    async def get_qdrant():
+        return qdrant
+
+    monkeypatch.setattr(retrieval, "get_qdrant", get_qdrant)
+
+    results = asyncio.run(retrieval.search_memory_batch([
+        MemorySearch(collection="memories", vector=unit(1, 0), top_k=1)
+    ]))
+
+    assert [hit["id"] for hit in results[0]] == ["older"]
+    assert len(qdrant.requests) == 1
+
+
+def test_search_requests_take_the_float32_query_array():
+    vector = unit(0.25, 0.5)
+
+    request = retrieval._search_request(MemorySearch(collection="memories", vector=vector), with_vector=False)
+
+    assert request.vector == [0.25, 0.5]
+    assert request.with_vector is False